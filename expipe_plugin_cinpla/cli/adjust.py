@@ -1,5 +1,5 @@
 from expipe_plugin_cinpla.imports import *
-from expipe_plugin_cinpla.scripts import adjust
+from expipe_plugin_cinpla.scripts import adjust, adjustment_log
 from . import utils
 from datetime import datetime as dt
 
@@ -51,3 +51,21 @@ def attach_to_cli(cli):
         adjust.register_adjustment(
             PAR.PROJECT, entity_id, date, adjustment, user, index, init,
             depth, yes, overwrite)
+
+    @cli.command('migrate-adjustments',
+                 short_help='Move adjustment modules to the adjustment log.')
+    @click.argument('entity-id', type=click.STRING, required=False)
+    @click.option('--delete-modules',
+                  is_flag=True,
+                  help='Delete the adjustment modules after migrating.',
+                  )
+    def _migrate_adjustments(entity_id, delete_modules):
+        project = PAR.PROJECT
+        if entity_id is None:
+            action_ids = [action_id for action_id in project.actions.keys()
+                          if action_id.endswith('-adjustment')]
+        else:
+            action_ids = [entity_id + '-adjustment']
+        for action_id in action_ids:
+            adjustment_log.migrate_adjustments(
+                project.actions[action_id], delete_modules=delete_modules)
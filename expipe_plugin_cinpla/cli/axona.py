@@ -21,6 +21,12 @@ def attach_to_cli(cli):
                   callback=utils.validate_cluster_group,
                   help='<"channel_group cluster_id good|noise|unsorted"> (omit <>).',
                   )
+    @click.option('--cluster-group-file',
+                  type=click.Path(exists=True, dir_okay=False),
+                  help=('CSV file with columns channel_group, cluster_id ' +
+                        'and good|noise|unsorted, overridden by ' +
+                        '"--cluster-group".'),
+                  )
     @click.option('-l', '--location',
                   type=click.STRING,
                   required=True,
@@ -77,10 +83,31 @@ def attach_to_cli(cli):
                   is_flag=True,
                   help='Overwrite modules or not.',
                   )
+    @click.option('--n-jobs',
+                  type=click.IntRange(min=1),
+                  default=1,
+                  help=('Number of processes used for converting, ' +
+                        'independent stages run in parallel if larger than 1.'),
+                  )
+    @click.option('--stream-analog',
+                  is_flag=True,
+                  help='Convert ".eeg" and ".egf" in chunks with bounded memory.',
+                  )
+    @click.option('--chunk-size',
+                  type=click.INT,
+                  default=axona.DEFAULT_CHUNK_SIZE,
+                  help='Number of samples per chunk with "--stream-analog".',
+                  )
+    @click.option('--reimport',
+                  is_flag=True,
+                  help=('Only reconvert data whose source files changed ' +
+                        'since last registration, i.e. new ".cut" files.'),
+                  )
     def _register_axona_recording(
         action_id, axona_filename, depth, user, overwrite, templates,
         entity_id, location, message, tag, get_inp, no_cut, cluster_group,
-        set_zero_cluster_to_noise, register_depth):
+        set_zero_cluster_to_noise, register_depth, n_jobs, stream_analog,
+        chunk_size, reimport, cluster_group_file):
         axona.register_axona_recording(
             project=PAR.PROJECT,
             action_id=action_id,
@@ -96,6 +123,97 @@ def attach_to_cli(cli):
             get_inp=get_inp,
             no_cut=no_cut,
             cluster_group=cluster_group,
+            cluster_group_file=cluster_group_file,
+            set_zero_cluster_to_noise=set_zero_cluster_to_noise,
+            register_depth=register_depth,
+            correct_depth_answer=None,
+            n_jobs=n_jobs,
+            stream_analog=stream_analog,
+            chunk_size=chunk_size,
+            reimport=reimport)
+
+    @cli.command('axona-batch',
+                 short_help='Register all axona recordings under a directory.')
+    @click.argument('root', type=click.Path(exists=True, file_okay=False))
+    @click.option('-u', '--user',
+                  type=click.STRING,
+                  help='The experimenter performing the recordings.',
+                  )
+    @click.option('-l', '--location',
+                  type=click.STRING,
+                  required=True,
+                  callback=utils.optional_choice,
+                  envvar=PAR.POSSIBLE_LOCATIONS,
+                  help='The location of the recordings, i.e. "room1".'
+                  )
+    @click.option('--manifest',
+                  type=click.Path(dir_okay=False),
+                  help=('Path to the manifest used to resume an interrupted ' +
+                        'run, default is "<root>/axona_batch_manifest.json".'),
+                  )
+    @click.option('--n-jobs',
+                  type=click.IntRange(min=1),
+                  default=1,
+                  help='Number of sessions registered in parallel.',
+                  )
+    @click.option('--templates',
+                  multiple=True,
+                  type=click.STRING,
+                  help='Which templates to add',
+                  )
+    @click.option('-m', '--message',
+                  type=click.STRING,
+                  help='Add message, use "text here" for sentences.',
+                  )
+    @click.option('-t', '--tag',
+                  multiple=True,
+                  type=click.STRING,
+                  callback=utils.optional_choice,
+                  envvar=PAR.POSSIBLE_TAGS,
+                  help='Add tags to actions.',
+                  )
+    @click.option('--get-inp',
+                  is_flag=True,
+                  help='Use Axona input ".inp.',
+                  )
+    @click.option('--no-cut',
+                  is_flag=True,
+                  help='Do not load ".cut" files',
+                  )
+    @click.option('--set-zero-cluster-to-noise',
+                  is_flag=True,
+                  help='All units not defined in cluster-group are noise.',
+                  )
+    @click.option('--register-depth',
+                  is_flag=True,
+                  help='Register depth from adjustments.',
+                  )
+    @click.option('--confirm-depth',
+                  is_flag=True,
+                  help=('Confirm the depths from adjustments without ' +
+                        'checking them, required by "--register-depth".'),
+                  )
+    @click.option('--overwrite',
+                  is_flag=True,
+                  help='Overwrite already registered actions.',
+                  )
+    def _register_axona_batch(
+        root, user, location, manifest, n_jobs, templates, message, tag,
+        get_inp, no_cut, set_zero_cluster_to_noise, register_depth,
+        confirm_depth, overwrite):
+        axona.register_axona_batch(
+            project_path=PAR.PROJECT_ROOT,
+            root=root,
+            manifest_path=manifest,
+            n_jobs=n_jobs,
+            user=user,
+            overwrite=overwrite,
+            templates=templates,
+            location=location,
+            message=message,
+            tag=tag,
+            get_inp=get_inp,
+            no_cut=no_cut,
             set_zero_cluster_to_noise=set_zero_cluster_to_noise,
             register_depth=register_depth,
-            correct_depth_answer=None)
+            confirm_depth=confirm_depth)
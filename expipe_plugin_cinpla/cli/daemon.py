@@ -0,0 +1,41 @@
+from expipe_plugin_cinpla.imports import *
+from expipe_plugin_cinpla.scripts import daemon
+
+
+def attach_to_cli(cli):
+    @cli.group('daemon',
+               short_help='Keep libraries and the project loaded between commands.')
+    @click.help_option('-h', '--help')
+    def _daemon():
+        '''
+        Commands are run in the daemon of the current project when the
+        environment variable EXPIPE_DAEMON=1 is set and the daemon is
+        running, otherwise in the command line process. Questions asked by
+        a command are answered in the terminal of the command line.
+        '''
+        pass
+
+    @_daemon.command('start', short_help='Start the daemon of the current project.')
+    @click.option('--foreground',
+                  is_flag=True,
+                  help='Run in this process until interrupted.',
+                  )
+    def _start(foreground):
+        if daemon.socket_path() is None:
+            raise click.UsageError('Not in an expipe project')
+        if foreground:
+            daemon.serve()
+        else:
+            daemon.start()
+
+    @_daemon.command('stop', short_help='Stop the daemon of the current project.')
+    def _stop():
+        daemon.stop()
+
+    @_daemon.command('status', short_help='Show if the daemon is running.')
+    def _status():
+        path = daemon.socket_path()
+        if daemon.status(path):
+            print('The daemon is running on "{}"'.format(path))
+        else:
+            print('No daemon is running')
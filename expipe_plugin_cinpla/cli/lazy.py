@@ -0,0 +1,84 @@
+from expipe_plugin_cinpla.imports import *
+
+_loaded = {}
+
+
+def load_command(module, name):
+    '''
+    Import module, attach its commands to an empty group with its
+    attach_to_cli and return the command name.
+    '''
+    if module not in _loaded:
+        group = click.Group()
+        importlib.import_module(module).attach_to_cli(group)
+        _loaded[module] = group
+    return _loaded[module].commands[name]
+
+
+class LazyCommand(click.Command):
+    '''
+    Placeholder with the name and short help of a command which is only
+    imported, see load_command, when it is invoked, its help is shown or
+    its arguments are completed.
+    '''
+    def __init__(self, name, module, short_help, forward=True):
+        super(LazyCommand, self).__init__(
+            name, short_help=short_help, help=short_help)
+        self.module = module
+        self.forward = forward
+
+    @property
+    def command(self):
+        return load_command(self.module, self.name)
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        if self.forward and not extra.get('resilient_parsing') and \
+                '--help' not in args and '-h' not in args:
+            from expipe_plugin_cinpla.scripts import daemon
+            if daemon.enabled():
+                command_path = []
+                ctx = parent
+                while ctx is not None and ctx.parent is not None:
+                    command_path.insert(0, ctx.info_name)
+                    ctx = ctx.parent
+                code = daemon.forward(command_path + [info_name] + list(args))
+                if code is not None:
+                    raise click.exceptions.Exit(code)
+        # the context refers to the loaded command which is then invoked
+        return self.command.make_context(
+            info_name, args, parent=parent, **extra)
+
+    def invoke(self, ctx):
+        return self.command.invoke(ctx)
+
+    def get_params(self, ctx):
+        return self.command.get_params(ctx)
+
+    def get_help(self, ctx):
+        return self.command.get_help(ctx)
+
+    def get_usage(self, ctx):
+        return self.command.get_usage(ctx)
+
+    def shell_complete(self, ctx, incomplete):
+        return self.command.shell_complete(ctx, incomplete)
+
+
+def add_lazy_commands(group, commands, forward=True):
+    '''
+    Add a LazyCommand to group for each name in commands, a dict of
+    {name: (module, short_help)}. With forward the commands run in the
+    daemon when it is enabled and running, see scripts.daemon.
+    '''
+    for name, (module, short_help) in commands.items():
+        group.add_command(LazyCommand(name, module, short_help, forward))
+
+
+class LazyGroup(click.Group):
+    '''
+    Group with the commands in lazy_commands, see add_lazy_commands.
+    '''
+    def __init__(self, *args, **kwargs):
+        lazy_commands = kwargs.pop('lazy_commands', {})
+        super(LazyGroup, self).__init__(*args, **kwargs)
+        add_lazy_commands(self, lazy_commands)
@@ -1,25 +1,76 @@
 import expipe_plugin_cinpla
 from expipecli.utils.plugin import IPlugin
 from expipe_plugin_cinpla.imports import *
-from . import adjust
-from . import axona as AX
-from . import misc
-from . import openephys as OE
-from . import entity
-from . import surgery
+from expipe_plugin_cinpla import import_profile
+from .lazy import LazyGroup, add_lazy_commands
+
+# command modules are imported when a command is used, the short help shown
+# in the command lists must match the short help of the command
+COMMANDS = {
+    'annotate': ('expipe_plugin_cinpla.cli.misc',
+                 'Parse info about recorded units'),
+    'spikesort': ('expipe_plugin_cinpla.cli.misc',
+                  'Spikesort with klustakwik.'),
+    'archive': ('expipe_plugin_cinpla.cli.misc',
+                'Archive raw data with a parallel compressor.'),
+    'sync': ('expipe_plugin_cinpla.cli.misc',
+             'Mirror the data of an action to a local path or an SSH host.'),
+    'depth-table': ('expipe_plugin_cinpla.cli.misc',
+                    'Depth of every recording in the project.'),
+    'adjust': ('expipe_plugin_cinpla.cli.adjust',
+               'Parse info about drive depth adjustment'),
+    'migrate-adjustments': ('expipe_plugin_cinpla.cli.adjust',
+                            'Move adjustment modules to the adjustment log.'),
+}
+
+# commands never forwarded to the daemon, the queue worker and its jobs
+# must not be children of the daemon
+LOCAL_COMMANDS = {
+    'queue': ('expipe_plugin_cinpla.cli.queue', 'Queue processing jobs.'),
+    'daemon': ('expipe_plugin_cinpla.cli.daemon',
+               'Keep libraries and the project loaded between commands.'),
+}
+
+REGISTER_COMMANDS = {
+    'surgery': ('expipe_plugin_cinpla.cli.surgery',
+                'Register a surgery action.'),
+    'perfusion': ('expipe_plugin_cinpla.cli.surgery',
+                  'Register a perfusion action. ' +
+                  'Also tags the entity as perfused and euthanised.'),
+    'entity': ('expipe_plugin_cinpla.cli.entity', 'Register a entity.'),
+    'openephys': ('expipe_plugin_cinpla.cli.openephys',
+                  'Register an open-ephys recording-action to database.'),
+    'process': ('expipe_plugin_cinpla.cli.openephys',
+                'Generate a klusta .dat and .prm files from openephys directory.'),
+    'axona': ('expipe_plugin_cinpla.cli.axona',
+              'Register an axona recording-action to database.'),
+    'axona-batch': ('expipe_plugin_cinpla.cli.axona',
+                    'Register all axona recordings under a directory.'),
+}
 
 
 class CinplaPlugin(IPlugin):
     def attach_to_cli(self, cli):
-        @cli.group(short_help='Tools for registering.')
+        @cli.group(short_help='Tools for registering.', cls=LazyGroup,
+                   lazy_commands=REGISTER_COMMANDS)
         @click.help_option('-h', '--help')
         @click.pass_context
         def register(ctx):
             pass
 
-        misc.attach_to_cli(cli)
-        adjust.attach_to_cli(cli)
-        surgery.attach_to_cli(register)
-        entity.attach_to_cli(register)
-        OE.attach_to_cli(register)
-        AX.attach_to_cli(register)
+        add_lazy_commands(cli, COMMANDS)
+        add_lazy_commands(cli, LOCAL_COMMANDS, forward=False)
+
+        def profile_imports(ctx, param, value):
+            if value:
+                import_profile.enable(
+                    value if param.name == 'profile_imports_json' else None)
+
+        cli.params.append(click.Option(
+            ['--profile-imports'], is_flag=True, hidden=True, is_eager=True,
+            expose_value=False, callback=profile_imports,
+            help='Report the cost of lazy imports at exit.'))
+        cli.params.append(click.Option(
+            ['--profile-imports-json'], type=click.Path(), hidden=True,
+            is_eager=True, expose_value=False, callback=profile_imports,
+            help='Also write the lazy imports to a JSON file.'))
@@ -63,3 +63,95 @@ def attach_to_cli(cli):
             print('Sorting channel group {}'.format(channel_group))
             clusters = model.cluster(np.arange(model.n_spikes), model.channel_ids)
             model.save(spike_clusters=clusters)
+
+    @cli.command('archive',
+                 short_help='Archive raw data with a parallel compressor.')
+    @click.argument('source', type=click.Path(exists=True, file_okay=False))
+    @click.option('-o', '--output',
+                  type=click.Path(),
+                  help='Path to the archive, defaults to "<source>.tar.gz".',
+                  )
+    @click.option('--threads',
+                  type=click.INT,
+                  help='Number of compression threads, defaults to all cores.',
+                  )
+    @click.option('--level',
+                  type=click.IntRange(1, 9),
+                  default=6,
+                  help='Compression level.',
+                  )
+    @click.option('--delete',
+                  is_flag=True,
+                  help='Delete source when the archive is verified.',
+                  )
+    def archive_data(source, output, threads, level, delete):
+        from expipe_plugin_cinpla.scripts import archive
+        if delete:
+            archive.archive_and_delete(
+                source, archive_path=output, threads=threads, level=level)
+            return
+        output = output or str(source).rstrip(os.sep) + '.tar.gz'
+        archive.create_archive(source, output, threads=threads, level=level)
+        problems = archive.verify_archive(output, source)
+        if problems:
+            print('Verification failed:\n' + '\n'.join(problems))
+        else:
+            print('Verified "{}"'.format(output))
+
+    @cli.command('sync',
+                 short_help='Mirror the data of an action to a local path or an SSH host.')
+    @click.argument('action-id', type=click.STRING)
+    @click.argument('target', type=click.STRING, required=False)
+    @click.option('--streams',
+                  type=click.INT,
+                  default=4,
+                  help='Number of files transferred in parallel.',
+                  )
+    @click.option('--no-checksum',
+                  is_flag=True,
+                  help='Skip files with equal size and mtime without comparing checksums.',
+                  )
+    @click.option('--dry-run',
+                  is_flag=True,
+                  help='Only print the files that would be transferred or deleted.',
+                  )
+    @click.option('--delete',
+                  is_flag=True,
+                  help='Delete files in the target which are not in the action.',
+                  )
+    def sync_data(action_id, target, streams, no_checksum, dry_run, delete):
+        from expipe_plugin_cinpla.scripts import sync
+        target = target or getattr(PAR, 'SYNC_TARGET', None)
+        if target is None:
+            raise click.UsageError(
+                'Give a target, "[user@]host:path" or a local path, ' +
+                'or set SYNC_TARGET')
+        sync.sync_action(PAR.PROJECT, action_id, target, streams=streams,
+                         checksum=not no_checksum, dry_run=dry_run,
+                         delete=delete)
+
+    @cli.command('depth-table',
+                 short_help='Depth of every recording in the project.')
+    @click.option('-o', '--output',
+                  type=click.Path(),
+                  help='Write the table to a csv file.',
+                  )
+    @click.option('--entity-id',
+                  type=click.STRING,
+                  help='Only show recordings of this entity.',
+                  )
+    @click.option('--no-cache',
+                  is_flag=True,
+                  help='Build the table again even if nothing changed.',
+                  )
+    def depth_table(output, entity_id, no_cache):
+        from expipe_plugin_cinpla.scripts import depth
+        table = depth.depth_table(PAR.PROJECT, cache=not no_cache)
+        if entity_id is not None:
+            table = table[table['entity'] == entity_id]
+        if output is not None:
+            table.to_csv(output, index=False)
+            print('Wrote depths of {} recordings to "{}"'.format(
+                table['action'].nunique(), output))
+        else:
+            print(table.to_string(index=False))
@@ -62,9 +62,25 @@ def attach_to_cli(cli):
                   type=click.STRING,
                   help='Which templates to add',
                   )
+    @click.option('--stream',
+                  is_flag=True,
+                  help=('Copy data and convert the continuous channels in ' +
+                        'chunks with bounded memory and progress.'),
+                  )
+    @click.option('--max-memory',
+                  type=click.FLOAT,
+                  help=('MB of data held in memory with "--stream", ' +
+                        'default is the setting MAX_MEMORY or 256.'),
+                  )
+    @click.option('--n-jobs',
+                  default=1,
+                  type=click.INT,
+                  help='Number of processes used to decode ".spikes" files.',
+                  )
     def _register_openephys_recording(
         action_id, openephys_path, depth, overwrite, templates,
-        entity_id, user, session, location, message, tag, register_depth):
+        entity_id, user, session, location, message, tag, register_depth,
+        stream, max_memory, n_jobs):
         openephys.register_openephys_recording(
             project=PAR.PROJECT,
             action_id=action_id,
@@ -80,7 +96,10 @@ def attach_to_cli(cli):
             tag=tag,
             delete_raw_data=None,
             correct_depth_answer=None,
-            register_depth=register_depth)
+            register_depth=register_depth,
+            stream=stream,
+            max_memory=max_memory,
+            n_jobs=n_jobs)
 
     @cli.command('process',
                  short_help='Generate a klusta .dat and .prm files from openephys directory.')
@@ -94,5 +113,35 @@ def attach_to_cli(cli):
                   type=click.Choice(['klusta', 'mountain', 'kilosort']),
                   help='',
                   )
-    def _process_openephys(action_id, probe_path, sorter):
-        openephys.process_openephys(PAR.PROJECT, action_id, probe_path, sorter)
+    @click.option('--n-jobs',
+                  default=1,
+                  type=click.INT,
+                  help='Number of processes used to extract waveforms.',
+                  )
+    @click.option('--max-spikes-per-unit',
+                  default=1000,
+                  type=click.INT,
+                  help=('Largest number of randomly chosen waveforms ' +
+                        'extracted per unit.'),
+                  )
+    @click.option('--cpus',
+                  type=click.INT,
+                  help=('Number of cpus used to sort channel groups ' +
+                        'concurrently, default is the setting SORTING_CPUS ' +
+                        'or all cpus.'),
+                  )
+    @click.option('--memory',
+                  type=click.FLOAT,
+                  help=('Memory in MB used by concurrent sorting, default ' +
+                        'is the setting SORTING_MEMORY or all memory.'),
+                  )
+    @click.option('--no-cache',
+                  is_flag=True,
+                  help='Sort again even if the sorting is in the cache.',
+                  )
+    def _process_openephys(action_id, probe_path, sorter, n_jobs,
+                           max_spikes_per_unit, cpus, memory, no_cache):
+        openephys.process_openephys(
+            PAR.PROJECT, action_id, probe_path, sorter, n_jobs=n_jobs,
+            max_spikes_per_unit=max_spikes_per_unit, cpus=cpus,
+            memory=memory, no_cache=no_cache)
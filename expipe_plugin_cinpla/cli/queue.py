@@ -0,0 +1,121 @@
+from expipe_plugin_cinpla.imports import *
+from expipe_plugin_cinpla.scripts import queue
+
+
+def attach_to_cli(cli):
+    @cli.group('queue', short_help='Queue processing jobs.')
+    @click.help_option('-h', '--help')
+    def _queue():
+        pass
+
+    @_queue.command('submit',
+                    short_help='Queue processing of an open-ephys action.')
+    @click.argument('action-id', type=click.STRING)
+    @click.option('--probe-path',
+                  type=click.STRING,
+                  help='Path to probefile, assumed to be in expipe config directory by default.',
+                  )
+    @click.option('--sorter',
+                  default='klusta',
+                  type=click.Choice(['klusta', 'mountain', 'kilosort']),
+                  help='',
+                  )
+    @click.option('--n-jobs',
+                  default=1,
+                  type=click.INT,
+                  help='Number of processes used to extract waveforms.',
+                  )
+    @click.option('--max-spikes-per-unit',
+                  default=1000,
+                  type=click.INT,
+                  help=('Largest number of randomly chosen waveforms ' +
+                        'extracted per unit.'),
+                  )
+    @click.option('--cpus',
+                  type=click.INT,
+                  help='Number of cpus used to sort channel groups.',
+                  )
+    @click.option('--memory',
+                  type=click.FLOAT,
+                  help='Memory in MB used by concurrent sorting.',
+                  )
+    @click.option('--no-cache',
+                  is_flag=True,
+                  help='Sort again even if the sorting is in the cache.',
+                  )
+    def _submit(action_id, probe_path, sorter, n_jobs, max_spikes_per_unit,
+                cpus, memory, no_cache):
+        connection = queue.connect()
+        job_id = queue.submit(
+            connection, 'process',
+            {'action_id': action_id, 'probe_path': probe_path,
+             'sorter': sorter, 'n_jobs': n_jobs,
+             'max_spikes_per_unit': max_spikes_per_unit, 'cpus': cpus,
+             'memory': memory, 'no_cache': no_cache},
+            project_path=PAR.PROJECT_ROOT)
+        print('Submitted job {}'.format(job_id))
+
+    @_queue.command('status', short_help='Show queued and finished jobs.')
+    @click.argument('job-id', type=click.INT, required=False)
+    @click.option('--status',
+                  type=click.Choice(queue.STATUSES),
+                  help='Only show jobs with this status.',
+                  )
+    @click.option('--log',
+                  is_flag=True,
+                  help='Print the log of the job.',
+                  )
+    def _status(job_id, status, log):
+        jobs = queue.get_jobs(queue.connect(), job_id=job_id, status=status)
+        print(queue.format_jobs(jobs))
+        if log and job_id is not None and jobs and jobs[0]['log_path']:
+            with open(jobs[0]['log_path'], 'r') as f:
+                print(f.read())
+
+    @_queue.command('cancel', short_help='Cancel a queued or running job.')
+    @click.argument('job-id', type=click.INT)
+    def _cancel(job_id):
+        try:
+            queue.cancel(queue.connect(), job_id)
+        except (KeyError, ValueError) as e:
+            print(str(e))
+            return
+        print('Cancelled job {}'.format(job_id))
+
+    @_queue.command('retry', short_help='Queue a failed or cancelled job again.')
+    @click.argument('job-id', type=click.INT)
+    def _retry(job_id):
+        try:
+            queue.retry(queue.connect(), job_id)
+        except (KeyError, ValueError) as e:
+            print(str(e))
+            return
+        print('Queued job {}'.format(job_id))
+
+    @_queue.command('worker',
+                    short_help='Run queued jobs in the background.')
+    @click.option('-n', '--workers',
+                  default=1,
+                  type=click.INT,
+                  help='Number of jobs running at a time.',
+                  )
+    @click.option('--poll-interval',
+                  default=5.,
+                  type=click.FLOAT,
+                  help='Seconds between checks for new jobs.',
+                  )
+    @click.option('--once',
+                  is_flag=True,
+                  help='Stop when the queue is empty.',
+                  )
+    @click.option('--foreground',
+                  is_flag=True,
+                  help='Run in this terminal instead of in the background.',
+                  )
+    def _worker(workers, poll_interval, once, foreground):
+        if foreground:
+            queue.run_worker(num_workers=workers,
+                             poll_interval=poll_interval, once=once)
+        else:
+            queue.start_worker(num_workers=workers,
+                               poll_interval=poll_interval, once=once)
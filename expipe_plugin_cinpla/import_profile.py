@@ -0,0 +1,131 @@
+'''
+Profiling of the lazy imports in expipe_plugin_cinpla.imports. Enable with
+the environment variable EXPIPE_PROFILE_IMPORTS=1 or the hidden option
+--profile-imports, a JSON trace is written to the path in
+EXPIPE_PROFILE_IMPORTS_JSON or given with --profile-imports-json.
+'''
+import atexit
+import functools
+import json
+import os
+import sys
+import time
+import traceback
+
+ENV_VAR = 'EXPIPE_PROFILE_IMPORTS'
+JSON_ENV_VAR = 'EXPIPE_PROFILE_IMPORTS_JSON'
+
+_enabled = False
+_json_path = None
+_records = []
+_resolving = []
+_t_start = time.perf_counter()
+_skip_files = [os.path.abspath(__file__).rsplit('.', 1)[0],
+               os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'imports')]
+
+
+def enable(json_path=None):
+    '''
+    Record lazy imports from now on and report them at exit, with a JSON
+    trace written to json_path if given.
+    '''
+    global _enabled, _json_path
+    if not _enabled:
+        atexit.register(_report_at_exit)
+    _enabled = True
+    _json_path = json_path or _json_path
+
+
+def enable_from_environment():
+    json_path = os.environ.get(JSON_ENV_VAR)
+    if os.environ.get(ENV_VAR, '0') not in ('', '0') or json_path:
+        enable(json_path)
+
+
+def reset():
+    global _enabled, _json_path
+    _enabled = False
+    _json_path = None
+    del _records[:]
+
+
+def records():
+    '''
+    List of dicts with name, caller, parent, start, duration, self_duration
+    and number of new modules of each lazy import in the order resolved.
+    '''
+    result = []
+    for record in _records:
+        children = sum(r['duration'] for r in _records
+                       if r['parent'] == record['name'])
+        result.append(dict(record,
+                           self_duration=record['duration'] - children))
+    return sorted(result, key=lambda r: r['start'])
+
+
+def _caller():
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        filename = os.path.abspath(frame.filename).rsplit('.', 1)[0]
+        if filename in _skip_files or 'expipecli' in filename or \
+                filename.startswith('<frozen'):
+            continue
+        return '{}:{} in {}'.format(frame.filename, frame.lineno, frame.name)
+    return None
+
+
+def profiled(factory):
+    '''
+    Wrap a lazy import factory to record the first time it is resolved,
+    from where and how long it took.
+    '''
+    name = factory.__name__
+
+    @functools.wraps(factory)
+    def wrapper():
+        if not _enabled or any(r['name'] == name for r in _records) or \
+                name in _resolving:
+            return factory()
+        record = {'name': name, 'caller': _caller(),
+                  'parent': _resolving[-1] if _resolving else None,
+                  'start': time.perf_counter() - _t_start}
+        num_modules = len(sys.modules)
+        _resolving.append(name)
+        t_start = time.perf_counter()
+        try:
+            return factory()
+        finally:
+            record['duration'] = time.perf_counter() - t_start
+            record['new_modules'] = len(sys.modules) - num_modules
+            _resolving.pop()
+            _records.append(record)
+    return wrapper
+
+
+def format_report():
+    lines = ['{:<16} {:>10} {:>10} {:>8}  {}'.format(
+        'import', 'total ms', 'self ms', 'modules', 'first used from')]
+    for record in sorted(records(), key=lambda r: -r['duration']):
+        lines.append('{:<16} {:>10.1f} {:>10.1f} {:>8}  {}'.format(
+            record['name'], record['duration'] * 1000,
+            record['self_duration'] * 1000, record['new_modules'],
+            record['caller']))
+    total = sum(r['self_duration'] for r in records())
+    lines.append('{} lazy imports resolved in {:.1f} ms'.format(
+        len(_records), total * 1000))
+    return '\n'.join(lines)
+
+
+def dump_json(path):
+    with open(path, 'w') as f:
+        json.dump({'argv': sys.argv,
+                   'python': sys.version,
+                   'imports': records()}, f, indent=4)
+
+
+def _report_at_exit():
+    if not _enabled:
+        return
+    print(format_report(), file=sys.stderr)
+    if _json_path is not None:
+        dump_json(_json_path)
@@ -1,179 +1,329 @@
 import click
 from expipecli.utils.misc import lazy_import
+from expipe_plugin_cinpla import import_profile
+
+import_profile.enable_from_environment()
+
+# lazy_import replaces the proxy in the namespace of its caller, it must be
+# called from this module and not from a wrapper
 
 @lazy_import
+@import_profile.profiled
 def expipe():
     import expipe
     return expipe
 
 @lazy_import
+@import_profile.profiled
 def PAR():
     from expipe_plugin_cinpla.scripts.config import load_parameters
     return load_parameters()
 
 @lazy_import
+@import_profile.profiled
 def pd():
     import pandas as pd
     return pd
 
 @lazy_import
+@import_profile.profiled
 def dt():
     import datetime as dt
     return dt
 
 @lazy_import
+@import_profile.profiled
 def pathlib():
     import pathlib
     return pathlib
 
 @lazy_import
+@import_profile.profiled
 def ipywidgets():
     import ipywidgets
     return ipywidgets
 
 @lazy_import
+@import_profile.profiled
 def pyopenephys():
     import pyopenephys
     return pyopenephys
 
 @lazy_import
+@import_profile.profiled
 def openephys_io():
     from expipe_io_neuro import openephys as openephys_io
     return openephys_io
 
 @lazy_import
+@import_profile.profiled
 def pyxona():
     import pyxona
     return pyxona
 
 @lazy_import
+@import_profile.profiled
 def platform():
     import platform
     return platform
 
 @lazy_import
+@import_profile.profiled
 def csv():
     import csv
     return csv
 
 @lazy_import
+@import_profile.profiled
 def json():
     import json
     return json
 
 @lazy_import
+@import_profile.profiled
 def axona():
     from expipe_io_neuro import axona
     return axona
 
 @lazy_import
+@import_profile.profiled
 def os():
     import os
     return os
 
 @lazy_import
+@import_profile.profiled
 def shutil():
     import shutil
     return shutil
 
 @lazy_import
+@import_profile.profiled
 def datetime():
     from datetime import datetime
     return datetime
 
 @lazy_import
+@import_profile.profiled
 def timedelta():
     from datetime import timedelta
     return timedelta
 
 @lazy_import
+@import_profile.profiled
 def subprocess():
     import subprocess
     return subprocess
 
 @lazy_import
+@import_profile.profiled
 def tarfile():
     import tarfile
     return tarfile
 
 @lazy_import
+@import_profile.profiled
 def paramiko():
     import paramiko
     return paramiko
 
 @lazy_import
+@import_profile.profiled
 def getpass():
     import getpass
     return getpass
 
 @lazy_import
+@import_profile.profiled
 def tqdm():
     from tqdm import tqdm
     return tqdm
 
 @lazy_import
+@import_profile.profiled
 def scp():
     import scp
     return scp
 
 @lazy_import
+@import_profile.profiled
 def neo():
     import neo
     return neo
 
 @lazy_import
+@import_profile.profiled
 def exdir():
     import exdir
     import exdir.plugins.quantities
     return exdir
 
 @lazy_import
+@import_profile.profiled
 def pq():
     import quantities as pq
     return pq
 
 @lazy_import
+@import_profile.profiled
 def logging():
     import logging
     return logging
 
 @lazy_import
+@import_profile.profiled
 def np():
     import numpy as np
     return np
 
 @lazy_import
+@import_profile.profiled
 def copy():
     import copy
     return copy
 
 @lazy_import
+@import_profile.profiled
 def scipy():
     import scipy
     import scipy.io
+    import scipy.signal
     return scipy
 
 @lazy_import
+@import_profile.profiled
 def glob():
     import glob
     return glob
 
 @lazy_import
+@import_profile.profiled
 def el():
     import elephant as el
     return el
 
 @lazy_import
+@import_profile.profiled
 def sys():
     import sys
     return sys
 
 @lazy_import
+@import_profile.profiled
 def pprint():
     import pprint
     return pprint
 
 @lazy_import
+@import_profile.profiled
 def collections():
     import collections
     return collections
+
+@lazy_import
+@import_profile.profiled
+def time():
+    import time
+    return time
+
+@lazy_import
+@import_profile.profiled
+def futures():
+    import concurrent.futures as futures
+    return futures
+
+@lazy_import
+@import_profile.profiled
+def hashlib():
+    import hashlib
+    return hashlib
+
+@lazy_import
+@import_profile.profiled
+def re():
+    import re
+    return re
+
+@lazy_import
+@import_profile.profiled
+def sqlite3():
+    import sqlite3
+    return sqlite3
+
+@lazy_import
+@import_profile.profiled
+def signal():
+    import signal
+    return signal
+
+@lazy_import
+@import_profile.profiled
+def threading():
+    import threading
+    return threading
+
+@lazy_import
+@import_profile.profiled
+def multiprocessing():
+    import multiprocessing
+    return multiprocessing
+
+@lazy_import
+@import_profile.profiled
+def importlib():
+    import importlib
+    return importlib
+
+@lazy_import
+@import_profile.profiled
+def traceback():
+    import traceback
+    return traceback
+
+@lazy_import
+@import_profile.profiled
+def zlib():
+    import zlib
+    return zlib
+
+@lazy_import
+@import_profile.profiled
+def posixpath():
+    import posixpath
+    return posixpath
+
+@lazy_import
+@import_profile.profiled
+def stat():
+    import stat
+    return stat
+
+@lazy_import
+@import_profile.profiled
+def shlex():
+    import shlex
+    return shlex
+
+@lazy_import
+@import_profile.profiled
+def bisect():
+    import bisect
+    return bisect
+
+@lazy_import
+@import_profile.profiled
+def pickle():
+    import pickle
+    return pickle
+
+@lazy_import
+@import_profile.profiled
+def socket():
+    import socket
+    return socket
+
+@lazy_import
+@import_profile.profiled
+def struct():
+    import struct
+    return struct
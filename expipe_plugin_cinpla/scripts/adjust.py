@@ -1,29 +1,9 @@
 from expipe_plugin_cinpla.imports import *
 from . import utils
+from .adjustment_log import AdjustmentLog, migrate_adjustments
 from datetime import datetime as dt
 
 
-adjustment_template = {
-    "adjustment": {
-        "unit": "um",
-        "value": ""
-    },
-    "date": "dd.mm.yyyy:HH:MM",
-    "definition": "Adjustment length of drive",
-    "depth": {
-        "unit": "mm",
-        "value": ""
-    },
-    "experimenter": "",
-    "identifier": "drive_depth_adjustment",
-    "location": "Left, Right",
-    "name": "drive_depth_adjustment",
-    "notes": {
-        "value": ""
-    }
-}
-
-
 def register_adjustment(project, entity_id, date, adjustment, user,
                         depth, yes):
     user = user or PAR.USERNAME
@@ -41,32 +21,24 @@ def register_adjustment(project, entity_id, date, adjustment, user,
         date = dt.now()
     if isinstance(date, str):
         date = dt.strptime(date, DTIME_FORMAT)
-    datestring = date.strftime(DTIME_FORMAT)
     action_id = entity_id + '-adjustment'
     try:
         action = project.actions[action_id]
-        init = False
     except KeyError as e:
         action = project.create_action(action_id)
-        init = True
 
-    if not init:
-        deltas = []
-        for name in action.modules.keys():
-            if name.endswith('adjustment'):
-                deltas.append(int(name.split('_')[0]))
-        index = max(deltas) + 1
-        prev_depth = action.modules[
-            '{:03d}_adjustment'.format(max(deltas))].contents['depth']
-    if init:
+    if not AdjustmentLog.for_action(action).exists():
+        # histories stored as one module per adjustment are migrated once
+        migrate_adjustments(action)
+    log = AdjustmentLog.for_action(action)
+    prev_depth = log.current_depth()
+    if prev_depth is None:
         if len(depth) > 0:
             prev_depth = utils.position_to_dict(depth)
         else:
             prev_depth = utils.get_depth_from_surgery(
                 project=project, entity_id=entity_id)
-        index = 0
 
-    name = '{:03d}_adjustment'.format(index)
     if not isinstance(prev_depth, dict):
         print('Unable to retrieve previous depth.')
         return
@@ -110,11 +82,8 @@ def register_adjustment(project, entity_id, date, adjustment, user,
                  for pos_key in sorted(val, key=lambda x: last_probe(x)))
     )
 
-    adjustment_template['depth'] = current
-    adjustment_template['adjustment'] = adjustment_dict
-    adjustment_template['experimenter'] = user
-    adjustment_template['date'] = datestring
-    action.create_module(name=name, contents=adjustment_template)
+    log.append(date, adjustment_dict, current, user=user)
+    utils.invalidate_depth_timeline(project, entity_id)
 
     action.type = 'Adjustment'
     action.entities = [entity_id]
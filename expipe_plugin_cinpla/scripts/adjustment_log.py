@@ -0,0 +1,233 @@
+from expipe_plugin_cinpla.imports import *
+
+LOG_NAME = 'adjustments'
+LOG_VERSION = 1
+LOG_DTYPE = [('index', '<i4'), ('date', '<i8'), ('key', 'S32'),
+             ('probe', '<i4'), ('delta', '<f8'), ('depth', '<f8'),
+             ('user', 'S64')]
+
+
+def _probe_number(probe_key):
+    return int(probe_key.split('_')[-1])
+
+
+def _encode(value, size):
+    encoded = str(value).encode('utf-8')
+    if len(encoded) > size:
+        raise ValueError('"{}" is longer than {} bytes'.format(value, size))
+    return encoded
+
+
+class AdjustmentLog:
+    '''
+    Append-only log of drive adjustments stored as fixed size records in
+    "<path>.dat", one record per location key and probe for each
+    adjustment, with a head "<path>.json" holding the number of records,
+    the next adjustment index and the current depth. Depths and deltas are
+    in mm and dates in seconds since the epoch.
+    '''
+    def __init__(self, path):
+        path = pathlib.Path(path)
+        self.dat_path = path.with_suffix('.dat')
+        self.head_path = path.with_suffix('.json')
+        self._head = None
+
+    @classmethod
+    def for_action(cls, action):
+        '''
+        The log in the data directory of the adjustment action.
+        '''
+        return cls(action._backend.path / 'data' / LOG_NAME)
+
+    def exists(self):
+        return self.head_path.exists()
+
+    @property
+    def head(self):
+        if self._head is None:
+            if self.exists():
+                with self.head_path.open('r') as f:
+                    self._head = json.load(f)
+            else:
+                self._head = {'version': LOG_VERSION, 'num_records': 0,
+                              'next_index': 0, 'current': {},
+                              'last_date': None}
+        return self._head
+
+    def __len__(self):
+        return self.head['next_index']
+
+    @property
+    def next_index(self):
+        return self.head['next_index']
+
+    def current_depth(self):
+        '''
+        Depth after the last adjustment as {key: {probe_key: depth}}, None
+        if the log is empty.
+        '''
+        if self.head['next_index'] == 0:
+            return None
+        return {key: {probe_key: pq.Quantity(value, 'mm')
+                      for probe_key, value in probes.items()}
+                for key, probes in self.head['current'].items()}
+
+    def append(self, date, adjustment, depth, user=None):
+        '''
+        Add an adjustment to the log.
+
+        Parameters
+        ----------
+        date : datetime of the adjustment
+        adjustment : {key: {probe_key: quantity}} adjusted length, missing
+            probes are not adjusted
+        depth : {key: {probe_key: quantity}} depth after the adjustment
+
+        Returns
+        -------
+        index of the adjustment
+        '''
+        head = self.head
+        index = head['next_index']
+        timestamp = int(np.datetime64(date, 's').astype('<i8'))
+        records = []
+        for key in sorted(depth):
+            for probe_key in sorted(depth[key], key=_probe_number):
+                delta = adjustment.get(key, {}).get(probe_key)
+                delta = 0. if delta is None else float(
+                    pq.Quantity(delta).rescale('mm').magnitude)
+                records.append((
+                    index, timestamp, _encode(key, 32),
+                    _probe_number(probe_key), delta,
+                    float(pq.Quantity(depth[key][probe_key]).rescale(
+                        'mm').magnitude),
+                    _encode(user or '', 64)))
+        records = np.array(records, dtype=LOG_DTYPE)
+        self.dat_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(str(self.dat_path), 'ab') as f:
+            # drop records written after the head by an interrupted append
+            f.truncate(head['num_records'] * records.dtype.itemsize)
+            f.write(records.tobytes())
+        head = dict(head)
+        head['num_records'] += len(records)
+        head['next_index'] = index + 1
+        head['last_date'] = date.strftime(expipe.core.datetime_format)
+        head['current'] = {
+            key.decode('utf-8'): {} for key in np.unique(records['key'])}
+        for record in records:
+            head['current'][record['key'].decode('utf-8')][
+                'probe_{}'.format(record['probe'])] = float(record['depth'])
+        self._write_head(head)
+        return index
+
+    def _write_head(self, head):
+        self.head_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.head_path.with_name(self.head_path.name + '.tmp')
+        with tmp_path.open('w') as f:
+            json.dump(head, f, indent=4)
+        os.replace(str(tmp_path), str(self.head_path))
+        self._head = head
+
+    def read(self):
+        '''
+        Structured array of all records in the log.
+        '''
+        if self.head['num_records'] == 0:
+            return np.zeros(0, dtype=LOG_DTYPE)
+        return np.fromfile(str(self.dat_path), dtype=LOG_DTYPE,
+                           count=self.head['num_records'])
+
+    def timeline(self):
+        '''
+        Lists of the dates and depths {key: {probe_key: quantity}} of each
+        adjustment in index order.
+        '''
+        records = self.read()
+        dates, depths = [], []
+        # records of one adjustment are consecutive
+        starts = np.flatnonzero(np.diff(records['index'])) + 1
+        for selected in np.split(records, starts) if len(records) else []:
+            dates.append(
+                np.datetime64(int(selected['date'][0]), 's').item())
+            depth = {}
+            for record in selected:
+                depth.setdefault(record['key'].decode('utf-8'), {})[
+                    'probe_{}'.format(record['probe'])] = pq.Quantity(
+                        float(record['depth']), 'mm')
+            depths.append(depth)
+        return dates, depths
+
+
+def _module_index(name):
+    return int(name.split('_')[0])
+
+
+def _is_depth(value):
+    # {key: {probe_key: quantity}}, modules made from the adjustment
+    # template hold a single quantity, possibly without a value
+    return isinstance(value, dict) and len(value) > 0 and all(
+        isinstance(probes, dict) and len(probes) > 0 and all(
+            str(probe_key).startswith('probe_') and
+            isinstance(depth, pq.Quantity) and depth.dtype.kind in 'iuf'
+            for probe_key, depth in probes.items())
+        for probes in value.values())
+
+
+def read_adjustment_module(name, contents):
+    '''
+    (date, adjustment, depth) of an "NNN_adjustment" module, None if the
+    module has no date or no depth per location key and probe, as modules
+    made from the adjustment template.
+    '''
+    if re.match(r'^\d+_adjustment$', name) is None:
+        return None
+    if not _is_depth(contents.get('depth')):
+        return None
+    try:
+        date = datetime.strptime(contents['date'],
+                                 expipe.core.datetime_format)
+    except (KeyError, TypeError, ValueError):
+        return None
+    adjustment = contents.get('adjustment')
+    return (date, adjustment if _is_depth(adjustment) else {},
+            contents['depth'])
+
+
+def migrate_adjustments(action, delete_modules=False):
+    '''
+    Write the "NNN_adjustment" modules of an adjustment action to its
+    AdjustmentLog in index order, optionally deleting the modules. Modules
+    which are not read by read_adjustment_module are skipped and kept.
+
+    Returns
+    -------
+    number of adjustments migrated, 0 if the log already exists
+    '''
+    log = AdjustmentLog.for_action(action)
+    if log.exists():
+        print('Adjustments of "{}" are already migrated'.format(action.id))
+        return 0
+    adjustments = {}
+    for name in action.modules.keys():
+        if not name.endswith('adjustment'):
+            continue
+        adjustment = read_adjustment_module(
+            name, action.modules[name].contents)
+        if adjustment is None:
+            print('Skipping "{}" of "{}" without a date and depth per '
+                  'probe'.format(name, action.id))
+            continue
+        adjustments[name] = adjustment
+    names = sorted(adjustments, key=_module_index)
+    for name in names:
+        date, adjustment, depth = adjustments[name]
+        log.append(date, adjustment, depth,
+                   user=action.modules[name].contents.get('experimenter'))
+    if len(names) == 0:
+        log._write_head(log.head)
+        return 0
+    if delete_modules:
+        for name in names:
+            action.delete_module(name)
+    print('Migrated {} adjustments of "{}"'.format(len(names), action.id))
+    return len(names)
@@ -0,0 +1,222 @@
+from expipe_plugin_cinpla.imports import *
+from . import utils
+
+DEFAULT_BLOCK_SIZE = 4 * 1024 ** 2
+DEFAULT_LEVEL = 6
+
+
+def _gzip_member(data, level):
+    # wbits 31 gives a complete gzip member, concatenated members are a
+    # valid gzip file
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+class ParallelGzipWriter:
+    '''
+    Write-only file object compressing blocks of block_size bytes as
+    separate gzip members in a pool of threads, zlib releases the GIL such
+    that the blocks are compressed concurrently. The members are written
+    in order and the sha256 of the compressed output is kept.
+    '''
+    def __init__(self, filename, threads=None, level=DEFAULT_LEVEL,
+                 block_size=DEFAULT_BLOCK_SIZE):
+        self.threads = threads or os.cpu_count()
+        self.level = level
+        self.block_size = block_size
+        self.sha256 = hashlib.sha256()
+        self._file = open(str(filename), 'wb')
+        self._executor = futures.ThreadPoolExecutor(max_workers=self.threads)
+        self._pending = collections.deque()
+        self._buffer = bytearray()
+
+    def _submit(self, data):
+        self._pending.append(
+            self._executor.submit(_gzip_member, bytes(data), self.level))
+        # bound the memory used by blocks waiting to be written
+        while len(self._pending) > 2 * self.threads:
+            self._write_next()
+
+    def _write_next(self):
+        member = self._pending.popleft().result()
+        self.sha256.update(member)
+        self._file.write(member)
+
+    def write(self, data):
+        self._buffer.extend(data)
+        while len(self._buffer) >= self.block_size:
+            self._submit(self._buffer[:self.block_size])
+            del self._buffer[:self.block_size]
+        return len(data)
+
+    def close(self):
+        if self._file.closed:
+            return
+        if self._buffer:
+            self._submit(self._buffer)
+            self._buffer = bytearray()
+        while self._pending:
+            self._write_next()
+        self._executor.shutdown()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class _HashingReader:
+    def __init__(self, fileobj, sha256):
+        self.fileobj = fileobj
+        self.sha256 = sha256
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        self.sha256.update(data)
+        return data
+
+
+def _manifest_path(archive_path):
+    archive_path = pathlib.Path(archive_path)
+    return archive_path.with_name(archive_path.name + '.sha256.json')
+
+
+def create_archive(source, archive_path, threads=None, level=DEFAULT_LEVEL,
+                   block_size=DEFAULT_BLOCK_SIZE):
+    '''
+    Pack the directory source into a gzip compressed tar archive, see
+    ParallelGzipWriter, and write the size and sha256 of each file and of
+    the archive to "<archive_path>.sha256.json". Files are read once, the
+    checksums are computed while packing.
+
+    Returns
+    -------
+    manifest : dict with the archive checksum and a dict of files
+    '''
+    source = pathlib.Path(source)
+    files = {}
+    total = sum(p.stat().st_size for p in source.rglob('*') if p.is_file())
+    done = 0
+    t_start = time.time()
+    with ParallelGzipWriter(archive_path, threads=threads, level=level,
+                            block_size=block_size) as writer:
+        with tarfile.open(fileobj=writer, mode='w|') as tar:
+            for path in sorted(source.rglob('*')):
+                name = str(pathlib.PurePosixPath(
+                    source.name, *path.relative_to(source).parts))
+                info = tar.gettarinfo(str(path), arcname=name)
+                if not path.is_file():
+                    tar.addfile(info)
+                    continue
+                sha256 = hashlib.sha256()
+                with path.open('rb') as f:
+                    tar.addfile(info, _HashingReader(f, sha256))
+                files[name] = {'size': info.size,
+                               'sha256': sha256.hexdigest()}
+                done += info.size
+                utils.report_progress(
+                    'Archiving', done / max(total, 1),
+                    done / max(time.time() - t_start, 1e-9))
+    manifest = {'source': str(source),
+                'archive': pathlib.Path(archive_path).name,
+                'sha256': writer.sha256.hexdigest(),
+                'files': files}
+    with _manifest_path(archive_path).open('w') as f:
+        json.dump(manifest, f, indent=4)
+    size = sum(f['size'] for f in files.values())
+    elapsed = time.time() - t_start
+    print('Archived {} files, {:.1f} MB in {:.1f} s ({:.1f} MB/s)'.format(
+        len(files), size / 1024 ** 2, elapsed,
+        size / 1024 ** 2 / max(elapsed, 1e-9)))
+    return manifest
+
+
+def verify_archive(archive_path, source=None):
+    '''
+    Check the archive against its manifest by decompressing it, and if
+    source is given that the files in source have the sizes in the
+    manifest.
+
+    Returns
+    -------
+    list of problems, empty if the archive is valid
+    '''
+    with _manifest_path(archive_path).open('r') as f:
+        manifest = json.load(f)
+    problems = []
+    sha256 = hashlib.sha256()
+    with open(str(archive_path), 'rb') as f:
+        for block in iter(lambda: f.read(DEFAULT_BLOCK_SIZE), b''):
+            sha256.update(block)
+    if sha256.hexdigest() != manifest['sha256']:
+        problems.append('Checksum of "{}" differs'.format(archive_path))
+        return problems
+    found = set()
+    # the stream mode "r|gz" does not read multi-member gzip files
+    try:
+        with tarfile.open(str(archive_path), mode='r:gz') as tar:
+            for info in tar:
+                if not info.isfile():
+                    continue
+                found.add(info.name)
+                expected = manifest['files'].get(info.name)
+                if expected is None:
+                    problems.append('"{}" not in manifest'.format(info.name))
+                    continue
+                sha256 = hashlib.sha256()
+                f = tar.extractfile(info)
+                for block in iter(lambda: f.read(DEFAULT_BLOCK_SIZE), b''):
+                    sha256.update(block)
+                if sha256.hexdigest() != expected['sha256']:
+                    problems.append(
+                        'Checksum of "{}" differs'.format(info.name))
+    except (tarfile.TarError, OSError, EOFError) as e:
+        problems.append('Unable to read "{}": {}'.format(archive_path, e))
+        return problems
+    for name in set(manifest['files']) - found:
+        problems.append('"{}" missing in archive'.format(name))
+    if source is not None:
+        source = pathlib.Path(source)
+        for path in source.rglob('*'):
+            if not path.is_file():
+                continue
+            name = str(pathlib.PurePosixPath(
+                source.name, *path.relative_to(source).parts))
+            expected = manifest['files'].get(name)
+            if expected is None:
+                problems.append('"{}" not archived'.format(name))
+            elif path.stat().st_size != expected['size']:
+                problems.append('Size of "{}" changed'.format(name))
+    return problems
+
+
+def archive_and_delete(source, archive_path=None, threads=None,
+                       level=DEFAULT_LEVEL):
+    '''
+    Archive the directory source, verify the archive and delete source
+    only if the archive is valid. The archive is by default
+    "<source>.tar.gz" in the setting ARCHIVE_DIR or next to source.
+
+    Returns
+    -------
+    path to the archive, None if verification failed
+    '''
+    source = pathlib.Path(source)
+    if archive_path is None:
+        archive_dir = pathlib.Path(
+            getattr(PAR, 'ARCHIVE_DIR', None) or source.parent)
+        archive_path = archive_dir / (source.name + '.tar.gz')
+    archive_path = pathlib.Path(archive_path)
+    archive_path.parent.mkdir(parents=True, exist_ok=True)
+    print('Archiving "{}" to "{}"'.format(source, archive_path))
+    create_archive(source, archive_path, threads=threads, level=level)
+    problems = verify_archive(archive_path, source)
+    if problems:
+        print('Verification of "{}" failed, "{}" is not deleted:\n{}'.format(
+            archive_path, source, '\n'.join(problems)))
+        return None
+    print('Verified "{}", deleting "{}"'.format(archive_path, source))
+    shutil.rmtree(str(source))
+    return archive_path
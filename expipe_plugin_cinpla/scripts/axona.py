@@ -1,11 +1,462 @@
 from expipe_plugin_cinpla.imports import *
 from . import utils
+from .axona_cache import AxonaFileCache, read_set
+from . import units
+from . import tracking
+
+
+DEFAULT_CHUNK_SIZE = 2 ** 20
+
+
+def _scale_analog(values, gain, adc_fullscale_mv, bytes_per_sample):
+    # same scaling to uV as pyxona
+    max_value = 2 ** (8 * bytes_per_sample - 1)
+    return values.astype(float) / max_value * adc_fullscale_mv * 1000. / gain
+
+
+def generate_analog_signals_streaming(exdir_path, axona_file,
+                                      chunk_size=DEFAULT_CHUNK_SIZE):
+    '''
+    Write the .eeg and .egf signals to exdir in chunks of chunk_size
+    samples read from memory-mapped raw files, such that memory use does not
+    depend on the length of the recording. The groups, values and
+    attributes are the same as from
+    expipe_io_neuro.axona.generate_analog_signals, a signal of channel
+    <channel> is written to "LFP/LFP_timeseries_<channel>" in
+    "processing/electrophysiology/channel_group_<group>". Further files of
+    the same channel, i.e. an .egf next to an .eeg, are written to
+    "LFP_timeseries_<channel>_<extension>".
+
+    Parameters
+    ----------
+    exdir_path : path to the exdir directory
+    axona_file : AxonaFileCache
+    chunk_size : number of samples read and written at a time
+    '''
+    exdir_file = exdir.File(exdir_path, plugins=exdir.plugins.quantities)
+    elphys = exdir_file.require_group('processing').require_group(
+        'electrophysiology')
+    settings = axona_file.settings
+    adc_fullscale_mv = float(settings['ADC_fullscale_mv'])
+    filenames = sorted(glob.glob(axona_file.raw_filename('.eeg*')) +
+                       glob.glob(axona_file.raw_filename('.egf*')))
+    written = set()
+    for filename in filenames:
+        suffix = os.path.splitext(filename)[1]
+        eeg_num = suffix[4:] or '1'
+        channel_id = int(settings['EEG_ch_{}'.format(eeg_num)]) - 1
+        gain = float(settings['gain_ch_{}'.format(channel_id)])
+        raw, header = axona_file.analog(suffix)
+        bytes_per_sample = int(header['bytes_per_sample'])
+        sample_rate = float(header['sample_rate'].split()[0]) * pq.Hz
+        num_samples = len(raw)
+        channel_group_id = channel_id // 4
+        lfp = elphys.require_group(
+            'channel_group_{}'.format(channel_group_id)).require_group('LFP')
+        name = 'LFP_timeseries_{}'.format(channel_id)
+        if (channel_group_id, name) in written:
+            name += '_' + suffix[1:]
+        written.add((channel_group_id, name))
+        timeseries = lfp.require_group(name)
+        timeseries.attrs['num_samples'] = num_samples
+        timeseries.attrs['start_time'] = 0 * pq.s
+        timeseries.attrs['stop_time'] = (num_samples / sample_rate).rescale(
+            's')
+        timeseries.attrs['sample_rate'] = sample_rate
+        timeseries.attrs['electrode_identity'] = channel_id
+        timeseries.attrs['electrode_idx'] = channel_id % 4
+        timeseries.attrs['electrode_group_id'] = channel_group_id
+        # the dataset is made from a broadcast zero, which exdir writes to a
+        # memory-mapped file without allocating the whole array, and is then
+        # filled in chunks through exdir and the quantities plugin
+        data = timeseries.require_dataset('data', data=pq.Quantity(
+            np.broadcast_to(0., (num_samples,)), 'uV'))
+        for start in range(0, num_samples, chunk_size):
+            stop = min(start + chunk_size, num_samples)
+            data[start:stop] = pq.Quantity(_scale_analog(
+                raw[start:stop], gain, adc_fullscale_mv, bytes_per_sample),
+                'uV')
+        data.attrs['num_samples'] = num_samples
+        data.attrs['sample_rate'] = sample_rate
+
+
+def generate_units(exdir_path, axona_file, cluster_group=None,
+                   set_noise=False):
+    '''
+    Write spike times of each cluster in the .cut files to
+    "processing/electrophysiology/channel_group_<group>/UnitTimes/<cluster>"
+    with the cluster group label as attribute. Spikes are split by cluster
+    and labelled in one vectorized pass per tetrode.
+
+    Parameters
+    ----------
+    exdir_path : path to the exdir directory
+    axona_file : AxonaFileCache
+    cluster_group : list of (channel_group, cluster, label), see
+        units.cluster_group_rows
+    set_noise : label cluster 0 as noise if not in cluster_group
+    '''
+    table = units.label_table(units.cluster_group_rows(cluster_group))
+    exdir_file = exdir.File(exdir_path, plugins=exdir.plugins.quantities)
+    elphys = exdir_file.require_group('processing').require_group(
+        'electrophysiology')
+    tetrodes = sorted(
+        int(os.path.splitext(f)[1][1:])
+        for f in glob.glob(axona_file.raw_filename('.[0-9]*')))
+    for tetrode in tetrodes:
+        if not os.path.exists(axona_file.raw_filename(
+                '_{}.cut'.format(tetrode))):
+            print('WARNING: No ".cut" file for tetrode {}'.format(tetrode))
+            continue
+        channel_group_id = tetrode - 1
+        times = axona_file.spike_times(tetrode)
+        clusters = axona_file.cut(tetrode)
+        cluster_ids, spike_trains = units.group_spikes(times, clusters)
+        labels = units.label_clusters(
+            cluster_ids, channel_group_id, table, set_noise=set_noise)
+        unit_times = elphys.require_group(
+            'channel_group_{}'.format(channel_group_id)).require_group(
+                'UnitTimes')
+        unit_times.attrs['electrode_group_id'] = channel_group_id
+        for cluster_id, spike_train, label in zip(
+                cluster_ids, spike_trains, labels):
+            unit = unit_times.require_group(str(cluster_id))
+            unit.require_dataset('times', data=spike_train * pq.s)
+            unit.attrs['cluster_group'] = str(label)
+            unit.attrs['cluster_id'] = int(cluster_id)
+            unit.attrs['electrode_group_id'] = channel_group_id
+
+
+def process_tracking(exdir_path, axona_file, **kwargs):
+    tracking.generate_processed_tracking(exdir_path, **kwargs)
+
+
+def _conversion_stages(no_cut, get_inp, cluster_group,
+                       set_zero_cluster_to_noise, stream_analog=False,
+                       chunk_size=DEFAULT_CHUNK_SIZE):
+    '''
+    Returns a list of (stage, kwargs, dependency) where stage is the name of
+    the generator in expipe_io_neuro.axona or in this module and dependency
+    is the stage that must be finished before it can run.
+    '''
+    if stream_analog:
+        analog_stage = ('generate_analog_signals_streaming',
+                        {'chunk_size': chunk_size}, None)
+    else:
+        analog_stage = ('generate_analog_signals', {}, None)
+    stages = [
+        ('generate_tracking', {}, None),
+        ('process_tracking', {}, 'generate_tracking'),
+        analog_stage,
+        ('generate_spike_trains', {}, None),
+    ]
+    if not no_cut:
+        stages.extend([
+            ('generate_units', {'cluster_group': cluster_group,
+                                'set_noise': set_zero_cluster_to_noise},
+             'generate_spike_trains'),
+            ('generate_clusters', {}, 'generate_spike_trains'),
+        ])
+    if get_inp:
+        stages.append(('generate_inp', {}, None))
+    return stages
+
+
+LOCAL_STAGES = ['generate_analog_signals_streaming', 'generate_units',
+                'process_tracking']
+
+
+def _run_stage(stage, exdir_path, axona_file, kwargs):
+    t_start = time.time()
+    if isinstance(axona_file, str):
+        # running in a worker process, the file is opened per stage
+        axona_file = _open_axona_file(axona_file)
+    if stage in LOCAL_STAGES:
+        generator = globals()[stage]
+    else:
+        generator = getattr(axona, stage)
+    generator(exdir_path, axona_file, **kwargs)
+    return stage, time.time() - t_start
+
+
+def _open_axona_file(axona_filename):
+    return AxonaFileCache(
+        pyxona.File(axona_filename), axona_filename,
+        max_bytes=getattr(PAR, 'AXONA_CACHE_SIZE', None))
+
+
+def _channel_group_ids(axona_filename):
+    '''
+    Channel groups of the tetrode files, of the tetrodes with a .cut file
+    and of the channels in the .eeg and .egf files.
+    '''
+    basename, _ = os.path.splitext(str(axona_filename))
+    tetrodes = sorted(int(os.path.splitext(f)[1][1:])
+                      for f in glob.glob(basename + '.[0-9]*'))
+    cut = [t for t in tetrodes
+           if os.path.exists('{}_{}.cut'.format(basename, t))]
+    settings = read_set(basename + '.set')
+    analog = set()
+    for f in glob.glob(basename + '.eeg*') + glob.glob(basename + '.egf*'):
+        eeg_num = os.path.splitext(f)[1][4:] or '1'
+        analog.add((int(settings['EEG_ch_{}'.format(eeg_num)]) - 1) // 4)
+    return {'spikes': [t - 1 for t in tetrodes], 'cut': [t - 1 for t in cut],
+            'analog': sorted(analog)}
+
+
+def _require_stage_groups(exdir_path, axona_filename, stages):
+    # stages running in parallel write to the same channel groups and exdir
+    # fails when two processes make the same directory, so the groups are
+    # made before the stages are started
+    channel_groups = _channel_group_ids(axona_filename)
+    elphys = exdir.File(exdir_path).require_group(
+        'processing').require_group('electrophysiology')
+    for stage, _, _ in stages:
+        if stage in ('generate_analog_signals',
+                     'generate_analog_signals_streaming'):
+            ids = channel_groups['analog']
+        elif stage in ('generate_units', 'generate_clusters'):
+            ids = channel_groups['cut']
+        else:
+            ids = channel_groups['spikes']
+        for pattern in STAGE_GROUPS.get(stage, []):
+            prefix, _, name = pattern.rpartition('/*/')
+            if prefix != 'processing/electrophysiology':
+                continue
+            for channel_group_id in ids:
+                elphys.require_group(
+                    'channel_group_{}'.format(channel_group_id)
+                ).require_group(name)
+
+
+def _print_timings(timings, wall_time):
+    print('Conversion stage timings:')
+    for stage, elapsed in sorted(timings.items(), key=lambda x: -x[1]):
+        print('    {:<26}{:8.2f} s'.format(stage, elapsed))
+    print('    {:<26}{:8.2f} s'.format('wall time', wall_time))
+
+
+def convert_axona(exdir_path, axona_filename, axona_file, stages, n_jobs=1,
+                  convert=True):
+    '''
+    Convert an Axona session to exdir.
+
+    Parameters
+    ----------
+    exdir_path : path to the exdir directory
+    axona_filename : path to the Axona .set file
+    axona_file : pyxona.File or AxonaFileCache opened from axona_filename
+    stages : list of (stage, kwargs, dependency) from _conversion_stages
+    n_jobs : number of processes, the independent stages run in parallel
+        when larger than 1
+    convert : run expipe_io_neuro.axona.convert before the stages
+
+    Returns
+    -------
+    timings : dict with elapsed seconds per stage
+    '''
+    if n_jobs < 1:
+        raise ValueError('n_jobs must be at least 1, not {}'.format(n_jobs))
+    t_start = time.time()
+    timings = {}
+    if convert:
+        axona.convert(axona_file, exdir_path)
+        timings['convert'] = time.time() - t_start
+    if n_jobs == 1:
+        for n, (stage, kwargs, _) in enumerate(stages):
+            _, timings[stage] = _run_stage(
+                stage, exdir_path, axona_file, kwargs)
+            utils.report_progress('Converting', (n + 1) / len(stages))
+        if isinstance(axona_file, AxonaFileCache):
+            print(axona_file)
+        _print_timings(timings, time.time() - t_start)
+        return timings
+    _require_stage_groups(exdir_path, axona_filename, stages)
+    pending = list(stages)
+    running = {}
+    with futures.ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        while pending or running:
+            for item in list(pending):
+                stage, kwargs, dependency = item
+                if dependency is None or dependency in timings:
+                    pending.remove(item)
+                    future = executor.submit(
+                        _run_stage, stage, str(exdir_path),
+                        str(axona_filename), kwargs)
+                    running[future] = stage
+            if not running:
+                raise ValueError(
+                    'Unable to resolve dependencies of {}'.format(
+                        [item[0] for item in pending]))
+            done, _ = futures.wait(
+                running, return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                del running[future]
+                stage, elapsed = future.result()
+                timings[stage] = elapsed
+                print('Finished {} in {:.2f} s'.format(stage, elapsed))
+                utils.report_progress('Converting', sum(
+                    item[0] in timings for item in stages) / len(stages))
+    _print_timings(timings, time.time() - t_start)
+    return timings
+
+
+def _load_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r') as f:
+        return json.load(f)
+
+
+def _save_manifest(manifest, manifest_path):
+    tmp_path = str(manifest_path) + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+# source files read by each stage, relative to the basename of the .set file
+STAGE_INPUTS = {
+    'convert': ['.set'],
+    'generate_tracking': ['.pos'],
+    'process_tracking': ['.pos'],
+    'generate_analog_signals': ['.eeg*', '.egf*'],
+    'generate_analog_signals_streaming': ['.eeg*', '.egf*'],
+    'generate_spike_trains': ['.[0-9]*'],
+    'generate_units': ['.[0-9]*', '_*.cut'],
+    'generate_clusters': ['.[0-9]*', '_*.cut'],
+    'generate_inp': ['.inp'],
+}
+# exdir groups written by each stage
+STAGE_GROUPS = {
+    'generate_tracking': ['processing/tracking'],
+    'process_tracking': ['processing/tracking/camera_0/Processed'],
+    'generate_analog_signals': ['processing/electrophysiology/*/LFP'],
+    'generate_analog_signals_streaming': [
+        'processing/electrophysiology/*/LFP'],
+    'generate_spike_trains': ['processing/electrophysiology/*/EventWaveform'],
+    'generate_units': ['processing/electrophysiology/*/UnitTimes'],
+    'generate_clusters': ['processing/electrophysiology/*/Clustering'],
+}
+
+
+def _sha1(filename, block_size=2 ** 20):
+    sha1 = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def _fingerprint(filename, previous=None):
+    stat = os.stat(filename)
+    fingerprint = {'size': stat.st_size, 'mtime': stat.st_mtime}
+    if (previous is not None and previous['size'] == stat.st_size and
+            previous['mtime'] == stat.st_mtime):
+        fingerprint['sha1'] = previous['sha1']
+    else:
+        fingerprint['sha1'] = _sha1(filename)
+    return fingerprint
+
+
+def _source_manifest(axona_filename, stages, previous=None):
+    '''
+    Fingerprints (size, mtime and sha1) of the source files and the
+    parameters of each stage. Files with the same size and mtime as in the
+    previous manifest are not hashed again.
+    '''
+    previous_files = (previous or {}).get('files', {})
+    basename, _ = os.path.splitext(str(axona_filename))
+    manifest = {'axona_filename': str(axona_filename), 'files': {},
+                'stages': {}}
+    for stage, kwargs, _ in [('convert', {}, None)] + stages:
+        filenames = sorted(set(
+            f for pattern in STAGE_INPUTS[stage]
+            for f in glob.glob(basename + pattern)))
+        names = [os.path.basename(f) for f in filenames]
+        for filename, name in zip(filenames, names):
+            if name not in manifest['files']:
+                manifest['files'][name] = _fingerprint(
+                    filename, previous_files.get(name))
+        manifest['stages'][stage] = {
+            'inputs': names, 'kwargs': json.loads(json.dumps(kwargs))}
+    return manifest
+
+
+def _changed_stages(manifest, previous):
+    def sha1(files, name):
+        return files.get(name, {}).get('sha1')
+    changed = []
+    for stage, info in manifest['stages'].items():
+        previous_info = previous['stages'].get(stage)
+        if (previous_info is None or
+                previous_info['kwargs'] != info['kwargs'] or
+                previous_info['inputs'] != info['inputs'] or
+                any(sha1(manifest['files'], name) !=
+                    sha1(previous['files'], name)
+                    for name in info['inputs'])):
+            changed.append(stage)
+    return changed
+
+
+def _source_manifest_path(action):
+    return action._backend.path / 'data' / 'axona_manifest.json'
+
+
+def reimport_axona_recording(action, axona_filename, axona_file, stages,
+                             n_jobs=1):
+    '''
+    Reconvert only the exdir groups of stages whose source files or
+    parameters changed since the last conversion, typically units and
+    clusters after new .cut files are made.
+    '''
+    manifest_path = _source_manifest_path(action)
+    previous = _load_manifest(manifest_path)
+    exdir_path = utils._get_data_path(action)
+    if len(previous) == 0 or not exdir_path.exists():
+        print('No previous conversion found for "{}", '.format(action.id) +
+              'use "overwrite" to convert from scratch.')
+        return
+    manifest = _source_manifest(axona_filename, stages, previous)
+    changed = _changed_stages(manifest, previous)
+    if len(changed) == 0:
+        print('No changes in source files of "{}".'.format(action.id))
+        return action
+    if any(stage not in STAGE_GROUPS for stage in changed):
+        print('Changes in {} requires a full conversion, '.format(changed) +
+              'use "overwrite".')
+        return
+    print('Reconverting {}'.format(changed))
+    for stage in changed:
+        for pattern in STAGE_GROUPS[stage]:
+            for path in glob.glob(str(exdir_path / pattern)):
+                shutil.rmtree(path)
+    stages = [
+        (stage, kwargs, dependency if dependency in changed else None)
+        for stage, kwargs, dependency in stages if stage in changed]
+    convert_axona(exdir_path, axona_filename, axona_file, stages,
+                  n_jobs=n_jobs, convert=False)
+    _save_manifest(manifest, manifest_path)
+    return action
+
+
+def _get_entity_id(axona_filename, entity_id=None):
+    return entity_id or axona_filename.split(os.sep)[-2]
+
+
+def _get_action_id(axona_filename, axona_file, entity_id):
+    session_dtime = datetime.strftime(axona_file._start_datetime, '%d%m%y')
+    basename, _ = os.path.splitext(axona_filename)
+    session = basename[-2:]
+    return entity_id + '-' + session_dtime + '-' + session
 
 
 def register_axona_recording(
     project, action_id, axona_filename, depth, user, overwrite, templates,
     entity_id, location, message, tag, get_inp, no_cut, cluster_group,
-    set_zero_cluster_to_noise, register_depth, correct_depth_answer=None):
+    set_zero_cluster_to_noise, register_depth, correct_depth_answer=None,
+    n_jobs=1, axona_file=None, stream_analog=False,
+    chunk_size=DEFAULT_CHUNK_SIZE, reimport=False, cluster_group_file=None):
     user = user or PAR.USERNAME
     if user is None:
         print('Missing option "user".')
@@ -19,19 +470,25 @@ def register_axona_recording(
               "'{}'.".format(axona_filename))
         print('Aborting registration!')
         return
-    if len(cluster_group) == 0:
-        cluster_group = None # TODO set proper default via callback
-    entity_id = entity_id or axona_filename.split(os.sep)[-2]
-    axona_file = pyxona.File(axona_filename)
+    cluster_group = units.cluster_group_rows(cluster_group)
+    if cluster_group_file is not None:
+        cluster_group = (units.read_cluster_group(cluster_group_file) +
+                         cluster_group)
+    entity_id = _get_entity_id(axona_filename, entity_id)
+    axona_file = axona_file or _open_axona_file(axona_filename)
     if action_id is None:
-        session_dtime = datetime.strftime(axona_file._start_datetime,
-                                          '%d%m%y')
-        basename, _ = os.path.splitext(axona_filename)
-        session = basename[-2:]
-        action_id = entity_id + '-' + session_dtime + '-' + session
+        action_id = _get_action_id(axona_filename, axona_file, entity_id)
+    stages = _conversion_stages(
+        no_cut=no_cut, get_inp=get_inp, cluster_group=cluster_group,
+        set_zero_cluster_to_noise=set_zero_cluster_to_noise,
+        stream_analog=stream_analog, chunk_size=chunk_size)
     try:
         action = project.create_action(action_id)
     except KeyError as e:
+        if reimport and not overwrite:
+            return reimport_axona_recording(
+                project.actions[action_id], axona_filename, axona_file,
+                stages, n_jobs=n_jobs)
         if overwrite:
             project.delete_action(action_id)
             action = project.create_action(action_id)
@@ -60,19 +517,99 @@ def register_axona_recording(
             project.delete_action(action_id)
             return
     exdir_path = utils._make_data_path(action, overwrite)
-    axona.convert(axona_file, exdir_path)
-    axona.generate_tracking(exdir_path, axona_file)
-    axona.generate_analog_signals(exdir_path, axona_file)
-    axona.generate_spike_trains(exdir_path, axona_file)
-    if not no_cut:
-        axona.generate_units(exdir_path, axona_file,
-                             cluster_group=cluster_group,
-                             set_noise=set_zero_cluster_to_noise)
-        axona.generate_clusters(exdir_path, axona_file)
-    if get_inp:
-        axona.generate_inp(exdir_path, axona_file)
-    else:
+    if not get_inp:
         print('WARNING: Not registering Axona ".inp".')
+    convert_axona(exdir_path, axona_filename, axona_file, stages,
+                  n_jobs=n_jobs)
+    _save_manifest(_source_manifest(axona_filename, stages),
+                   _source_manifest_path(action))
     time_string = exdir.File(exdir_path).attrs['session_start_time']
     dtime = datetime.strptime(time_string, '%Y-%m-%dT%H:%M:%S')
     action.datetime = dtime
+    return action
+
+
+_batch_project = None
+
+
+def _init_batch_worker(project_path):
+    global _batch_project
+    _batch_project = expipe.get_project(path=project_path)
+
+
+def _register_batch_item(axona_filename, overwrite, kwargs):
+    project = _batch_project
+    action_id = None
+    try:
+        axona_file = _open_axona_file(axona_filename)
+        entity_id = _get_entity_id(axona_filename)
+        action_id = _get_action_id(axona_filename, axona_file, entity_id)
+        if action_id in project.actions and not overwrite:
+            return axona_filename, 'skipped', action_id, None
+        action = register_axona_recording(
+            project=project, action_id=action_id,
+            axona_filename=axona_filename, axona_file=axona_file,
+            entity_id=entity_id, overwrite=overwrite, **kwargs)
+    except Exception as e:
+        return axona_filename, 'failed', action_id, repr(e)
+    if action is None:
+        return axona_filename, 'failed', action_id, 'Registration aborted'
+    return axona_filename, 'done', action_id, None
+
+
+def register_axona_batch(
+    project_path, root, manifest_path, n_jobs, user, overwrite, templates,
+    location, message, tag, get_inp, no_cut, set_zero_cluster_to_noise,
+    register_depth, confirm_depth=False):
+    '''
+    Register every Axona .set file found under root. The action id of each
+    session is generated as in register_axona_recording and sessions that
+    are already registered are skipped. The outcome of each session is
+    stored in a manifest such that an interrupted run can be resumed, only
+    sessions which are not done or skipped in the manifest are converted.
+    Depths can not be checked while sessions are registered in parallel, so
+    register_depth requires confirm_depth, which registers the depths from
+    the adjustments without a check.
+
+    Returns
+    -------
+    manifest : dict with status, action id and error of each .set file
+    '''
+    if register_depth and not confirm_depth:
+        print('Depths are not checked in a batch, use "confirm_depth" to ' +
+              'register the depths from the adjustments without a check.')
+        return
+    root = pathlib.Path(root).absolute()
+    manifest_path = manifest_path or root / 'axona_batch_manifest.json'
+    manifest = _load_manifest(manifest_path)
+    set_files = sorted(str(p) for p in root.rglob('*.set'))
+    todo = [
+        f for f in set_files
+        if manifest.get(f, {}).get('status') not in ('done', 'skipped')]
+    print('Found {} .set files under {}, {} left to register'.format(
+        len(set_files), root, len(todo)))
+    kwargs = {
+        'depth': None, 'user': user, 'templates': templates,
+        'location': location, 'message': message, 'tag': tag,
+        'get_inp': get_inp, 'no_cut': no_cut, 'cluster_group': None,
+        'set_zero_cluster_to_noise': set_zero_cluster_to_noise,
+        'register_depth': register_depth,
+        'correct_depth_answer': confirm_depth}
+    with futures.ProcessPoolExecutor(
+        max_workers=n_jobs, initializer=_init_batch_worker,
+        initargs=(str(project_path),)) as executor:
+        jobs = [
+            executor.submit(_register_batch_item, f, overwrite, kwargs)
+            for f in todo]
+        for n, job in enumerate(futures.as_completed(jobs)):
+            axona_filename, status, action_id, error = job.result()
+            manifest[axona_filename] = {
+                'status': status, 'action_id': action_id, 'error': error}
+            _save_manifest(manifest, manifest_path)
+            print('[{}/{}] {} {} {}'.format(
+                n + 1, len(todo), status, action_id, error or ''))
+    failed = [f for f, v in manifest.items() if v['status'] == 'failed']
+    if len(failed) > 0:
+        print('Failed to register {} sessions, see {}'.format(
+            len(failed), manifest_path))
+    return manifest
@@ -0,0 +1,203 @@
+from expipe_plugin_cinpla.imports import *
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+def read_header(filename):
+    '''
+    Read the ascii header of a raw Axona file.
+
+    Returns
+    -------
+    header : dict with the header values as strings
+    offset : byte offset of the binary data following "data_start"
+    '''
+    with open(str(filename), 'rb') as f:
+        raw = f.read(64 * 1024)
+    pos = raw.find(b'data_start')
+    if pos < 0:
+        raise ValueError('No "data_start" in header of "{}"'.format(filename))
+    header = {}
+    for line in raw[:pos].decode('latin-1').splitlines():
+        key, _, value = line.strip().partition(' ')
+        if key:
+            header[key] = value.strip()
+    return header, pos + len(b'data_start')
+
+
+def read_set(filename):
+    '''
+    Read the parameters in an Axona .set file as a dict of strings.
+    '''
+    settings = {}
+    with open(str(filename), 'r', encoding='latin-1') as f:
+        for line in f:
+            key, _, value = line.strip().partition(' ')
+            if key:
+                settings[key] = value.strip()
+    return settings
+
+
+def memmap_analog(filename):
+    '''
+    Memory-mapped view of the raw samples of an Axona .eeg or .egf file.
+    '''
+    header, offset = read_header(filename)
+    bytes_per_sample = int(header['bytes_per_sample'])
+    num_key = [k for k in header if k.startswith('num_') and
+               k.endswith('_samples')]
+    if len(num_key) != 1:
+        raise ValueError('Unable to find number of samples in ' +
+                         '"{}"'.format(filename))
+    num_samples = int(header[num_key[0]])
+    dtype = {1: '<i1', 2: '<i2'}[bytes_per_sample]
+    data = np.memmap(str(filename), dtype=dtype, mode='r', offset=offset,
+                     shape=(num_samples,))
+    return data, header
+
+
+def memmap_spikes(filename):
+    '''
+    Memory-mapped view of the spikes in an Axona tetrode file ".1"-".N" as a
+    structured array with fields "timestamp" and "waveform" and shape
+    (num_spikes, num_chans).
+    '''
+    header, offset = read_header(filename)
+    num_spikes = int(header['num_spikes'])
+    dtype = np.dtype([
+        ('timestamp', '>i{}'.format(int(header['bytes_per_timestamp']))),
+        ('waveform', 'i{}'.format(int(header['bytes_per_sample'])),
+         (int(header['samples_per_spike']),))])
+    if num_spikes == 0:
+        return np.zeros((0, int(header['num_chans'])), dtype=dtype), header
+    data = np.memmap(str(filename), dtype=dtype, mode='r', offset=offset,
+                     shape=(num_spikes, int(header['num_chans'])))
+    return data, header
+
+
+def read_cut(filename):
+    '''
+    Read the cluster assignment of each spike in an Axona .cut file.
+    '''
+    with open(str(filename), 'r') as f:
+        content = f.read()
+    pos = content.find('Exact_cut_for')
+    if pos < 0:
+        raise ValueError('No "Exact_cut_for" in "{}"'.format(filename))
+    _, _, values = content[pos:].partition('\n')
+    return np.array(values.split(), dtype=int)
+
+
+def _nbytes(obj):
+    if isinstance(obj, np.memmap):
+        # pages are backed by the file and not counted as memory
+        return 0
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (list, tuple)):
+        return sum(_nbytes(v) for v in obj)
+    return 0
+
+
+class AxonaFileCache:
+    '''
+    Wrapper of a pyxona.File passed to the conversion stages in place of
+    the file. Only the stages in this package, generate_units and
+    generate_analog_signals_streaming, read through the methods below,
+    which read the raw files through memory-mapped views and reuse the
+    arrays decoded from them. The least recently used of these arrays are
+    evicted when they exceed max_bytes, memory-mapped views are not
+    counted.
+
+    The expipe_io_neuro.axona generators look up attributes like
+    analog_signals and channel_groups on the wrapped pyxona.File and
+    decode their data through pyxona, which is neither shared through this
+    cache nor counted in max_bytes. With n_jobs larger than 1 each stage
+    opens its own cache in its worker process, so nothing is shared between
+    stages.
+    '''
+    def __init__(self, axona_file, axona_filename, max_bytes=None):
+        self._file = axona_file
+        self.max_bytes = max_bytes or DEFAULT_MAX_BYTES
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        filename = str(axona_filename)
+        self._path = os.path.dirname(filename)
+        self._basename = os.path.splitext(os.path.basename(filename))[0]
+
+    def __getattr__(self, name):
+        if name == '_file':
+            raise AttributeError(name)
+        return getattr(self._file, name)
+
+    def __repr__(self):
+        return '<AxonaFileCache {} entries, {:.1f} MB, {} hits>'.format(
+            len(self._entries), self.nbytes / 1024 ** 2, self.hits)
+
+    def _get(self, key, load):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+        self.misses += 1
+        value = load()
+        size = _nbytes(value)
+        self._entries[key] = (value, size)
+        self.nbytes += size
+        self._evict()
+        return value
+
+    def _evict(self):
+        # the newest entry is kept even if it alone exceeds max_bytes
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.nbytes -= size
+
+    @property
+    def settings(self):
+        '''
+        Parameters of the .set file, see read_set.
+        '''
+        filename = self.raw_filename('.set')
+        return self._get('settings', lambda: read_set(filename))
+
+    def raw_filename(self, suffix):
+        '''
+        Path of the raw file belonging to this session with the given suffix,
+        i.e. ".eeg", ".egf2" or ".3".
+        '''
+        return os.path.join(self._path, self._basename + suffix)
+
+    def analog(self, suffix):
+        '''
+        Raw samples and header of an .eeg/.egf file, see memmap_analog.
+        '''
+        filename = self.raw_filename(suffix)
+        return self._get(('analog', suffix), lambda: memmap_analog(filename))
+
+    def spikes(self, tetrode):
+        '''
+        Spikes and header of a tetrode file, see memmap_spikes.
+        '''
+        filename = self.raw_filename('.{}'.format(tetrode))
+        return self._get(('spikes', tetrode), lambda: memmap_spikes(filename))
+
+    def spike_times(self, tetrode):
+        '''
+        Spike times in seconds of a tetrode.
+        '''
+        def load():
+            data, header = self.spikes(tetrode)
+            timebase = float(header['timebase'].split()[0])
+            return data['timestamp'][:, 0] / timebase
+        return self._get(('spike_times', tetrode), load)
+
+    def cut(self, tetrode):
+        '''
+        Cluster assignment of each spike in the .cut file of a tetrode.
+        '''
+        filename = os.path.join(
+            self._path, '{}_{}.cut'.format(self._basename, tetrode))
+        return self._get(('cut', tetrode), lambda: read_cut(filename))
@@ -7,10 +7,39 @@ def give_attrs_val(obj, value, *attrs):
             setattr(obj, attr, value)
 
 
+PARAMETERS_CACHE_DIR = os.path.join(
+    os.path.expanduser('~'), '.expipe-plugin-cinpla', 'parameters')
+
+
+class Parameters:
+    '''
+    Plugin parameters, the project is loaded from PROJECT_ROOT on the first
+    access of PROJECT.
+    '''
+    _project = None
+
+    @property
+    def PROJECT(self):
+        if self._project is None and \
+                getattr(self, 'PROJECT_ROOT', None) is not None:
+            self._project = expipe.get_project(path=self.PROJECT_ROOT)
+        return self._project
+
+    @PROJECT.setter
+    def PROJECT(self, project):
+        self._project = project
+
+    def reload(self):
+        '''
+        Load the parameters of the project in the current directory again,
+        see load_parameters.
+        '''
+        self.__dict__.clear()
+        load_parameters(self)
+
+
 def set_empty_if_no_value(PAR=None):
     if PAR is None:
-        class Parameters:
-            pass
         PAR = Parameters()
     give_attrs_val(
         PAR, list(),
@@ -28,22 +57,109 @@ def set_empty_if_no_value(PAR=None):
     return PAR
 
 
-def load_parameters(): # load global and merge
-    PAR = set_empty_if_no_value()
-    local_root, _ = expipe.config._load_local_config(pathlib.Path.cwd())
+def _find_project_root(path):
+    # same search as expipe.config._load_local_config without reading yaml
+    path = pathlib.Path(path).absolute()
+    for root in [path] + list(path.parents):
+        if (root / 'expipe.yaml').exists():
+            return root
+    return None
+
+
+def _config_files(root, project_id=None):
+    config_home = pathlib.Path.home() / '.config' / 'expipe'
+    files = [root / 'expipe.yaml', root / 'modules' / 'settings.yaml',
+             config_home / 'config.yaml']
+    if project_id is not None:
+        files.append((config_home / project_id / project_id).with_suffix(
+            '.yaml'))
+    return files
+
+
+def _mtimes(files):
+    mtimes = {}
+    for path in files:
+        try:
+            mtimes[str(path)] = os.stat(str(path)).st_mtime_ns
+        except OSError:
+            mtimes[str(path)] = None
+    return mtimes
+
+
+def _cache_path(root):
+    name = hashlib.sha1(str(root).encode('utf-8')).hexdigest()
+    return pathlib.Path(
+        os.environ.get('EXPIPE_PARAMETERS_CACHE_DIR', PARAMETERS_CACHE_DIR),
+        name + '.pkl')
+
+
+def _read_cache(root):
     try:
-        project = expipe.get_project(path=local_root)
-        config = project.config
-    except:
-        return PAR
-    PAR.PROJECT_ID = config['project']
-    PAR.PROJECT_ROOT = local_root
-    PAR.PROJECT = project
-    PAR.USERNAME = config.get('username')
-    PAR.LOCATION = config.get('location')
-    PAR.CONFIG = config
+        with _cache_path(root).open('rb') as f:
+            cached = pickle.load(f)
+    except Exception:
+        return None
+    if cached.get('root') != str(root) or \
+            cached.get('mtimes') != _mtimes(cached['mtimes']):
+        return None
+    return cached['parameters']
+
+
+def _write_cache(root, parameters, mtimes):
+    cache_path = _cache_path(root)
+    tmp_path = cache_path.with_name(
+        cache_path.name + '.{}.tmp'.format(os.getpid()))
     try:
-        PAR.__dict__.update(project.modules['settings'].contents)
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with tmp_path.open('wb') as f:
+            pickle.dump({'root': str(root), 'mtimes': mtimes,
+                         'parameters': parameters}, f)
+        os.replace(str(tmp_path), str(cache_path))
+    except Exception:
+        # parameters that can not be pickled are read from the project
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def _resolve_parameters(root):
+    project = expipe.get_project(path=root)
+    config = project.config
+    parameters = {
+        'PROJECT_ID': config['project'],
+        'PROJECT_ROOT': root,
+        'USERNAME': config.get('username'),
+        'LOCATION': config.get('location'),
+        'CONFIG': config}
+    try:
+        parameters.update(project.modules['settings'].contents)
     except KeyError:
         pass
+    return project, parameters
+
+
+def load_parameters(PAR=None): # load global and merge
+    '''
+    Parameters of the project in the current directory. The resolved
+    parameters are cached in PARAMETERS_CACHE_DIR until expipe.yaml, the
+    settings module or the expipe config files change, and the project is
+    only loaded when PAR.PROJECT is used. The parameters are set on PAR if
+    given.
+    '''
+    PAR = set_empty_if_no_value(PAR)
+    root = _find_project_root(pathlib.Path.cwd())
+    if root is None:
+        return PAR
+    parameters = _read_cache(root)
+    if parameters is None:
+        # modification times from before reading, a change while reading
+        # invalidates the cache
+        mtimes = _mtimes(_config_files(root))
+        try:
+            project, parameters = _resolve_parameters(root)
+        except:
+            return PAR
+        PAR.PROJECT = project
+        mtimes.update(_mtimes(_config_files(root, parameters['PROJECT_ID'])))
+        _write_cache(root, parameters, mtimes)
+    PAR.__dict__.update(parameters)
     return PAR
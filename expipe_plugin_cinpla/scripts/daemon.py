@@ -0,0 +1,328 @@
+from expipe_plugin_cinpla.imports import *
+from .config import _find_project_root
+from . import utils
+
+ENV_VAR = 'EXPIPE_DAEMON'
+DEFAULT_DAEMON_DIR = os.path.join(
+    os.path.expanduser('~'), '.expipe-plugin-cinpla', 'daemon')
+PRELOAD = ['numpy', 'scipy.signal', 'pandas', 'quantities', 'exdir',
+           'expipe', 'neo', 'expipe_io_neuro', 'spikeextractors',
+           'spiketoolkit']
+
+_serving = False
+_stopping = False
+
+
+def enabled():
+    '''
+    Commands are forwarded to a running daemon if the environment variable
+    EXPIPE_DAEMON is set to anything but "0", and never from the daemon.
+    '''
+    return not _serving and os.environ.get(ENV_VAR, '0') not in ('', '0')
+
+
+def daemon_dir():
+    return pathlib.Path(getattr(PAR, 'DAEMON_DIR', None) or DEFAULT_DAEMON_DIR)
+
+
+def socket_path(path=None):
+    '''
+    Path of the socket of the daemon serving the project containing path,
+    the current directory by default, None outside a project.
+    '''
+    root = _find_project_root(path or pathlib.Path.cwd())
+    if root is None:
+        return None
+    name = hashlib.sha1(str(root).encode('utf-8')).hexdigest()[:16]
+    return daemon_dir() / (name + '.sock')
+
+
+def _send(connection, message):
+    data = json.dumps(message).encode('utf-8')
+    connection.sendall(struct.pack('>I', len(data)) + data)
+
+
+def _recv_exactly(connection, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            return None
+        data.extend(chunk)
+    return bytes(data)
+
+
+def _recv(connection):
+    header = _recv_exactly(connection, 4)
+    if header is None:
+        return None
+    data = _recv_exactly(connection, struct.unpack('>I', header)[0])
+    return None if data is None else json.loads(data.decode('utf-8'))
+
+
+class _SocketStream:
+    '''
+    File-like object sending written text as messages of kind.
+    '''
+    def __init__(self, connection, kind):
+        self.connection = connection
+        self.kind = kind
+
+    def write(self, text):
+        if text:
+            _send(self.connection, {'type': self.kind, 'text': text})
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+class _SocketInput:
+    '''
+    File-like object reading lines from the standard input of the
+    forwarding command line, see forward.
+    '''
+    def __init__(self, connection):
+        self.connection = connection
+
+    def readline(self, size=-1):
+        _send(self.connection, {'type': 'input'})
+        message = _recv(self.connection)
+        return '' if message is None else message['text']
+
+    def read(self, size=-1):
+        return self.readline()
+
+    def isatty(self):
+        return False
+
+
+def _run_request(connection, cli):
+    # runs in the forked child, the exit code is sent as the last message
+    request = _recv(connection)
+    if request is None:
+        return
+    if request.get('stop'):
+        os.kill(os.getppid(), signal.SIGTERM)
+        _send(connection, {'type': 'exit', 'code': 0})
+        return
+    os.chdir(request['cwd'])
+    os.environ.clear()
+    os.environ.update(request['env'])
+    # the settings and config may have changed since the daemon started
+    PAR.reload()
+    # questions are answered in the terminal of the command line
+    sys.stdin = _SocketInput(connection)
+    sys.stdout = _SocketStream(connection, 'stdout')
+    sys.stderr = _SocketStream(connection, 'stderr')
+    utils.set_progress_callback(
+        lambda stage, fraction, throughput: _send(connection, {
+            'type': 'progress', 'stage': stage, 'fraction': fraction,
+            'throughput': throughput}))
+    code = 0
+    try:
+        cli.main(args=request['args'], prog_name='expipe',
+                 standalone_mode=False)
+    except click.exceptions.Exit as e:
+        code = e.exit_code
+    except click.ClickException as e:
+        e.show(file=sys.stderr)
+        code = e.exit_code
+    except click.Abort:
+        print('Aborted!', file=sys.stderr)
+        code = 1
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else int(e.code is not None)
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    _send(connection, {'type': 'exit', 'code': code})
+
+
+def serve(preload=PRELOAD, path=None):
+    '''
+    Import the modules in preload, open the project in the current
+    directory and serve commands on a Unix socket, see socket_path. Each
+    command runs in a forked process with the loaded modules and the
+    parameters of the project loaded again, see Parameters.reload.
+    '''
+    global _serving
+    from expipe_plugin_cinpla.cli.main import CinplaPlugin
+    path = pathlib.Path(path or socket_path())
+    for module in preload:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            print('Unable to preload {}: {}'.format(module, e))
+    cli = click.Group('expipe')
+    CinplaPlugin().attach_to_cli(cli)
+    for name in cli.list_commands(None):
+        # import the command modules before forking
+        if hasattr(cli.commands[name], 'command'):
+            cli.commands[name].command
+    PAR.PROJECT
+    _serving = True
+    path.parent.mkdir(parents=True, exist_ok=True)
+    os.chmod(str(path.parent), 0o700)
+    if path.exists():
+        path.unlink()
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(path))
+    server.listen(16)
+    # wake up regularly to see if the daemon is stopped
+    server.settimeout(0.5)
+
+    def on_stop(*args):
+        global _stopping
+        _stopping = True
+
+    # children are reaped automatically
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, on_stop)
+    print('Serving "{}" on "{}"'.format(PAR.PROJECT_ROOT, path))
+    sys.stdout.flush()
+    try:
+        while not _stopping:
+            try:
+                connection, _ = server.accept()
+            except socket.timeout:
+                continue
+            connection.settimeout(None)
+            if os.fork() == 0:
+                server.close()
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                try:
+                    _run_request(connection, cli)
+                finally:
+                    connection.close()
+                    os._exit(0)
+            connection.close()
+    finally:
+        server.close()
+        if path.exists():
+            path.unlink()
+
+
+def forward(args, path=None):
+    '''
+    Run the command line args in the daemon, print its output and answer
+    its reads from the standard input with lines read here.
+
+    Returns
+    -------
+    exit code of the command, None if no daemon is running
+    '''
+    path = path or socket_path()
+    if path is None or not pathlib.Path(path).exists():
+        return None
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(str(path))
+    except OSError:
+        # the socket is left by a daemon that is not running
+        connection.close()
+        return None
+    try:
+        _send(connection, {'args': list(args), 'cwd': os.getcwd(),
+                           'env': dict(os.environ)})
+        while True:
+            message = _recv(connection)
+            if message is None:
+                print('The daemon stopped before the command finished',
+                      file=sys.stderr)
+                return 1
+            if message['type'] == 'stdout':
+                sys.stdout.write(message['text'])
+                sys.stdout.flush()
+            elif message['type'] == 'stderr':
+                sys.stderr.write(message['text'])
+                sys.stderr.flush()
+            elif message['type'] == 'input':
+                _send(connection, {'type': 'input',
+                                   'text': sys.stdin.readline()})
+            elif message['type'] == 'progress':
+                utils.report_progress(message['stage'], message['fraction'],
+                                      message['throughput'])
+                if message['fraction'] is not None and sys.stderr.isatty():
+                    sys.stderr.write('\r{} {:.0f} %{}'.format(
+                        message['stage'], 100 * message['fraction'],
+                        '\n' if message['fraction'] >= 1 else ''))
+                    sys.stderr.flush()
+            elif message['type'] == 'exit':
+                return message['code']
+    finally:
+        connection.close()
+
+
+def start(path=None, log_path=None):
+    '''
+    Start serve in a background process for the project in the current
+    directory with its output in "<socket>.log".
+    '''
+    path = pathlib.Path(path or socket_path())
+    if status(path):
+        print('The daemon is already running on "{}"'.format(path))
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    log_path = log_path or path.with_suffix('.log')
+    with open(str(log_path), 'a') as log:
+        subprocess.Popen([sys.executable, '-m', __name__, str(path)],
+                         stdout=log, stderr=subprocess.STDOUT,
+                         stdin=subprocess.DEVNULL, start_new_session=True)
+    for _ in range(600):
+        if status(path):
+            print('Started the daemon on "{}"'.format(path))
+            return
+        time.sleep(0.1)
+    print('The daemon did not start, see "{}"'.format(log_path))
+
+
+def status(path=None):
+    '''
+    True if a daemon accepts connections on the socket.
+    '''
+    path = path or socket_path()
+    if path is None or not pathlib.Path(path).exists():
+        return False
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(str(path))
+        return True
+    except OSError:
+        return False
+    finally:
+        connection.close()
+
+
+def stop(path=None):
+    '''
+    Stop the daemon on the socket.
+    '''
+    path = path or socket_path()
+    if not status(path):
+        print('No daemon is running')
+        return False
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.connect(str(path))
+    try:
+        _send(connection, {'stop': True})
+        _recv(connection)
+    finally:
+        connection.close()
+    for _ in range(100):
+        if not pathlib.Path(path).exists():
+            print('Stopped the daemon on "{}"'.format(path))
+            return True
+        time.sleep(0.1)
+    print('The daemon on "{}" did not stop'.format(path))
+    return False
+
+
+if __name__ == '__main__':
+    # the command line imports this module by its name, not as __main__
+    from expipe_plugin_cinpla.scripts import daemon
+    daemon.serve(path=sys.argv[1])
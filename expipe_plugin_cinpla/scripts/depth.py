@@ -0,0 +1,138 @@
+from expipe_plugin_cinpla.imports import *
+from . import utils
+
+COLUMNS = ['entity', 'action', 'datetime', 'key', 'probe', 'depth']
+CACHE_NAME = 'depth_table.pkl'
+
+
+def _to_mm(value):
+    return float(pq.Quantity(value).rescale('mm').magnitude)
+
+
+def _depth_rows(entity_id, date, depth):
+    return [(entity_id, date, key, probe, _to_mm(value))
+            for key, probes in depth.items()
+            for probe, value in probes.items()]
+
+
+def entity_depths(project, entity_id):
+    '''
+    DataFrame (entity, date, key, probe, depth) of the implantation depth
+    from surgery, dated before all adjustments, and the depth after each
+    adjustment of entity_id in mm, see utils.get_depth_timeline.
+    '''
+    rows = []
+    timeline = utils.get_depth_timeline(project, entity_id)
+    if timeline is not None:
+        rows.extend(_depth_rows(entity_id, pd.Timestamp.min,
+                                timeline.initial or {}))
+        for date, depth in zip(timeline.dates, timeline.depths):
+            rows.extend(_depth_rows(entity_id, pd.Timestamp(date), depth))
+    return pd.DataFrame(rows, columns=['entity', 'date', 'key', 'probe',
+                                       'depth'])
+
+
+def recordings(project):
+    '''
+    DataFrame (entity, action, datetime) of the recording actions with one
+    entity and a datetime.
+    '''
+    rows = []
+    for action_id in project.actions.keys():
+        action = project.actions[action_id]
+        if action.type != 'Recording' or len(action.entities) != 1 or \
+                action.datetime is None:
+            continue
+        rows.append((action.entities[0], action_id,
+                     pd.Timestamp(action.datetime)))
+    return pd.DataFrame(rows, columns=['entity', 'action', 'datetime'])
+
+
+def align_depths(recordings, depths):
+    '''
+    Depth of each recording from the last depth of its entity, key and
+    probe strictly before the recording.
+
+    Parameters
+    ----------
+    recordings : DataFrame with the columns entity, action and datetime
+    depths : DataFrame with the columns entity, date, key, probe and depth
+
+    Returns
+    -------
+    DataFrame with the columns entity, action, datetime, key, probe and
+    depth sorted by entity, datetime, key and probe
+    '''
+    recordings = recordings.astype(
+        {'entity': object, 'action': object, 'datetime': 'datetime64[ns]'})
+    depths = depths.astype({'entity': object, 'key': object, 'probe': object,
+                            'date': 'datetime64[ns]', 'depth': float})
+    probes = depths[['entity', 'key', 'probe']].drop_duplicates()
+    left = recordings.merge(probes, on='entity').sort_values('datetime')
+    right = depths.sort_values('date')
+    table = pd.merge_asof(
+        left, right, left_on='datetime', right_on='date',
+        by=['entity', 'key', 'probe'], direction='backward',
+        allow_exact_matches=False)
+    table = table.dropna(subset=['depth'])[COLUMNS]
+    return table.sort_values(
+        ['entity', 'datetime', 'key', 'probe']).reset_index(drop=True)
+
+
+def _fingerprint(project):
+    # modification times of the action attributes, modules and adjustment
+    # logs, changed when actions, modules or adjustments are added or edited
+    sha256 = hashlib.sha256()
+    actions_path = pathlib.Path(project.path) / 'actions'
+    for entry in sorted(os.scandir(str(actions_path)), key=lambda e: e.name):
+        for name in ['attributes.yaml', 'modules',
+                     os.path.join('data', 'adjustments.json')]:
+            path = os.path.join(entry.path, name)
+            if not os.path.exists(path):
+                continue
+            sha256.update('{} {} {}'.format(
+                entry.name, name, os.stat(path).st_mtime_ns).encode('utf-8'))
+            if name == 'modules':
+                for module in sorted(os.scandir(path), key=lambda e: e.name):
+                    sha256.update('{} {}'.format(
+                        module.name,
+                        module.stat().st_mtime_ns).encode('utf-8'))
+    return sha256.hexdigest()
+
+
+def _cache_path(project):
+    cache_dir = getattr(PAR, 'DEPTH_CACHE_DIR', None)
+    if cache_dir is None:
+        return pathlib.Path(project.path) / '.cache' / CACHE_NAME
+    return pathlib.Path(cache_dir) / (
+        pathlib.Path(project.path).name + '_' + CACHE_NAME)
+
+
+def depth_table(project, cache=True):
+    '''
+    DataFrame (entity, action, datetime, key, probe, depth) with the depth
+    in mm of every recording in project, see align_depths. Recordings
+    before the first adjustment get the depth from surgery. The table is
+    pickled in "<project>/.cache" or the setting DEPTH_CACHE_DIR and read
+    from there until actions or modules in the project change.
+    '''
+    cache_path = _cache_path(project)
+    fingerprint = _fingerprint(project)
+    if cache and cache_path.exists():
+        with cache_path.open('rb') as f:
+            cached = pickle.load(f)
+        if cached['fingerprint'] == fingerprint:
+            return cached['table']
+    records = recordings(project)
+    depths = [entity_depths(project, entity_id)
+              for entity_id in records['entity'].unique()]
+    depths = pd.concat(depths) if depths else pd.DataFrame(
+        columns=['entity', 'date', 'key', 'probe', 'depth'])
+    table = align_depths(records, depths)
+    if cache:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+        with tmp_path.open('wb') as f:
+            pickle.dump({'fingerprint': fingerprint, 'table': table}, f)
+        os.replace(str(tmp_path), str(cache_path))
+    return table
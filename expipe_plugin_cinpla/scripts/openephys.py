@@ -1,13 +1,138 @@
 from expipe_plugin_cinpla.imports import *
 from expipe_plugin_cinpla.scripts.utils import _get_data_path
 from . import utils
+from . import tracking
+from . import openephys_spikes
+from . import archive
 from pathlib import Path
 
 
+DEFAULT_MAX_MEMORY = 256 # MB
+
+
+def _copy_file_chunked(source, target, chunk_size, progress):
+    # one buffer is reused such that a single chunk is held in memory
+    buffer = memoryview(bytearray(min(chunk_size, max(
+        os.path.getsize(str(source)), 1))))
+    with open(str(source), 'rb') as src, open(str(target), 'wb') as dst:
+        while True:
+            size = src.readinto(buffer)
+            if not size:
+                break
+            dst.write(buffer[:size])
+            progress.update(size)
+            utils.report_progress(
+                'Copying', progress.n / max(progress.total, 1),
+                progress.format_dict.get('rate'))
+    shutil.copystat(str(source), str(target))
+
+
+def convert_streaming(openephys_exp, openephys_rec, openephys_path,
+                      exdir_path, session, max_memory=None):
+    '''
+    Copy an Open Ephys session into the exdir acquisition group and write
+    its continuous channels to the binary recording used by
+    process_openephys, see recording.require_binary, with at most
+    max_memory MB of data in memory and a progress bar showing the
+    throughput. The session is copied to "acquisition/<session>" with the
+    same attributes as from expipe_io_neuro.openephys.convert.
+
+    Parameters
+    ----------
+    openephys_exp : pyopenephys experiment
+    openephys_rec : pyopenephys recording
+    openephys_path : path to Open Ephys session directory
+    exdir_path : path to the exdir directory
+    session : name of the session
+    max_memory : MB of data read at a time, by default the setting
+        MAX_MEMORY or 256 MB
+    '''
+    from .recording import (
+        continuous_filenames, records_per_chunk, require_binary)
+    max_memory = (max_memory or getattr(PAR, 'MAX_MEMORY', None) or
+                  DEFAULT_MAX_MEMORY)
+    chunk_size = int(max_memory * 1024 ** 2)
+    openephys_path = pathlib.Path(openephys_path)
+    exdir_file = exdir.File(exdir_path, plugins=exdir.plugins.quantities)
+    exdir_file.attrs['session_start_time'] = datetime.strftime(
+        openephys_exp.datetime, expipe.core.datetime_format)
+    exdir_file.attrs['session_duration'] = openephys_rec.duration
+    acquisition = exdir_file.require_group('acquisition')
+    acquisition.attrs['openephys_session'] = session
+    acquisition.attrs['acquisition_system'] = openephys_exp.acquisition_system
+    target_path = pathlib.Path(str(acquisition.directory)) / session
+    sources = sorted(p for p in openephys_path.rglob('*') if p.is_file())
+    total_size = sum(p.stat().st_size for p in sources)
+    progress = tqdm(total=total_size, unit='B', unit_scale=True,
+                    unit_divisor=1024, desc='Copying ' + session)
+    try:
+        for source in sources:
+            target = target_path / source.relative_to(openephys_path)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            _copy_file_chunked(source, target, chunk_size, progress)
+    finally:
+        progress.close()
+    num_channels = len(continuous_filenames(target_path))
+    if num_channels > 0:
+        require_binary(exdir_path, target_path,
+                       chunk_size=records_per_chunk(max_memory, num_channels))
+
+
+def _write_spike_file(exdir_path, filename):
+    spikes, header = openephys_spikes.read_spikes(filename)
+    channel_group_id = int(re.search(
+        r'TT(\d+)', os.path.basename(filename)).group(1))
+    sample_rate = float(header['sampleRate']) * pq.Hz
+    exdir_file = exdir.File(exdir_path, plugins=exdir.plugins.quantities)
+    channel_group = exdir_file['processing']['electrophysiology'].require_group(
+        'channel_group_{}'.format(channel_group_id))
+    waveform = channel_group.require_group('EventWaveform').require_group(
+        'waveform_timeseries')
+    waveform.attrs['num_samples'] = len(spikes)
+    waveform.attrs['sample_rate'] = sample_rate
+    waveform.attrs['electrode_group_id'] = channel_group_id
+    waveform.attrs['source_file'] = os.path.basename(filename)
+    waveform.require_dataset(
+        'timestamps', data=(spikes['timestamp'] / sample_rate).rescale('s'))
+    data = waveform.require_dataset(
+        'data', data=openephys_spikes.scale_waveforms(spikes))
+    data.attrs['sample_rate'] = sample_rate
+    data.attrs['unit'] = 'uV'
+    return len(spikes)
+
+
+def generate_spike_trains(exdir_path, openephys_path, n_jobs=1):
+    '''
+    Decode the per tetrode .spikes files and write waveforms and times to
+    "processing/electrophysiology/channel_group_<n>/EventWaveform" where n
+    is the tetrode number in the filename. Each file is decoded and written
+    by its own task in a pool of n_jobs processes.
+    '''
+    filenames = sorted(glob.glob(os.path.join(str(openephys_path),
+                                              '*_TT*.spikes')))
+    if len(filenames) == 0:
+        return
+    exdir_file = exdir.File(exdir_path, plugins=exdir.plugins.quantities)
+    exdir_file.require_group('processing').require_group('electrophysiology')
+    if n_jobs == 1:
+        for n, filename in enumerate(filenames):
+            _write_spike_file(exdir_path, filename)
+            utils.report_progress('Spikes', (n + 1) / len(filenames))
+        return
+    with futures.ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        jobs = {executor.submit(_write_spike_file, exdir_path, f): f
+                for f in filenames}
+        for n, job in enumerate(futures.as_completed(jobs)):
+            print('Converted {} spikes from {}'.format(
+                job.result(), os.path.basename(jobs[job])))
+            utils.report_progress('Spikes', (n + 1) / len(filenames))
+
+
 def register_openephys_recording(
     project, action_id, openephys_path, depth, overwrite, templates,
     entity_id, user, session, location, message, tag, delete_raw_data,
-    correct_depth_answer, register_depth):
+    correct_depth_answer, register_depth, stream=False, max_memory=None,
+    n_jobs=1):
     user = user or PAR.USERNAME
     if user is None:
         print('Missing option "user".')
@@ -70,18 +195,31 @@ def register_openephys_recording(
         #     action.create_message(text=m['message'], user=user, datetime=dtime)
 
     exdir_path = utils._make_data_path(action, overwrite)
-    # TODO change to alessio stuff
-    openephys_io.convert(
-        openephys_rec, exdir_path=exdir_path, session=session)
+    if stream:
+        convert_streaming(openephys_exp, openephys_rec, openephys_path,
+                          exdir_path, session, max_memory=max_memory)
+    else:
+        # TODO change to alessio stuff
+        openephys_io.convert(
+            openephys_rec, exdir_path=exdir_path, session=session)
+    generate_spike_trains(exdir_path, openephys_path, n_jobs=n_jobs)
+    tracking.generate_processed_tracking(exdir_path)
     if utils.query_yes_no(
         'Delete raw data in {}? (yes/no)'.format(openephys_path),
         default='no', answer=delete_raw_data):
-        shutil.rmtree(openephys_path)
+        archive.archive_and_delete(openephys_path)
 
 
-def process_openephys(project, action_id, probe_path, sorter):
+def process_openephys(project, action_id, probe_path, sorter, n_jobs=1,
+                      max_spikes_per_unit=1000, cpus=None, memory=None,
+                      no_cache=False):
     import spikeextractors as se
-    import spiketoolkit as st
+    from .recording import (
+        BinaryRecordingExtractor, require_binary, copy_channel_properties)
+    from .preprocessing import require_filter_bank
+    from . import waveforms
+    from . import sorting as sorting_tools
+    from .sorting_cache import SortingCache, cache_key, recording_fingerprint
     action = project.actions[action_id]
     # if exdir_path is None:
     exdir_path = _get_data_path(action)
@@ -96,35 +234,46 @@ def process_openephys(project, action_id, probe_path, sorter):
 
     print(probe_path)
 
-    recording = se.OpenEphysRecordingExtractor(openephys_path)
-    se.loadProbeFile(recording, probe_path)
-    # apply cmr
-    recording_cmr = st.preprocessing.common_reference(recording)
-    recording_lfp = st.preprocessing.bandpass_filter(recording, freq_min=1, freq_max=300)
-    recording_lfp = st.preprocessing.resample(recording, 1000)
-    recording_hp = st.preprocessing.bandpass_filter(recording_cmr, freq_min=300, freq_max=6000)
-
-    if sorter == 'klusta':
-        sorting = st.sorters.klusta(recording_cmr, by_property='group')
-    elif sorter == 'mountain':
-        sorting = st.sorters.mountainsort4(recording_cmr, by_property='group',
-                                           adjacency_radius=10, detect_sign=-1)
-    elif sorter == 'kilosort':
-        sorting = st.sorters.kilosort(recording_cmr, by_property='group',
-                                      kilosort_path=Path(os.getenv('KILOSORT_PATH')),
-                                      npy_matlab_path=Path(os.getenv('NPY_MATLAB_PATH')))
-    elif sorter == 'spyking-circus':
-        sorting = st.sorters.spyking_circus(recording_cmr, by_property='group', merge_spikes=False)
-    elif sorter == 'ironclust':
-        sorting = st.sorters.ironclust(recording_cmr, by_property='group')
+    # the raw data is decoded once and shared as a memory map by all steps
+    recording_path = require_binary(exdir_path, openephys_path)
+    recording = BinaryRecordingExtractor(recording_path)
+    recording = se.loadProbeFile(recording, probe_path)
+    # common reference, high-pass and LFP bands are made in one pass
+    hp_path, lfp_path = require_filter_bank(
+        recording, os.path.dirname(str(recording_path)),
+        probe_path=probe_path)
+    recording_hp = BinaryRecordingExtractor(hp_path)
+    copy_channel_properties(recording_hp, recording)
+    recording_lfp = BinaryRecordingExtractor(lfp_path)
+    copy_channel_properties(recording_lfp, recording)
+
+    # channel groups are sorted concurrently within the cpu/memory budget
+    # unless the same recording, probe and sorter is found in the cache
+    params = sorting_tools.sorter_params(sorter)
+    cache = SortingCache()
+    key = cache_key(
+        {'raw': recording_fingerprint(recording_path),
+         'highpass': recording_fingerprint(hp_path)},
+        probe_path, sorter, params)
+    spike_trains = None if no_cache else cache.get(key)
+    if spike_trains is None:
+        spike_trains = sorting_tools.sort_groups(
+            recording_hp, hp_path, sorter,
+            output_folder=os.path.join(os.path.dirname(str(hp_path)),
+                                       'sorting_' + sorter),
+            cpus=cpus, memory=memory, params=params)
+        cache.put(key, spike_trains)
     else:
-        raise NotImplementedError("sorter is not implemented")
+        print('Using cached sorting ' + key)
+    sorting = sorting_tools.merge_sortings(spike_trains)
 
     # extract waveforms
     print('Computing waveforms')
-    wf = st.postprocessing.getUnitWaveforms(recording_hp, sorting, by_property='group', verbose=True)
+    waveforms.extract_waveforms(
+        exdir_path, hp_path, recording_hp, sorting, n_jobs=n_jobs,
+        max_spikes=max_spikes_per_unit)
     print('Saving to exdir format')
     # save spike times and waveforms to exdir
-    se.ExdirSortingExtractor.writeSorting(sorting, exdir_path, recording=recording_cmr)
+    se.ExdirSortingExtractor.writeSorting(sorting, exdir_path, recording=recording_hp)
     # save LFP to exdir
     se.ExdirRecordingExtractor.writeRecording(recording_lfp, exdir_path, lfp=True)
\ No newline at end of file
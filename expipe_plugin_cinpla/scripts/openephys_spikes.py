@@ -0,0 +1,75 @@
+from expipe_plugin_cinpla.imports import *
+
+HEADER_BYTES = 1024
+ADC_OFFSET = 32768
+RECORD_HEADER = [
+    ('event_type', '<u1'), ('timestamp', '<i8'),
+    ('software_timestamp', '<i8'), ('source_id', '<u2'),
+    ('num_channels', '<u2'), ('num_samples', '<u2'), ('sorted_id', '<u2'),
+    ('electrode_id', '<u2'), ('channel', '<u2'), ('color', '<u1', (3,)),
+    ('pc_proj', '<f4', (2,)),
+    # not in the header description, but written by Open Ephys 0.4
+    ('sample_rate', '<u2')]
+
+
+def spikes_dtype(num_channels, num_samples):
+    '''
+    Structured dtype of one record in an Open Ephys .spikes file.
+    '''
+    return np.dtype(RECORD_HEADER + [
+        ('waveform', '<u2', (num_channels, num_samples)),
+        ('gain', '<f4', (num_channels,)),
+        ('threshold', '<u2', (num_channels,)),
+        ('recording_number', '<u2')])
+
+
+def read_header(filename):
+    '''
+    Read the header of an Open Ephys data file as a dict of strings.
+    '''
+    with open(str(filename), 'rb') as f:
+        raw = f.read(HEADER_BYTES).decode('latin-1')
+    header = {}
+    for line in raw.split(';'):
+        key, _, value = line.strip().partition('=')
+        if key.startswith('header.'):
+            header[key[len('header.'):].strip()] = value.strip().strip("'")
+    return header
+
+
+def read_spikes(filename):
+    '''
+    Read all records of an Open Ephys .spikes file in one go into a
+    structured array, the record size is given by the number of channels
+    and samples in the first record.
+
+    Returns
+    -------
+    spikes : structured array with the fields in spikes_dtype
+    header : dict with the header values as strings
+    '''
+    header = read_header(filename)
+    num_bytes = os.path.getsize(str(filename)) - HEADER_BYTES
+    with open(str(filename), 'rb') as f:
+        f.seek(HEADER_BYTES)
+        first = np.fromfile(f, dtype=np.dtype(RECORD_HEADER), count=1)
+    if len(first) == 0:
+        num_channels = int(header.get('num_channels', 4))
+        return np.zeros(0, dtype=spikes_dtype(num_channels, 0)), header
+    dtype = spikes_dtype(int(first['num_channels'][0]),
+                         int(first['num_samples'][0]))
+    if num_bytes % dtype.itemsize != 0:
+        raise ValueError(
+            'Size of "{}" is not a multiple of the record size {}'.format(
+                filename, dtype.itemsize))
+    spikes = np.fromfile(str(filename), dtype=dtype, offset=HEADER_BYTES)
+    return spikes, header
+
+
+def scale_waveforms(spikes):
+    '''
+    Waveforms in uV with shape (num_spikes, num_channels, num_samples).
+    '''
+    waveforms = spikes['waveform'].astype(float) - ADC_OFFSET
+    waveforms /= spikes['gain'][:, :, None]
+    return waveforms * 1000.
@@ -0,0 +1,149 @@
+from expipe_plugin_cinpla.imports import *
+from .recording import write_metadata
+from . import utils
+
+DEFAULT_CHUNK_DURATION = 10. # s
+DEFAULT_MARGIN = 2. # s
+
+
+def _bandpass(freq_min, freq_max, sample_rate, order=3):
+    return scipy.signal.butter(
+        order, [freq_min, freq_max], btype='bandpass', fs=sample_rate,
+        output='sos')
+
+
+def filter_bank(recording, hp_path, lfp_path, freq_hp=(300, 6000),
+                freq_lfp=(1, 300), lfp_rate=1000, cmr=True,
+                chunk_duration=DEFAULT_CHUNK_DURATION, margin=DEFAULT_MARGIN,
+                source=None):
+    '''
+    Read the recording once in chunks and write both the high-pass band of
+    the common median referenced traces and the decimated LFP band of the
+    raw traces as float32 binary files in uV ordered as (frames, channels).
+    Each chunk is filtered forward and backward with margin seconds on both
+    sides to avoid edge effects.
+
+    Parameters
+    ----------
+    recording : RecordingExtractor with the channel property "gain"
+    hp_path : path to the high-pass binary file
+    lfp_path : path to the LFP binary file
+    freq_hp : high-pass band in Hz used for sorting
+    freq_lfp : LFP band in Hz
+    lfp_rate : LFP sample rate in Hz, rounded to an integer decimation
+    cmr : subtract the median over channels before high-pass filtering
+    chunk_duration : seconds of data read at a time
+    margin : seconds of data added to each side of a chunk
+    source : stored in the metadata of both files, see filter_source
+    '''
+    sample_rate = recording.getSamplingFrequency()
+    num_frames = recording.getNumFrames()
+    channel_ids = recording.getChannelIds()
+    num_channels = len(channel_ids)
+    gains = np.array([recording.getChannelProperty(c, 'gain')
+                      for c in channel_ids], dtype='float32')
+    decimation = int(round(sample_rate / lfp_rate))
+    if freq_lfp[1] >= sample_rate / decimation / 2:
+        raise ValueError('LFP band must be below the Nyquist frequency ' +
+                         'of the LFP sample rate')
+    sos_hp = _bandpass(freq_hp[0], freq_hp[1], sample_rate)
+    sos_lfp = _bandpass(freq_lfp[0], freq_lfp[1], sample_rate)
+    chunk_size = int(chunk_duration * sample_rate)
+    margin = int(margin * sample_rate)
+    num_lfp_frames = (num_frames + decimation - 1) // decimation
+    hp = np.memmap(str(hp_path), dtype='float32', mode='w+',
+                   shape=(num_frames, num_channels))
+    lfp = np.memmap(str(lfp_path), dtype='float32', mode='w+',
+                    shape=(num_lfp_frames, num_channels))
+    t_start = time.time()
+    for start in tqdm(range(0, num_frames, chunk_size), desc='Filtering'):
+        stop = min(start + chunk_size, num_frames)
+        read_start = max(start - margin, 0)
+        read_stop = min(stop + margin, num_frames)
+        traces = recording.getTraces(
+            start_frame=read_start, end_frame=read_stop).T.astype('float32')
+        traces *= gains
+        inner = slice(start - read_start, stop - read_start)
+        lfp_traces = scipy.signal.sosfiltfilt(sos_lfp, traces, axis=0)
+        # keep the samples at multiples of decimation in the whole recording
+        first = -start % decimation
+        lfp[(start + first) // decimation:
+            (stop + decimation - 1) // decimation] = \
+            lfp_traces[inner][first::decimation]
+        if cmr:
+            traces -= np.median(traces, axis=1, keepdims=True)
+        hp[start:stop] = scipy.signal.sosfiltfilt(
+            sos_hp, traces, axis=0)[inner]
+        utils.report_progress(
+            'Filtering', stop / num_frames,
+            stop * num_channels * 2 / max(time.time() - t_start, 1e-9))
+    hp.flush()
+    lfp.flush()
+    del hp, lfp
+    metadata = {
+        'dtype': 'float32',
+        'num_channels': num_channels,
+        'channel_ids': list(channel_ids),
+        'channel_names': [str(c) for c in channel_ids],
+        'gains': [1.] * num_channels,
+        'source': source}
+    write_metadata(hp_path, dict(
+        metadata, num_frames=num_frames, sample_rate=sample_rate,
+        band=list(freq_hp), common_median_reference=cmr))
+    write_metadata(lfp_path, dict(
+        metadata, num_frames=num_lfp_frames,
+        sample_rate=sample_rate / decimation, band=list(freq_lfp)))
+
+
+def _jsonable(value):
+    # numpy scalars become python numbers, the rest as it reads from json
+    return json.loads(json.dumps(value, default=lambda v: (
+        v.item() if hasattr(v, 'item') else str(v))))
+
+
+def filter_source(recording, probe_path=None, **kwargs):
+    '''
+    The channel ids, channel groups, sha1 of the probe file and filter_bank
+    parameters a filter bank is made from. A filter bank is made again if
+    any of these change.
+    '''
+    channel_ids = recording.getChannelIds()
+    groups = [recording.getChannelProperty(c, 'group')
+              if 'group' in recording.getChannelPropertyNames(c) else None
+              for c in channel_ids]
+    probe = None
+    if probe_path is not None:
+        with open(str(probe_path), 'rb') as f:
+            probe = hashlib.sha1(f.read()).hexdigest()
+    return _jsonable({'channel_ids': list(channel_ids), 'groups': groups,
+                      'probe': probe, 'params': kwargs})
+
+
+def _read_source(dat_path):
+    json_path = dat_path.with_suffix('.json')
+    if not json_path.exists():
+        return None
+    with json_path.open('r') as f:
+        return json.load(f).get('source')
+
+
+def require_filter_bank(recording, binary_path, probe_path=None, **kwargs):
+    '''
+    Run filter_bank with the outputs "highpass.dat" and "lfp.dat" in
+    binary_path unless these are already written from the same channels,
+    probe file and parameters, see filter_source.
+
+    Returns
+    -------
+    hp_path, lfp_path : paths to the binary files
+    '''
+    binary_path = pathlib.Path(binary_path)
+    hp_path = binary_path / 'highpass.dat'
+    lfp_path = binary_path / 'lfp.dat'
+    source = filter_source(recording, probe_path, **kwargs)
+    if any(_read_source(path) != source for path in (hp_path, lfp_path)):
+        for path in (hp_path, lfp_path):
+            if path.with_suffix('.json').exists():
+                path.with_suffix('.json').unlink()
+        filter_bank(recording, hp_path, lfp_path, source=source, **kwargs)
+    return hp_path, lfp_path
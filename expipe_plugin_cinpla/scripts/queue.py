@@ -0,0 +1,302 @@
+from expipe_plugin_cinpla.imports import *
+
+DEFAULT_QUEUE_DIR = os.path.join(
+    os.path.expanduser('~'), '.expipe-plugin-cinpla', 'queue')
+STATUSES = ['queued', 'running', 'done', 'failed', 'cancelled']
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    kwargs TEXT NOT NULL,
+    project_path TEXT,
+    status TEXT NOT NULL,
+    submitted REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    pid INTEGER,
+    returncode INTEGER,
+    log_path TEXT
+)
+'''
+
+
+def _run_process(project, **kwargs):
+    from .openephys import process_openephys
+    process_openephys(project, **kwargs)
+
+
+JOB_KINDS = {'process': _run_process}
+
+
+def queue_dir():
+    return pathlib.Path(getattr(PAR, 'QUEUE_DIR', None) or DEFAULT_QUEUE_DIR)
+
+
+def connect(path=None):
+    '''
+    Connection to the queue database, by default "queue.sqlite" in the
+    setting QUEUE_DIR or ~/.expipe-plugin-cinpla/queue.
+    '''
+    path = pathlib.Path(path or queue_dir() / 'queue.sqlite')
+    path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(str(path), timeout=30,
+                                 isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    connection.execute(SCHEMA)
+    return connection
+
+
+def submit(connection, kind, kwargs, project_path=None):
+    '''
+    Add a job to the queue.
+
+    Parameters
+    ----------
+    connection : see connect
+    kind : name in JOB_KINDS
+    kwargs : json serializable keyword arguments of the job
+    project_path : path to the expipe project given to the job
+
+    Returns
+    -------
+    job id
+    '''
+    if kind not in JOB_KINDS:
+        raise ValueError('Unknown job "{}", use one of {}'.format(
+            kind, list(JOB_KINDS)))
+    cursor = connection.execute(
+        'INSERT INTO jobs (kind, kwargs, project_path, status, submitted) '
+        'VALUES (?, ?, ?, ?, ?)',
+        (kind, json.dumps(kwargs), None if project_path is None
+         else str(project_path), 'queued', time.time()))
+    return cursor.lastrowid
+
+
+def get_jobs(connection, job_id=None, status=None):
+    '''
+    Jobs as a list of dicts ordered by id.
+    '''
+    query, args = 'SELECT * FROM jobs', []
+    if job_id is not None:
+        query, args = query + ' WHERE id = ?', [job_id]
+    elif status is not None:
+        query, args = query + ' WHERE status = ?', [status]
+    return [dict(row) for row in connection.execute(
+        query + ' ORDER BY id', args)]
+
+
+def _get_job(connection, job_id):
+    jobs = get_jobs(connection, job_id)
+    if len(jobs) == 0:
+        raise KeyError('No job with id {}'.format(job_id))
+    return jobs[0]
+
+
+def cancel(connection, job_id):
+    '''
+    Cancel a queued job or terminate a running job with the processes it
+    started.
+    '''
+    job = _get_job(connection, job_id)
+    if job['status'] not in ('queued', 'running'):
+        raise ValueError('Job {} is {}'.format(job_id, job['status']))
+    connection.execute(
+        'UPDATE jobs SET status = ?, finished = ? WHERE id = ?',
+        ('cancelled', time.time(), job_id))
+    if job['status'] == 'running' and job['pid'] is not None:
+        # jobs run in their own session with the job as process group leader
+        try:
+            os.killpg(job['pid'], signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+
+def retry(connection, job_id):
+    '''
+    Put a failed or cancelled job back in the queue.
+    '''
+    job = _get_job(connection, job_id)
+    if job['status'] not in ('failed', 'cancelled'):
+        raise ValueError('Job {} is {}'.format(job_id, job['status']))
+    connection.execute(
+        'UPDATE jobs SET status = ?, started = NULL, finished = NULL, '
+        'pid = NULL, returncode = NULL WHERE id = ?', ('queued', job_id))
+
+
+def _claim(connection, start=None):
+    # BEGIN IMMEDIATE locks the database such that two workers can not
+    # claim the same job, the job is started before the lock is released
+    # such that a running job always has a pid
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        row = connection.execute(
+            'SELECT id FROM jobs WHERE status = ? ORDER BY id LIMIT 1',
+            ('queued',)).fetchone()
+        if row is not None:
+            pid, log_path = (None, None) if start is None else start(row['id'])
+            connection.execute(
+                'UPDATE jobs SET status = ?, started = ?, pid = ?, '
+                'log_path = ? WHERE id = ?',
+                ('running', time.time(), pid, log_path, row['id']))
+        connection.execute('COMMIT')
+    except Exception:
+        connection.execute('ROLLBACK')
+        raise
+    return None if row is None else row['id']
+
+
+def _finish(connection, job_id, returncode):
+    # a cancelled job keeps its status
+    connection.execute(
+        'UPDATE jobs SET status = ?, finished = ?, returncode = ? '
+        'WHERE id = ? AND status = ?',
+        ('done' if returncode == 0 else 'failed', time.time(), returncode,
+         job_id, 'running'))
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _fail_orphans(connection):
+    for job in get_jobs(connection, status='running'):
+        if job['pid'] is None or not _pid_alive(job['pid']):
+            connection.execute(
+                'UPDATE jobs SET status = ?, finished = ? WHERE id = ?',
+                ('failed', time.time(), job['id']))
+
+
+def run_worker(num_workers=1, poll_interval=5., path=None, once=False):
+    '''
+    Run queued jobs with at most num_workers at a time, each in its own
+    session with output in "logs/<job id>.log" in the queue directory, such
+    that jobs keep running if the worker stops. Jobs record their status
+    when they finish, jobs whose process is gone while running are marked
+    as failed.
+
+    Parameters
+    ----------
+    num_workers : number of concurrent jobs
+    poll_interval : seconds between checks for new and finished jobs
+    path : path to the queue database, see connect
+    once : return when the queue is empty instead of waiting for new jobs
+    '''
+    connection = connect(path)
+    log_dir = queue_dir() / 'logs'
+    log_dir.mkdir(parents=True, exist_ok=True)
+    started = {}
+
+    def start(job_id):
+        log_path = log_dir / '{}.log'.format(job_id)
+        with log_path.open('w') as log:
+            process = subprocess.Popen(
+                [sys.executable, '-m', __name__, str(job_id)]
+                + ([] if path is None else [str(path)]),
+                stdout=log, stderr=subprocess.STDOUT,
+                stdin=subprocess.DEVNULL, start_new_session=True)
+        started[job_id] = process
+        return process.pid, str(log_path)
+
+    print('Worker {} started with {} workers'.format(os.getpid(), num_workers))
+    while True:
+        for job_id, process in list(started.items()):
+            returncode = process.poll()
+            if returncode is None:
+                continue
+            del started[job_id]
+            # the job records its status, unless it was killed
+            _finish(connection, job_id, returncode)
+            print('Job {} finished with status {}'.format(
+                job_id, _get_job(connection, job_id)['status']))
+        # jobs started by a worker which stopped are counted as well
+        _fail_orphans(connection)
+        num_running = len(get_jobs(connection, status='running'))
+        while num_running < num_workers:
+            job_id = _claim(connection, start)
+            if job_id is None:
+                break
+            num_running += 1
+            print('Started job {}'.format(job_id))
+        if once and num_running == 0 and \
+                not get_jobs(connection, status='queued'):
+            return
+        time.sleep(poll_interval)
+
+
+def start_worker(num_workers=1, poll_interval=5., path=None, once=False):
+    '''
+    Start run_worker in a new session with its output in "worker.log" in
+    the queue directory, such that it keeps running when the terminal is
+    closed.
+    '''
+    log_path = queue_dir() / 'worker.log'
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    kwargs = {'num_workers': num_workers, 'poll_interval': poll_interval,
+              'path': None if path is None else str(path), 'once': once}
+    with log_path.open('a') as log:
+        process = subprocess.Popen(
+            [sys.executable, '-m', __name__, 'worker', json.dumps(kwargs)],
+            stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+            start_new_session=True)
+    print('Started worker {}, output in "{}"'.format(process.pid, log_path))
+    return process.pid
+
+
+def run_job(job_id, path=None):
+    '''
+    Run one job in the current process.
+    '''
+    connection = connect(path)
+    job = _get_job(connection, job_id)
+    kwargs = json.loads(job['kwargs'])
+    print('Running job {} "{}" with {}'.format(job_id, job['kind'], kwargs))
+    project = None
+    if job['project_path'] is not None:
+        project = expipe.get_project(path=job['project_path'])
+    t_start = time.time()
+    JOB_KINDS[job['kind']](project, **kwargs)
+    print('Job {} finished in {:.2f} s'.format(job_id, time.time() - t_start))
+
+
+def format_jobs(jobs):
+    '''
+    Table of jobs with id, status, kind, arguments and duration.
+    '''
+    lines = ['{:>5}  {:<10}{:<10}{:>10}  {}'.format(
+        'id', 'status', 'kind', 'duration', 'arguments')]
+    for job in jobs:
+        if job['started'] is None:
+            duration = ''
+        else:
+            duration = '{:.0f} s'.format(
+                (job['finished'] or time.time()) - job['started'])
+        lines.append('{:>5}  {:<10}{:<10}{:>10}  {}'.format(
+            job['id'], job['status'], job['kind'], duration, job['kwargs']))
+    return '\n'.join(lines)
+
+
+def _main(job_id, path=None):
+    # runs a job started by run_worker and records its status
+    returncode = 0
+    try:
+        run_job(job_id, path)
+    except BaseException:
+        traceback.print_exc()
+        returncode = 1
+    _finish(connect(path), job_id, returncode)
+    return returncode
+
+
+if __name__ == '__main__':
+    # the command line imports this module by its name, not as __main__
+    from expipe_plugin_cinpla.scripts import queue
+    if sys.argv[1] == 'worker':
+        queue.run_worker(**json.loads(sys.argv[2]))
+    else:
+        sys.exit(queue._main(int(sys.argv[1]), *sys.argv[2:]))
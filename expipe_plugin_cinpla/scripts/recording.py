@@ -0,0 +1,221 @@
+from expipe_plugin_cinpla.imports import *
+from .openephys_spikes import read_header, HEADER_BYTES
+import spikeextractors as se
+
+CONTINUOUS_SAMPLES = 1024
+CONTINUOUS_DTYPE = np.dtype([
+    ('timestamp', '<i8'), ('num_samples', '<u2'),
+    ('recording_number', '<u2'),
+    ('samples', '>i2', (CONTINUOUS_SAMPLES,)), ('marker', 'u1', (10,))])
+DEFAULT_CHUNK_SIZE = 1024 # records of 1024 samples
+BINARY_NAME = 'openephys_binary'
+
+
+def memmap_continuous(filename):
+    '''
+    Memory-mapped view of the records in an Open Ephys .continuous file as
+    a structured array with fields in CONTINUOUS_DTYPE.
+    '''
+    header = read_header(filename)
+    num_bytes = os.path.getsize(str(filename)) - HEADER_BYTES
+    num_records = num_bytes // CONTINUOUS_DTYPE.itemsize
+    data = np.memmap(str(filename), dtype=CONTINUOUS_DTYPE, mode='r',
+                     offset=HEADER_BYTES, shape=(num_records,))
+    return data, header
+
+
+def continuous_filenames(openephys_path):
+    '''
+    The .continuous files of the recording channels "CH<n>" sorted by n.
+    '''
+    filenames = glob.glob(os.path.join(str(openephys_path), '*CH*.continuous'))
+    return sorted(filenames, key=lambda f: int(
+        re.search(r'CH(\d+)', os.path.basename(f)).group(1)))
+
+
+def write_metadata(dat_path, metadata):
+    '''
+    Write the metadata of a binary file next to it with suffix ".json",
+    this should be done last such that an interrupted write is redone.
+    '''
+    with pathlib.Path(dat_path).with_suffix('.json').open('w') as f:
+        json.dump(metadata, f, indent=4)
+
+
+def _read_records(f, start, stop):
+    f.seek(HEADER_BYTES + start * CONTINUOUS_DTYPE.itemsize)
+    return np.fromfile(f, dtype=CONTINUOUS_DTYPE, count=stop - start)
+
+
+def records_per_chunk(max_memory, num_channels):
+    '''
+    Number of records of num_channels channels which convert_to_binary
+    reads at a time to use at most max_memory MB, at least one.
+    '''
+    # the records read and the int16 block written from them
+    record_bytes = num_channels * (
+        CONTINUOUS_DTYPE.itemsize + CONTINUOUS_SAMPLES * 2)
+    return max(int(max_memory * 1024 ** 2 // record_bytes), 1)
+
+
+def convert_to_binary(openephys_path, binary_path,
+                      chunk_size=DEFAULT_CHUNK_SIZE):
+    '''
+    Write the Open Ephys .continuous files to "recording.dat" in
+    binary_path as int16 samples ordered as (frames, channels) with the
+    channel names, gains and sample rate in "recording.json". The data is
+    read and written chunk_size records at a time with plain file reads and
+    writes, such that no more than one chunk is held in memory, see
+    records_per_chunk.
+
+    Returns
+    -------
+    dat_path : path to the binary file
+    '''
+    binary_path = pathlib.Path(binary_path)
+    filenames = continuous_filenames(openephys_path)
+    if len(filenames) == 0:
+        raise ValueError(
+            'No ".continuous" files found in "{}"'.format(openephys_path))
+    headers = [read_header(f) for f in filenames]
+    num_records = min(
+        (os.path.getsize(f) - HEADER_BYTES) // CONTINUOUS_DTYPE.itemsize
+        for f in filenames)
+    num_frames = num_records * CONTINUOUS_SAMPLES
+    num_channels = len(filenames)
+    dat_path = binary_path / 'recording.dat'
+    metadata_path = binary_path / 'recording.json'
+    if metadata_path.exists():
+        metadata_path.unlink()
+    first_timestamp = None
+    sources = [open(f, 'rb') for f in filenames]
+    try:
+        with dat_path.open('wb') as data:
+            for start in range(0, num_records, chunk_size):
+                stop = min(start + chunk_size, num_records)
+                block = np.empty(
+                    ((stop - start) * CONTINUOUS_SAMPLES, num_channels),
+                    dtype='int16')
+                for channel, source in enumerate(sources):
+                    records = _read_records(source, start, stop)
+                    if first_timestamp is None:
+                        first_timestamp = int(records['timestamp'][0])
+                    block[:, channel] = records['samples'].ravel()
+                    del records
+                block.tofile(data)
+                del block
+    finally:
+        for source in sources:
+            source.close()
+    metadata = {
+        'dtype': 'int16',
+        'num_frames': num_frames,
+        'num_channels': num_channels,
+        'sample_rate': float(headers[0]['sampleRate']),
+        'channel_ids': list(range(num_channels)),
+        'channel_names': [h['channel'] for h in headers],
+        'gains': [float(h['bitVolts']) for h in headers],
+        'first_timestamp': first_timestamp,
+        'source_files': [os.path.basename(f) for f in filenames]}
+    write_metadata(dat_path, metadata)
+    return dat_path
+
+
+def require_binary(exdir_path, openephys_path,
+                   chunk_size=DEFAULT_CHUNK_SIZE):
+    '''
+    Convert the Open Ephys recording to a binary file in the raw directory
+    "acquisition/openephys_binary" unless this is already done, see
+    convert_to_binary.
+    '''
+    exdir_file = exdir.File(exdir_path, plugins=exdir.plugins.quantities)
+    raw = exdir_file.require_group('acquisition').require_raw(BINARY_NAME)
+    binary_path = pathlib.Path(str(raw.directory))
+    if not (binary_path / 'recording.json').exists():
+        print('Converting "{}" to binary'.format(openephys_path))
+        convert_to_binary(openephys_path, binary_path, chunk_size=chunk_size)
+    return binary_path / 'recording.dat'
+
+
+class BinaryRecordingExtractor(se.RecordingExtractor):
+    '''
+    Recording extractor serving traces as views of a memory-mapped binary
+    file written by convert_to_binary. Traces are int16, multiply with the
+    channel property "gain" to get uV.
+    '''
+    def __init__(self, dat_path):
+        se.RecordingExtractor.__init__(self)
+        dat_path = pathlib.Path(dat_path)
+        with dat_path.with_suffix('.json').open('r') as f:
+            self._metadata = json.load(f)
+        self._data = np.memmap(
+            str(dat_path), dtype=self._metadata['dtype'], mode='r',
+            shape=(self._metadata['num_frames'],
+                   self._metadata['num_channels']))
+        self._columns = {channel_id: column for column, channel_id in
+                         enumerate(self._metadata['channel_ids'])}
+        for channel_id, gain, name in zip(self._metadata['channel_ids'],
+                                          self._metadata['gains'],
+                                          self._metadata['channel_names']):
+            self.setChannelProperty(channel_id, 'gain', gain)
+            self.setChannelProperty(channel_id, 'name', name)
+
+    def getChannelIds(self):
+        return list(self._metadata['channel_ids'])
+
+    def getNumFrames(self):
+        return self._metadata['num_frames']
+
+    def getSamplingFrequency(self):
+        return self._metadata['sample_rate']
+
+    def getGains(self, channel_ids=None):
+        gains = np.array(self._metadata['gains'])
+        if channel_ids is None:
+            return gains
+        return gains[[self._columns[c] for c in channel_ids]]
+
+    def getTraces(self, channel_ids=None, start_frame=None, end_frame=None):
+        traces = self._data[start_frame:end_frame]
+        if channel_ids is None:
+            return traces.T
+        columns = np.array([self._columns[c] for c in channel_ids], dtype=int)
+        # consecutive channels are sliced to avoid a copy
+        if len(columns) > 0 and np.all(np.diff(columns) == 1):
+            return traces[:, columns[0]: columns[-1] + 1].T
+        return traces[:, columns].T
+
+    def getSnippets(self, *, reference_frames, snippet_len, channel_ids=None):
+        '''
+        Snippets read in one vectorized indexing of the memory map as an
+        array with shape (num_snippets, num_channels, snippet_len), samples
+        outside the recording are zero.
+        '''
+        if isinstance(snippet_len, (tuple, list, np.ndarray)):
+            num_before, num_after = snippet_len
+        else:
+            num_before = int((snippet_len + 1) / 2)
+            num_after = snippet_len - num_before
+        if channel_ids is None:
+            channel_ids = self.getChannelIds()
+        columns = np.array([self._columns[c] for c in channel_ids], dtype=int)
+        frames = np.asarray(reference_frames, dtype=int)[:, None] + \
+            np.arange(-num_before, num_after)
+        outside = (frames < 0) | (frames >= self.getNumFrames())
+        frames = np.clip(frames, 0, self.getNumFrames() - 1)
+        snippets = self._data[frames[:, :, None], columns]
+        snippets[outside] = 0
+        return snippets.transpose(0, 2, 1)
+
+
+def copy_channel_properties(target, source, skip=('gain',)):
+    '''
+    Copy the channel properties such as "group" and "location" from the
+    probe file, except the ones in skip which belong to the data.
+    '''
+    for channel_id in source.getChannelIds():
+        for name in source.getChannelPropertyNames(channel_id):
+            if name not in skip:
+                target.setChannelProperty(
+                    channel_id, name,
+                    source.getChannelProperty(channel_id, name))
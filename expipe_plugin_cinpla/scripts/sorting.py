@@ -0,0 +1,186 @@
+from expipe_plugin_cinpla.imports import *
+from .recording import BinaryRecordingExtractor
+from . import utils
+from pathlib import Path
+
+SORTER_FUNCTIONS = {
+    'klusta': 'klusta',
+    'mountain': 'mountainsort4',
+    'kilosort': 'kilosort',
+    'spyking-circus': 'spyking_circus',
+    'ironclust': 'ironclust'}
+SORTER_PARAMS = {
+    'mountain': {'adjacency_radius': 10, 'detect_sign': -1},
+    'spyking-circus': {'merge_spikes': False}}
+# working memory of a sorter relative to the size of its float32 traces
+MEMORY_FACTOR = 3
+
+
+def sorter_params(sorter):
+    '''
+    Default parameters passed to the spiketoolkit sorter.
+    '''
+    if sorter not in SORTER_FUNCTIONS:
+        raise NotImplementedError("sorter is not implemented")
+    params = dict(SORTER_PARAMS.get(sorter, {}))
+    if sorter == 'kilosort':
+        params.update(kilosort_path=Path(os.getenv('KILOSORT_PATH')),
+                      npy_matlab_path=Path(os.getenv('NPY_MATLAB_PATH')))
+    return params
+
+
+def channel_groups(recording):
+    '''
+    Channel ids per value of the channel property "group".
+    '''
+    groups = {}
+    for channel_id in recording.getChannelIds():
+        group = recording.getChannelProperty(channel_id, 'group')
+        groups.setdefault(group, []).append(channel_id)
+    return groups
+
+
+def sort_group(dat_path, group, channel_ids, locations, sorter, params,
+               output_folder):
+    '''
+    Sort the channels of one group of a binary recording in output_folder.
+
+    Returns
+    -------
+    group, dict of {unit_id: spike frames}, elapsed seconds
+    '''
+    import spikeextractors as se
+    import spiketoolkit as st
+    t_start = time.time()
+    recording = se.SubRecordingExtractor(
+        BinaryRecordingExtractor(dat_path), channel_ids=channel_ids)
+    for channel_id, location in zip(channel_ids, locations):
+        if location is not None:
+            recording.setChannelProperty(channel_id, 'location', location)
+    run_sorter = getattr(st.sorters, SORTER_FUNCTIONS[sorter])
+    sorting = run_sorter(recording, output_folder=str(output_folder),
+                         **params)
+    spike_trains = {unit_id: np.asarray(sorting.getUnitSpikeTrain(unit_id))
+                    for unit_id in sorting.getUnitIds()}
+    return group, spike_trains, time.time() - t_start
+
+
+def merge_sortings(spike_trains):
+    '''
+    Merge spike trains given as {group: {unit_id: spike frames}} into one
+    sorting with unique unit ids and the unit properties "group" and
+    "original_unit_id".
+    '''
+    import spikeextractors as se
+    sorting = se.NumpySortingExtractor()
+    unit_id = 0
+    for group in sorted(spike_trains):
+        for original_unit_id in sorted(spike_trains[group]):
+            sorting.addUnit(unit_id, spike_trains[group][original_unit_id])
+            sorting.setUnitProperty(unit_id, 'group', group)
+            sorting.setUnitProperty(
+                unit_id, 'original_unit_id', original_unit_id)
+            unit_id += 1
+    return sorting
+
+
+def _available_memory():
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') / \
+            1024 ** 2
+    except (ValueError, AttributeError):
+        return float('inf')
+
+
+def select_jobs(pending, cpus_free, memory_free, idle):
+    '''
+    Pick the pending jobs, given as (cpus, memory, job), which fit in the
+    free cpus and memory in order. If idle, the first job is started even
+    when it is larger than the budget.
+    '''
+    selected = []
+    for item in pending:
+        cpus, memory, _ = item
+        if (cpus <= cpus_free and memory <= memory_free) or (
+                idle and not selected):
+            selected.append(item)
+            cpus_free -= cpus
+            memory_free -= memory
+    return selected
+
+
+def sort_groups(recording, dat_path, sorter, output_folder, cpus=None,
+                memory=None, cpus_per_job=1, params=None):
+    '''
+    Sort each channel group of the recording in its own process, running as
+    many groups concurrently as the cpu and memory budget allows.
+
+    Parameters
+    ----------
+    recording : BinaryRecordingExtractor with the channel property "group"
+    dat_path : path to the binary file of recording
+    sorter : name in SORTER_FUNCTIONS
+    output_folder : the output of each group is in a subfolder
+        "group_<group>"
+    cpus : number of cpus to use, by default the setting SORTING_CPUS or
+        all cpus
+    memory : memory in MB to use, by default the setting SORTING_MEMORY or
+        the physical memory
+    cpus_per_job : cpus used by one sorter
+    params : sorter parameters, by default sorter_params(sorter)
+
+    Returns
+    -------
+    spike trains as {group: {unit_id: spike frames}}
+    '''
+    params = sorter_params(sorter) if params is None else params
+    cpus = cpus or getattr(PAR, 'SORTING_CPUS', None) or os.cpu_count()
+    memory = memory or getattr(PAR, 'SORTING_MEMORY', None) or \
+        _available_memory()
+    output_folder = pathlib.Path(output_folder)
+    num_frames = recording.getNumFrames()
+    pending = []
+    for group, channel_ids in sorted(channel_groups(recording).items()):
+        locations = [
+            recording.getChannelProperty(channel_id, 'location')
+            if 'location' in recording.getChannelPropertyNames(channel_id)
+            else None for channel_id in channel_ids]
+        job_memory = MEMORY_FACTOR * num_frames * len(channel_ids) * 4 / \
+            1024 ** 2
+        job = (str(dat_path), group, channel_ids, locations, sorter, params,
+               str(output_folder / 'group_{}'.format(group)))
+        pending.append((cpus_per_job, job_memory, job))
+    # the largest groups are started first
+    pending.sort(key=lambda item: -item[1])
+    num_groups = len(pending)
+    spike_trains = {}
+    running = {}
+    cpus_free, memory_free = cpus, memory
+    t_start = time.time()
+    max_workers = max(cpus // cpus_per_job, 1)
+    with futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            selected = select_jobs(pending, cpus_free, memory_free,
+                                   idle=not running)
+            pending = [item for item in pending
+                       if not any(item is s for s in selected)]
+            for item in selected:
+                cpus_free -= item[0]
+                memory_free -= item[1]
+                running[executor.submit(sort_group, *item[2])] = item
+            done, _ = futures.wait(
+                running, return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                item = running.pop(future)
+                cpus_free += item[0]
+                memory_free += item[1]
+                group, trains, elapsed = future.result()
+                spike_trains[group] = trains
+                print('Sorted channel group {} with {} units in '
+                      '{:.2f} s'.format(group, len(trains), elapsed))
+                utils.report_progress(
+                    'Sorting', len(spike_trains) / num_groups)
+    print('Sorted {} channel groups in {:.2f} s'.format(
+        len(spike_trains), time.time() - t_start))
+    return spike_trains
+
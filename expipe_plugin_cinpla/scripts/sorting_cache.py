@@ -0,0 +1,108 @@
+from expipe_plugin_cinpla.imports import *
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.expanduser('~'), '.cache', 'expipe-plugin-cinpla', 'sorting')
+DEFAULT_MAX_BYTES = 10 * 1024 ** 3
+FINGERPRINT_BLOCK = 2 ** 20
+
+
+def recording_fingerprint(dat_path):
+    '''
+    Fingerprint of a binary recording as the sha1 of its ".json" metadata
+    and all of its data, read FINGERPRINT_BLOCK bytes at a time. For the
+    filtered recordings the metadata holds the filter parameters, see
+    preprocessing.filter_source.
+    '''
+    dat_path = pathlib.Path(dat_path)
+    sha1 = hashlib.sha1()
+    sha1.update(dat_path.with_suffix('.json').read_bytes())
+    with dat_path.open('rb') as f:
+        for block in iter(lambda: f.read(FINGERPRINT_BLOCK), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def cache_key(fingerprint, probe_path, sorter, params):
+    '''
+    Key of a sorting from the recording fingerprint, the contents of the
+    probe file, the sorter name and its parameters. Anything else the
+    sorting depends on, such as the installed sorter version, is not part of
+    the key; use no_cache in process_openephys to sort again.
+    '''
+    with open(str(probe_path), 'rb') as f:
+        probe = hashlib.sha1(f.read()).hexdigest()
+    content = json.dumps(
+        {'recording': fingerprint, 'probe': probe, 'sorter': sorter,
+         'params': params}, sort_keys=True, default=str)
+    return hashlib.sha1(content.encode()).hexdigest()
+
+
+class SortingCache:
+    '''
+    Spike trains per channel group stored as "<key>.npz" in cache_dir. The
+    least recently used entries are removed when the cache is larger than
+    max_bytes.
+    '''
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = pathlib.Path(
+            cache_dir or getattr(PAR, 'SORTING_CACHE_DIR', None) or
+            DEFAULT_CACHE_DIR)
+        self.max_bytes = (max_bytes or
+                          getattr(PAR, 'SORTING_CACHE_SIZE', None) or
+                          DEFAULT_MAX_BYTES)
+
+    def _path(self, key):
+        return self.cache_dir / (key + '.npz')
+
+    def get(self, key):
+        '''
+        Spike trains as {group: {unit_id: spike frames}} or None if the key
+        is not in the cache.
+        '''
+        path = self._path(key)
+        if not path.exists():
+            return None
+        with np.load(str(path)) as data:
+            groups, unit_ids = data['groups'], data['unit_ids']
+            trains = np.split(data['frames'], data['offsets'][1:-1])
+        os.utime(str(path)) # mark as recently used
+        spike_trains = {}
+        for group, unit_id, train in zip(groups, unit_ids, trains):
+            spike_trains.setdefault(group.item(), {})[unit_id.item()] = train
+        return spike_trains
+
+    def put(self, key, spike_trains):
+        '''
+        Store spike trains given as {group: {unit_id: spike frames}}.
+        '''
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        groups, unit_ids, trains = [], [], []
+        for group in sorted(spike_trains):
+            for unit_id in sorted(spike_trains[group]):
+                groups.append(group)
+                unit_ids.append(unit_id)
+                trains.append(np.asarray(spike_trains[group][unit_id]))
+        offsets = np.cumsum([0] + [len(t) for t in trains])
+        frames = np.concatenate(trains) if trains else np.zeros(0, dtype=int)
+        tmp_path = self.cache_dir / (key + '.tmp.npz')
+        np.savez(str(tmp_path), groups=np.array(groups, dtype=int),
+                 unit_ids=np.array(unit_ids, dtype=int), offsets=offsets,
+                 frames=frames)
+        os.replace(str(tmp_path), str(self._path(key)))
+        self.evict()
+
+    def evict(self):
+        '''
+        Remove the least recently used entries until the cache is at most
+        max_bytes.
+        '''
+        entries = sorted(
+            (p.stat().st_mtime, p.stat().st_size, p)
+            for p in self.cache_dir.glob('*.npz')
+            if not p.name.endswith('.tmp.npz'))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink()
+            total -= size
@@ -0,0 +1,376 @@
+from expipe_plugin_cinpla.imports import *
+from . import utils
+
+DEFAULT_STREAMS = 4
+CHUNK_SIZE = 1024 ** 2
+CHECKSUM_BATCH = 200
+PART_SUFFIX = '.part'
+
+
+def parse_target(target):
+    '''
+    Split a target "[user@]host:path" in (user, host, path), host is None
+    for local paths.
+    '''
+    # a single letter before ":" is a windows drive, not a host
+    match = re.match(r'^(?:([^@/:]+)@)?([^@/:\\]{2,}):(.*)$', str(target))
+    if match is None:
+        return None, None, str(target)
+    user, host, path = match.groups()
+    return user, host, path or '.'
+
+
+def join_target(target, *parts):
+    '''
+    Append path parts to a local or remote target.
+    '''
+    user, host, path = parse_target(target)
+    if host is None:
+        return os.path.join(path, *parts)
+    prefix = host if user is None else user + '@' + host
+    return prefix + ':' + posixpath.join(path, *parts)
+
+
+def _sha256(fileobj):
+    sha256 = hashlib.sha256()
+    for block in iter(lambda: fileobj.read(CHUNK_SIZE), b''):
+        sha256.update(block)
+    return sha256.hexdigest()
+
+
+def _listing(root):
+    files = {}
+    root = pathlib.Path(root)
+    if not root.exists():
+        return files
+    for path in root.rglob('*'):
+        if path.is_file():
+            st = path.stat()
+            files[path.relative_to(root).as_posix()] = (
+                st.st_size, int(st.st_mtime))
+    return files
+
+
+class LocalTarget:
+    '''
+    Target directory on a local or mounted file system, paths are relative
+    to root with "/" as separator.
+    '''
+    def __init__(self, root):
+        self.root = pathlib.Path(root)
+
+    def join(self, relpath):
+        return str(self.root.joinpath(*relpath.split('/')))
+
+    def listing(self):
+        return _listing(self.root)
+
+    def makedirs(self, relpath):
+        os.makedirs(self.join(relpath), exist_ok=True)
+
+    def checksums(self, relpaths):
+        result = {}
+        for relpath in relpaths:
+            with open(self.join(relpath), 'rb') as f:
+                result[relpath] = _sha256(f)
+        return result
+
+    def open(self, relpath, mode):
+        return open(self.join(relpath), mode)
+
+    def rename(self, source, destination):
+        os.replace(self.join(source), self.join(destination))
+
+    def utime(self, relpath, mtime):
+        os.utime(self.join(relpath), (mtime, mtime))
+
+    def remove(self, relpath):
+        os.remove(self.join(relpath))
+
+    def close(self):
+        pass
+
+
+def ssh_options(host, user=None, port=None, config_path=None):
+    '''
+    Keyword arguments of paramiko.SSHClient.connect for host with the
+    HostName, User, Port and IdentityFile in ~/.ssh/config, user and port
+    override the config.
+    '''
+    config_path = os.path.expanduser(config_path or '~/.ssh/config')
+    config = paramiko.SSHConfig()
+    if os.path.exists(config_path):
+        with open(config_path) as f:
+            config.parse(f)
+    options = config.lookup(host)
+    return {'hostname': options.get('hostname', host),
+            'port': port or int(options.get('port', 22)),
+            'username': user or options.get('user'),
+            'key_filename': options.get('identityfile')}
+
+
+class SSHTarget:
+    '''
+    Target directory on an SSH host. A single SSH connection is opened and
+    every thread gets its own SFTP channel on it, checksums are computed on
+    the host with sha256sum in batches. The host is looked up in
+    ~/.ssh/config, see ssh_options, and must be in known_hosts.
+    '''
+    def __init__(self, host, root, user=None, port=None):
+        self.root = root
+        self.client = paramiko.SSHClient()
+        self.client.load_system_host_keys()
+        self.client.set_missing_host_key_policy(paramiko.RejectPolicy())
+        self.client.connect(**ssh_options(host, user=user, port=port))
+        self.transport = self.client.get_transport()
+        self.transport.set_keepalive(30)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sftp_clients = []
+        self._directories = set()
+
+    @property
+    def sftp(self):
+        sftp = getattr(self._local, 'sftp', None)
+        if sftp is None:
+            sftp = paramiko.SFTPClient.from_transport(self.transport)
+            with self._lock:
+                self._sftp_clients.append(sftp)
+            self._local.sftp = sftp
+        return sftp
+
+    def join(self, relpath):
+        return posixpath.join(self.root, relpath)
+
+    def listing(self):
+        files = {}
+        pending = ['']
+        while pending:
+            relpath = pending.pop()
+            try:
+                entries = self.sftp.listdir_attr(self.join(relpath))
+            except IOError:
+                continue
+            for entry in entries:
+                child = posixpath.join(relpath, entry.filename)
+                if stat.S_ISDIR(entry.st_mode):
+                    pending.append(child)
+                elif stat.S_ISREG(entry.st_mode):
+                    files[child] = (entry.st_size, entry.st_mtime)
+        return files
+
+    def makedirs(self, relpath):
+        path = self.root
+        for part in [''] + relpath.split('/'):
+            path = posixpath.join(path, part)
+            if path in self._directories:
+                continue
+            try:
+                self.sftp.stat(path)
+            except IOError:
+                self.sftp.mkdir(path)
+            self._directories.add(path)
+
+    def checksums(self, relpaths):
+        result = {}
+        relpaths = list(relpaths)
+        for start in range(0, len(relpaths), CHECKSUM_BATCH):
+            batch = relpaths[start:start + CHECKSUM_BATCH]
+            command = 'cd {} && sha256sum -- {}'.format(
+                shlex.quote(self.root),
+                ' '.join(shlex.quote(p) for p in batch))
+            _, stdout, _ = self.client.exec_command(command)
+            for line in stdout.read().decode('utf-8').splitlines():
+                checksum, _, relpath = line.partition('  ')
+                result[relpath] = checksum
+        return result
+
+    def open(self, relpath, mode):
+        f = self.sftp.open(self.join(relpath), mode)
+        # do not wait for the server to acknowledge each write
+        f.set_pipelined(True)
+        return f
+
+    def rename(self, source, destination):
+        self.sftp.posix_rename(self.join(source), self.join(destination))
+
+    def utime(self, relpath, mtime):
+        self.sftp.utime(self.join(relpath), (mtime, mtime))
+
+    def remove(self, relpath):
+        self.sftp.remove(self.join(relpath))
+
+    def close(self):
+        for sftp in self._sftp_clients:
+            sftp.close()
+        self.client.close()
+
+
+def open_target(target):
+    '''
+    LocalTarget or SSHTarget of a target "[user@]host:path" or a local path.
+    '''
+    user, host, path = parse_target(target)
+    if host is None:
+        return LocalTarget(path)
+    return SSHTarget(host, path, user=user)
+
+
+def plan_sync(source, target, checksum=True):
+    '''
+    Compare source with target and list the files to transfer. Files with
+    equal size and mtime are skipped, and if checksum is True only when
+    their sha256 also match. Files with a partial transfer "<name>.part"
+    in target are resumed at the size of the partial file.
+
+    Returns
+    -------
+    transfers : list of (relpath, offset)
+    skipped : list of skipped relpaths
+    '''
+    source = pathlib.Path(source)
+    local = _listing(source)
+    remote = target.listing()
+    skipped = [p for p in sorted(local) if remote.get(p) == local[p]]
+    if checksum and skipped:
+        remote_checksums = target.checksums(skipped)
+        unchanged = []
+        for relpath in skipped:
+            with source.joinpath(*relpath.split('/')).open('rb') as f:
+                if remote_checksums.get(relpath) == _sha256(f):
+                    unchanged.append(relpath)
+        skipped = unchanged
+    transfers = []
+    for relpath in sorted(set(local) - set(skipped)):
+        part = remote.get(relpath + PART_SUFFIX)
+        offset = 0
+        if part is not None and part[0] <= local[relpath][0]:
+            offset = part[0]
+        transfers.append((relpath, offset))
+    return transfers, skipped
+
+
+def plan_delete(source, target):
+    '''
+    Files in target which are not in source, partial transfers of files in
+    source are kept.
+    '''
+    local = _listing(source)
+    return [p for p in sorted(target.listing()) if p not in local and not (
+        p.endswith(PART_SUFFIX) and p[:-len(PART_SUFFIX)] in local)]
+
+
+def transfer_file(source, target, relpath, offset=0):
+    '''
+    Copy source/relpath to "<relpath>.part" in target starting at offset,
+    then rename it to relpath and set the mtime of the source.
+
+    Returns
+    -------
+    number of bytes written
+    '''
+    path = pathlib.Path(source).joinpath(*relpath.split('/'))
+    part = relpath + PART_SUFFIX
+    with path.open('rb') as fsrc:
+        with target.open(part, 'r+b' if offset else 'wb') as fdst:
+            if offset:
+                fsrc.seek(offset)
+                fdst.seek(offset)
+            shutil.copyfileobj(fsrc, fdst, CHUNK_SIZE)
+    target.rename(part, relpath)
+    target.utime(relpath, int(path.stat().st_mtime))
+    return path.stat().st_size - offset
+
+
+def sync(source, target, streams=DEFAULT_STREAMS, checksum=True,
+         dry_run=False, delete=False):
+    '''
+    Mirror the files in the directory source to target, a path, a remote
+    "[user@]host:path" or a target object, see plan_sync and open_target,
+    with streams files transferred in parallel. Resumed files
+    are verified with their checksum and copied again if they differ.
+    If delete is True, files in target which are not in source are deleted
+    after the transfer, see plan_delete, empty directories are kept.
+
+    Returns
+    -------
+    dict with the number of copied, resumed, skipped and deleted files and
+    bytes
+    '''
+    source = pathlib.Path(source)
+    opened = isinstance(target, (str, pathlib.Path))
+    if opened:
+        target = open_target(target)
+    try:
+        transfers, skipped = plan_sync(source, target, checksum=checksum)
+        result = {'copied': len(transfers), 'skipped': len(skipped),
+                  'resumed': sum(offset > 0 for _, offset in transfers),
+                  'deleted': 0, 'bytes': 0}
+        if dry_run:
+            for relpath, offset in transfers:
+                print('{} "{}"'.format(
+                    'Resume' if offset else 'Copy', relpath))
+            if delete:
+                for relpath in plan_delete(source, target):
+                    print('Delete "{}"'.format(relpath))
+            return result
+        directories = set(posixpath.dirname(p) for p, _ in transfers)
+        for directory in sorted(directories):
+            target.makedirs(directory)
+        total = sum((source / p).stat().st_size - offset
+                    for p, offset in transfers)
+        t_start = time.time()
+
+        def run(transfers):
+            # larger files first such that the streams finish together
+            transfers = sorted(
+                transfers, key=lambda t: -(source / t[0]).stat().st_size)
+            with futures.ThreadPoolExecutor(max_workers=streams) as executor:
+                running = [executor.submit(
+                    transfer_file, source, target, relpath, offset)
+                    for relpath, offset in transfers]
+                for job in futures.as_completed(running):
+                    result['bytes'] += job.result()
+                    utils.report_progress(
+                        'Syncing', result['bytes'] / max(total, 1),
+                        result['bytes'] / max(time.time() - t_start, 1e-9))
+
+        run(transfers)
+        resumed = [p for p, offset in transfers if offset > 0]
+        if resumed:
+            remote_checksums = target.checksums(resumed)
+            failed = []
+            for relpath in resumed:
+                with source.joinpath(*relpath.split('/')).open('rb') as f:
+                    if remote_checksums.get(relpath) != _sha256(f):
+                        failed.append((relpath, 0))
+            if failed:
+                print('Copying {} resumed files again'.format(len(failed)))
+                run(failed)
+        if delete:
+            for relpath in plan_delete(source, target):
+                target.remove(relpath)
+                result['deleted'] += 1
+        elapsed = time.time() - t_start
+        print('Copied {} files, {:.1f} MB in {:.1f} s ({:.1f} MB/s), '
+              'skipped {} files, deleted {} files'.format(
+                  result['copied'], result['bytes'] / 1024 ** 2, elapsed,
+                  result['bytes'] / 1024 ** 2 / max(elapsed, 1e-9),
+                  result['skipped'], result['deleted']))
+        return result
+    finally:
+        if opened:
+            target.close()
+
+
+def sync_action(project, action_id, target, **kwargs):
+    '''
+    Mirror "actions/<action_id>/data" of project to the same path below
+    target, see sync.
+    '''
+    source = pathlib.Path(project.path) / 'actions' / action_id / 'data'
+    if not source.exists():
+        raise FileNotFoundError(
+            'Action "{}" has no data in "{}"'.format(action_id, source))
+    return sync(source, join_target(target, 'actions', action_id, 'data'),
+                **kwargs)
@@ -0,0 +1,176 @@
+from expipe_plugin_cinpla.imports import *
+
+
+def remove_bad_positions(x, y, box_size=None):
+    '''
+    Mask samples which are not finite, at the origin (untracked LEDs are
+    stored as zero) or outside the box.
+
+    Returns
+    -------
+    bad : boolean array, True where the sample is bad
+    '''
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    bad = ~np.isfinite(x) | ~np.isfinite(y) | ((x == 0) & (y == 0))
+    if box_size is not None:
+        with np.errstate(invalid='ignore'):
+            bad |= (x < 0) | (x > box_size[0]) | (y < 0) | (y > box_size[1])
+    return bad
+
+
+def interpolate_gaps(t, values, bad, max_gap):
+    '''
+    Linearly interpolate runs of bad samples lasting at most max_gap seconds,
+    longer runs are left as nan.
+    '''
+    t = np.asarray(t, dtype=float)
+    out = np.array(values, dtype=float)
+    good = ~bad
+    if good.sum() < 2:
+        out[bad] = np.nan
+        return out
+    out[bad] = np.interp(t[bad], t[good], out[good])
+    # duration of each gap from the last good sample before to the first after
+    idxs = np.arange(len(t))
+    prev_good = np.maximum.accumulate(np.where(good, idxs, 0))
+    next_good = np.minimum.accumulate(
+        np.where(good, idxs, len(t) - 1)[::-1])[::-1]
+    gap = t[next_good] - t[prev_good]
+    # gaps at the beginning or end are not interpolated
+    first, last = np.argmax(good), len(t) - 1 - np.argmax(good[::-1])
+    edge = (idxs < first) | (idxs > last)
+    out[bad & ((gap > max_gap) | edge)] = np.nan
+    return out
+
+
+def smooth(values, window):
+    '''
+    Moving average over window samples ignoring nan, computed with
+    cumulative sums.
+    '''
+    values = np.asarray(values, dtype=float)
+    if window <= 1:
+        return values.copy()
+    valid = np.isfinite(values)
+    filled = np.where(valid, values, 0)
+    pad = window // 2
+    csum = np.cumsum(np.pad(filled, (pad + 1, window - pad - 1)))
+    ccount = np.cumsum(
+        np.pad(valid.astype(float), (pad + 1, window - pad - 1)))
+    total = csum[window:] - csum[:-window]
+    count = ccount[window:] - ccount[:-window]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out = total / count
+    out[~valid] = np.nan
+    return out
+
+
+def speed(t, x, y):
+    '''
+    Speed from central differences of the positions.
+    '''
+    t = np.asarray(t, dtype=float)
+    if len(t) < 2:
+        return np.full(len(t), np.nan)
+    vx = np.gradient(x, t)
+    vy = np.gradient(y, t)
+    return np.sqrt(vx ** 2 + vy ** 2)
+
+
+def head_direction(x1, y1, x2, y2):
+    '''
+    Head direction in degrees [0, 360) as the angle of the vector from the
+    second to the first LED.
+    '''
+    angle = np.degrees(np.arctan2(
+        np.asarray(y1) - np.asarray(y2), np.asarray(x1) - np.asarray(x2)))
+    return np.mod(angle, 360)
+
+
+def _mean_of_finite(arrays):
+    arrays = np.array(arrays)
+    count = np.isfinite(arrays).sum(axis=0)
+    total = np.where(np.isfinite(arrays), arrays, 0).sum(axis=0)
+    return np.where(count > 0, total / np.maximum(count, 1), np.nan)
+
+
+def process_tracking(t, leds, box_size=None, max_gap=0.5, smooth_window=0.1):
+    '''
+    Clean up tracking from one or two LEDs.
+
+    Parameters
+    ----------
+    t : array of sample times in seconds
+    leds : list of (x, y) arrays per LED, the first LED is the front
+    box_size : (width, height), samples outside are removed
+    max_gap : longest gap in seconds which is interpolated
+    smooth_window : length of moving average in seconds
+
+    Returns
+    -------
+    dict with t, x, y, speed and head_direction (nan with a single LED)
+    '''
+    t = np.asarray(t, dtype=float)
+    dt = np.diff(t)
+    dt = dt[dt > 0]
+    if len(dt) > 0:
+        window = max(int(round(smooth_window / np.median(dt))), 1)
+    else:
+        window = 1
+    cleaned = []
+    for x, y in leds:
+        bad = remove_bad_positions(x, y, box_size)
+        x = smooth(interpolate_gaps(t, x, bad, max_gap), window)
+        y = smooth(interpolate_gaps(t, y, bad, max_gap), window)
+        cleaned.append((x, y))
+    x = _mean_of_finite([c[0] for c in cleaned])
+    y = _mean_of_finite([c[1] for c in cleaned])
+    if len(cleaned) > 1:
+        (x1, y1), (x2, y2) = cleaned[:2]
+        hd = head_direction(x1, y1, x2, y2)
+    else:
+        hd = np.full(len(t), np.nan)
+    return {'t': t, 'x': x, 'y': y, 'speed': speed(t, x, y),
+            'head_direction': hd}
+
+
+def generate_processed_tracking(exdir_path, box_size=None, max_gap=0.5,
+                                smooth_window=0.1):
+    '''
+    Clean up the tracking in "processing/tracking/camera_0/Position" and
+    write it once to "processing/tracking/camera_0/Processed". Positions and
+    speed keep the length unit of the LED data, meters if it has none.
+    '''
+    exdir_file = exdir.File(exdir_path, plugins=exdir.plugins.quantities)
+    processing = exdir_file.require_group('processing')
+    try:
+        camera = processing['tracking']['camera_0']
+        position = camera['Position']
+    except KeyError:
+        print('WARNING: No tracking to process.')
+        return
+    led_names = sorted(k for k in position.keys() if k.startswith('led_'))
+    if len(led_names) == 0:
+        raise ValueError(
+            'No LEDs found in "{}"'.format(position.name))
+    t = np.asarray(position[led_names[0]]['timestamps'].data, dtype=float)
+    unit = getattr(position[led_names[0]]['data'].data, 'units', pq.m)
+    leds = []
+    for name in led_names:
+        coords = np.asarray(position[name]['data'].data, dtype=float)
+        leds.append((coords[:, 0], coords[:, 1]))
+    box_size = box_size or getattr(PAR, 'BOX_SIZE', None)
+    tracking = process_tracking(
+        t, leds, box_size=box_size, max_gap=max_gap,
+        smooth_window=smooth_window)
+    processed = camera.require_group('Processed')
+    processed.attrs['box_size'] = box_size
+    processed.attrs['max_gap'] = max_gap * pq.s
+    processed.attrs['smooth_window'] = smooth_window * pq.s
+    processed.require_dataset('timestamps', data=tracking['t'] * pq.s)
+    processed.require_dataset('data', data=np.column_stack(
+        (tracking['x'], tracking['y'])) * unit)
+    processed.require_dataset('speed', data=tracking['speed'] * unit / pq.s)
+    processed.require_dataset(
+        'head_direction', data=tracking['head_direction'] * pq.deg)
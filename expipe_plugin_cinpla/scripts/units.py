@@ -0,0 +1,104 @@
+from expipe_plugin_cinpla.imports import *
+
+CLUSTER_GROUPS = ['good', 'noise', 'unsorted', 'mua']
+LABEL_DTYPE = [('channel_group', int), ('cluster', int), ('label', 'U16')]
+
+
+def cluster_group_rows(cluster_group):
+    '''
+    Convert cluster groups to a list of [channel_group, cluster, label].
+
+    Parameters
+    ----------
+    cluster_group : None, dict as {channel_group: {cluster: label}} or
+        iterable of (channel_group, cluster, label)
+    '''
+    if cluster_group is None:
+        return []
+    if isinstance(cluster_group, dict):
+        return [[int(group), int(cluster), str(label)]
+                for group, clusters in cluster_group.items()
+                for cluster, label in clusters.items()]
+    return [[int(group), int(cluster), str(label)]
+            for group, cluster, label in cluster_group]
+
+
+def read_cluster_group(filename):
+    '''
+    Read cluster groups from a csv file with columns channel_group,
+    cluster and label, the header is optional.
+    '''
+    rows = []
+    with open(str(filename), 'r') as f:
+        for row in csv.reader(f):
+            if len(row) == 0 or row[0].strip().startswith('#'):
+                continue
+            if not row[0].strip().lstrip('-').isdigit():
+                continue # header
+            group, cluster, label = [r.strip() for r in row[:3]]
+            if label not in CLUSTER_GROUPS:
+                raise ValueError(
+                    'Label "{}" in "{}" not in {}'.format(
+                        label, filename, CLUSTER_GROUPS))
+            rows.append([int(group), int(cluster), label])
+    return rows
+
+
+def label_table(rows):
+    '''
+    Structured array with fields channel_group, cluster and label sorted by
+    channel_group and cluster. If a cluster is given several times the last
+    label is used.
+    '''
+    table = np.array([tuple(r) for r in rows], dtype=LABEL_DTYPE)
+    if len(table) == 0:
+        return table
+    # keep the last occurrence of each (channel_group, cluster)
+    reverse = table[::-1]
+    keys = reverse['channel_group'].astype(np.int64) * 2 ** 32 + \
+        reverse['cluster']
+    _, idxs = np.unique(keys, return_index=True)
+    return np.sort(reverse[idxs], order=['channel_group', 'cluster'])
+
+
+def label_clusters(clusters, channel_group, table, set_noise=False):
+    '''
+    Look up the label of each cluster in the table, clusters which are not
+    in the table are "unsorted". Cluster 0 is "noise" if set_noise and not
+    given in the table.
+    '''
+    clusters = np.asarray(clusters)
+    rows = table[table['channel_group'] == channel_group]
+    labels = np.full(clusters.shape, 'unsorted', dtype=LABEL_DTYPE[2][1])
+    if set_noise:
+        labels[clusters == 0] = 'noise'
+    if len(rows) == 0:
+        return labels
+    idxs = np.searchsorted(rows['cluster'], clusters)
+    idxs = np.minimum(idxs, len(rows) - 1)
+    found = rows['cluster'][idxs] == clusters
+    labels[found] = rows['label'][idxs[found]]
+    return labels
+
+
+def group_spikes(times, clusters):
+    '''
+    Split spike times by cluster in one pass.
+
+    Returns
+    -------
+    unique : sorted cluster ids
+    spike_trains : list of spike times per cluster in unique
+    '''
+    times = np.asarray(times)
+    clusters = np.asarray(clusters)
+    if len(times) != len(clusters):
+        raise ValueError(
+            'Number of spikes {} and cluster assignments {} differ'.format(
+                len(times), len(clusters)))
+    if len(times) == 0:
+        return np.array([], dtype=clusters.dtype), []
+    order = np.argsort(clusters, kind='stable')
+    unique, starts = np.unique(clusters[order], return_index=True)
+    spike_trains = np.split(times[order], starts[1:])
+    return unique, spike_trains
@@ -1,5 +1,6 @@
 from expipe_plugin_cinpla.imports import *
 from .config import load_parameters
+from .adjustment_log import AdjustmentLog, read_adjustment_module
 
 nwb_main_groups = ['acquisition', 'analysis', 'processing', 'epochs',
                    'general']
@@ -75,21 +76,122 @@ def get_depth_from_surgery(project, entity_id):
     return position
 
 
-def get_depth_from_adjustment(project, action, entity_id):
-    DTIME_FORMAT = expipe.core.datetime_format
+class DepthTimeline:
+    '''
+    Depths of an entity sorted by the date of the adjustment modules, looked
+    up with bisect. initial is the depth before all adjustments, the depth
+    from surgery in get_depth_timeline.
+    '''
+    def __init__(self, dates, depths, version=None, initial=None):
+        order = sorted(range(len(dates)), key=lambda i: dates[i])
+        self.dates = [dates[i] for i in order]
+        self.depths = [depths[i] for i in order]
+        self.version = version
+        self.initial = initial
+
+    @classmethod
+    def from_modules(cls, modules):
+        '''
+        Timeline of adjustment modules with the contents "date" and "depth",
+        a later module replaces an earlier module with the same date.
+        Modules made from the adjustment template are skipped, see
+        read_adjustment_module.
+        '''
+        adjusts = {}
+        for name in sorted(modules):
+            adjustment = read_adjustment_module(name, modules[name].contents)
+            if adjustment is not None:
+                date, _, depth = adjustment
+                adjusts[date] = depth
+        return cls(list(adjusts.keys()), list(adjusts.values()),
+                   version=len(modules))
+
+    def __len__(self):
+        return len(self.dates)
+
+    def depth_at(self, date):
+        '''
+        Depth of the last adjustment before date and the adjustment date. If
+        no adjustment is before date, initial and None are returned.
+        '''
+        index = bisect.bisect_left(self.dates, date) - 1
+        if index < 0:
+            return copy.deepcopy(self.initial), None
+        return copy.deepcopy(self.depths[index]), self.dates[index]
+
+    def depths_at(self, dates):
+        '''
+        List of (depth, adjustment date) at each of dates, see depth_at.
+        '''
+        return [self.depth_at(date) for date in dates]
+
+
+_depth_timelines = {}
+
+
+def _depth_timeline_key(project, entity_id):
+    return str(project.path), entity_id
+
+
+def get_depth_timeline(project, entity_id):
+    '''
+    The cached DepthTimeline of the action "<entity_id>-adjustment" with the
+    depth from surgery as initial depth, None if neither exists. The
+    AdjustmentLog of the action is used if it exists, otherwise the
+    adjustment modules. The timeline is read again when the number of
+    adjustments changes or after invalidate_depth_timeline.
+    '''
+    try:
+        initial = get_depth_from_surgery(project, entity_id) or None
+    except KeyError:
+        initial = None
+    except ValueError as e:
+        # only needed before the first adjustment
+        print('Unable to read the depth from surgery: {}'.format(e))
+        initial = None
     try:
         adjustments = project.actions[entity_id + '-adjustment']
     except KeyError as e:
-        return None, None
-    adjusts = {}
-    for adjust in adjustments.modules.values():
-        values = adjust.contents
-        adjusts[datetime.strptime(values['date'], DTIME_FORMAT)] = adjust
+        if initial is None:
+            return None
+        return DepthTimeline([], [], initial=initial)
+    key = _depth_timeline_key(project, entity_id)
+    timeline = _depth_timelines.get(key)
+    log = AdjustmentLog.for_action(adjustments)
+    if log.exists():
+        version = ('log', log.head['num_records'])
+        if timeline is None or timeline.version != version:
+            dates, depths = log.timeline()
+            timeline = DepthTimeline(dates, depths, version=version)
+    else:
+        modules = adjustments.modules
+        if timeline is None or timeline.version != len(modules):
+            timeline = DepthTimeline.from_modules(
+                {name: modules[name] for name in modules.keys()})
+    # the surgery is not part of the version and is read every time
+    timeline.initial = initial
+    _depth_timelines[key] = timeline
+    return timeline
+
+
+def invalidate_depth_timeline(project, entity_id):
+    _depth_timelines.pop(_depth_timeline_key(project, entity_id), None)
 
-    regdate = action.datetime
-    adjustdates = adjusts.keys()
-    adjustdate = min(adjustdates, key=lambda x: deltadate(x, regdate))
-    return adjusts[adjustdate]['depth'].contents, adjustdate
+
+def get_depths_from_adjustment(project, entity_id, dates):
+    '''
+    List of (depth, adjustment date) of entity_id at each of dates, see
+    DepthTimeline.depth_at.
+    '''
+    timeline = get_depth_timeline(project, entity_id)
+    if timeline is None:
+        return [(None, None) for date in dates]
+    return timeline.depths_at(dates)
+
+
+def get_depth_from_adjustment(project, action, entity_id):
+    return get_depths_from_adjustment(
+        project, entity_id, [action.datetime])[0]
 
 
 def register_depth(project, action, depth=None, answer=None):
@@ -105,7 +207,7 @@ def register_depth(project, action, depth=None, answer=None):
         curr_depth, adjustdate = get_depth_from_adjustment(
             project, action, action.entities[0])
     if curr_depth is None:
-        print('Cannot find current depth from adjustments.')
+        print('Cannot find current depth from surgery or adjustments.')
         return False
 
     def last_num(x):
@@ -170,3 +272,29 @@ def register_templates(action, templates, overwrite=False):
         except Exception as e:
             print(template)
             raise e
+
+
+_progress_callback = None
+
+
+def set_progress_callback(callback):
+    '''
+    Set a function called as callback(stage, fraction, throughput) by
+    report_progress, None to disable.
+    '''
+    global _progress_callback
+    _progress_callback = callback
+
+
+def report_progress(stage, fraction=None, throughput=None):
+    '''
+    Report progress of a long running step to the progress callback.
+
+    Parameters
+    ----------
+    stage : name of the step
+    fraction : fraction done between 0 and 1, None if unknown
+    throughput : bytes per second, None if unknown
+    '''
+    if _progress_callback is not None:
+        _progress_callback(stage, fraction, throughput)
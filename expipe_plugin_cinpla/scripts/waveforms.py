@@ -0,0 +1,118 @@
+from expipe_plugin_cinpla.imports import *
+from .recording import BinaryRecordingExtractor
+from . import utils
+
+DEFAULT_MAX_SPIKES = 1000
+
+
+def subsample_spikes(spike_train, max_spikes, random_state):
+    '''
+    Random selection of at most max_spikes spikes kept in time order.
+    '''
+    spike_train = np.asarray(spike_train)
+    if max_spikes is None or len(spike_train) <= max_spikes:
+        return spike_train
+    idxs = random_state.choice(len(spike_train), max_spikes, replace=False)
+    return spike_train[np.sort(idxs)]
+
+
+def extract_group_waveforms(exdir_path, dat_path, group, channel_ids,
+                            spike_trains, max_spikes=DEFAULT_MAX_SPIKES,
+                            ms_before=1., ms_after=2., seed=None):
+    '''
+    Read waveforms of the units in one channel group on the channels of the
+    group only and write them to
+    "processing/electrophysiology/channel_group_<group>/EventWaveform",
+    replacing waveforms from the .spikes files or an earlier sorting.
+
+    Parameters
+    ----------
+    exdir_path : path to the exdir directory
+    dat_path : path to the binary recording, see BinaryRecordingExtractor
+    group : channel group id
+    channel_ids : channel ids in the group
+    spike_trains : dict of {unit_id: spike frames}
+    max_spikes : largest number of waveforms per unit, None for all
+    ms_before, ms_after : waveform length around the spike in ms
+    seed : seed of the random subsampling
+
+    Returns
+    -------
+    group, number of waveforms
+    '''
+    recording = BinaryRecordingExtractor(dat_path)
+    sample_rate = recording.getSamplingFrequency()
+    num_before = int(ms_before * sample_rate / 1000.)
+    num_after = int(ms_after * sample_rate / 1000.)
+    random_state = np.random.RandomState(seed)
+    frames, unit_ids = [], []
+    for unit_id in sorted(spike_trains):
+        selected = subsample_spikes(
+            spike_trains[unit_id], max_spikes, random_state)
+        frames.append(selected.astype(int))
+        unit_ids.append(np.full(len(selected), unit_id, dtype=int))
+    frames = np.concatenate(frames) if frames else np.zeros(0, dtype=int)
+    unit_ids = np.concatenate(unit_ids) if unit_ids else frames.copy()
+    waveforms = recording.getSnippets(
+        reference_frames=frames, snippet_len=(num_before, num_after),
+        channel_ids=channel_ids)
+    gains = recording.getGains(channel_ids).astype('float32')
+    waveforms = waveforms * gains[:, None]
+    exdir_file = exdir.File(exdir_path, plugins=exdir.plugins.quantities)
+    channel_group = exdir_file['processing']['electrophysiology'].require_group(
+        'channel_group_{}'.format(group))
+    event_waveform = channel_group.require_group('EventWaveform')
+    # require_dataset does not overwrite existing datasets
+    if 'waveform_timeseries' in event_waveform:
+        del event_waveform['waveform_timeseries']
+    waveform = event_waveform.create_group('waveform_timeseries')
+    waveform.attrs['num_samples'] = len(frames)
+    waveform.attrs['sample_rate'] = sample_rate * pq.Hz
+    waveform.attrs['electrode_group_id'] = group
+    waveform.attrs['channel_ids'] = [int(c) for c in channel_ids]
+    waveform.attrs['max_spikes_per_unit'] = max_spikes
+    waveform.attrs['left_sweep'] = ms_before * pq.ms
+    waveform.create_dataset(
+        'timestamps', data=frames / sample_rate * pq.s)
+    waveform.create_dataset('unit_ids', data=unit_ids)
+    data = waveform.create_dataset('data', data=waveforms)
+    data.attrs['sample_rate'] = sample_rate * pq.Hz
+    data.attrs['unit'] = 'uV'
+    return group, len(frames)
+
+
+def extract_waveforms(exdir_path, dat_path, recording, sorting, n_jobs=1,
+                      max_spikes=DEFAULT_MAX_SPIKES, ms_before=1.,
+                      ms_after=2., seed=0):
+    '''
+    Extract waveforms per channel group in a pool of n_jobs processes,
+    see extract_group_waveforms. The channel property and the unit property
+    "group" assign channels and units to groups.
+    '''
+    groups = {}
+    for unit_id in sorting.getUnitIds():
+        group = sorting.getUnitProperty(unit_id, 'group')
+        groups.setdefault(group, {})[unit_id] = \
+            sorting.getUnitSpikeTrain(unit_id)
+    channel_groups = {}
+    for channel_id in recording.getChannelIds():
+        group = recording.getChannelProperty(channel_id, 'group')
+        channel_groups.setdefault(group, []).append(channel_id)
+    exdir_file = exdir.File(exdir_path, plugins=exdir.plugins.quantities)
+    exdir_file.require_group('processing').require_group('electrophysiology')
+    jobs = [(exdir_path, dat_path, group, channel_groups[group],
+             spike_trains, max_spikes, ms_before, ms_after, seed)
+            for group, spike_trains in sorted(groups.items())]
+    if n_jobs == 1:
+        for n, job in enumerate(jobs):
+            extract_group_waveforms(*job)
+            utils.report_progress('Waveforms', (n + 1) / len(jobs))
+        return
+    with futures.ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        running = [executor.submit(extract_group_waveforms, *job)
+                   for job in jobs]
+        for n, job in enumerate(futures.as_completed(running)):
+            group, num_waveforms = job.result()
+            print('Extracted {} waveforms in channel group {}'.format(
+                num_waveforms, group))
+            utils.report_progress('Waveforms', (n + 1) / len(jobs))
@@ -1,6 +1,7 @@
 from expipe_plugin_cinpla.imports import *
 from expipe_plugin_cinpla.scripts import axona
 from .utils import SelectFileButton, MultiInput, SearchSelectMultiple, required_values_filled, none_if_empty, split_tags
+from .tasks import get_task_list
 
 
 def axona_view(project):
@@ -16,6 +17,8 @@ def axona_view(project):
     register_depth = ipywidgets.Checkbox(description='Register depth', value=False)
     register_depth_from_adjustment = ipywidgets.Checkbox(
         description='Find adjustments', value=True)
+    confirm_depth = ipywidgets.Checkbox(
+        description='Depth is correct', value=False)
 
     load_input = ipywidgets.Checkbox(description='Load .inp', value=False)
     set_zero_cluster_to_noise = ipywidgets.Checkbox(description='Zero cluster noise', value=True)
@@ -33,9 +36,11 @@ def axona_view(project):
         register
     ])
     checks = ipywidgets.HBox([axona_path, register_depth, overwrite, load_cut, load_input])
+    tasks = get_task_list()
     main_box = ipywidgets.VBox([
             checks,
-            ipywidgets.HBox([fields, templates])
+            ipywidgets.HBox([fields, templates]),
+            tasks
         ])
 
 
@@ -43,11 +48,11 @@ def axona_view(project):
          if change['name'] == 'value':
              if change['owner'].value:
                  children = list(checks.children)
-                 children = children[:2] + [register_depth_from_adjustment] + children[2:]
+                 children = children[:2] + [register_depth_from_adjustment, confirm_depth] + children[2:]
                  checks.children = children
              else:
                 children = list(checks.children)
-                del(children[2])
+                del(children[2:4])
                 checks.children = children
 
 
@@ -71,8 +76,8 @@ def axona_view(project):
         if not required_values_filled(user, location):
             return
         no_cut = not load_cut.value
-        axona.register_axona_recording(
-            project=project,
+        tasks.submit(
+            'Register', axona.__name__, 'register_axona_recording', project,
             action_id=none_if_empty(action_id.value),
             axona_filename=axona_path.file,
             depth=depth.value,
@@ -88,7 +93,7 @@ def axona_view(project):
             cluster_group=[],
             set_zero_cluster_to_noise=set_zero_cluster_to_noise.value,
             register_depth=register_depth.value,
-            correct_depth_answer=True)
+            correct_depth_answer=confirm_depth.value)
 
     register.on_click(on_register)
     return main_box
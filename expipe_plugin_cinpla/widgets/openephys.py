@@ -1,6 +1,7 @@
 from expipe_plugin_cinpla.imports import *
 from expipe_plugin_cinpla.scripts import openephys
 from .utils import SelectDirectoryButton, MultiInput, SearchSelectMultiple, SelectFileButton, required_values_filled, none_if_empty, split_tags, SearchSelect
+from .tasks import get_task_list
 
 
 def openephys_view(project):
@@ -17,6 +18,8 @@ def openephys_view(project):
     register_depth = ipywidgets.Checkbox(description='Register depth', value=False)
     register_depth_from_adjustment = ipywidgets.Checkbox(
         description='Find adjustments', value=True)
+    confirm_depth = ipywidgets.Checkbox(
+        description='Depth is correct', value=False)
 
     overwrite = ipywidgets.Checkbox(description='Overwrite', value=False)
     delete_raw_data = ipywidgets.Checkbox(
@@ -34,9 +37,11 @@ def openephys_view(project):
         register
     ])
     checks = ipywidgets.HBox([openephys_path, register_depth, overwrite, delete_raw_data])
+    tasks = get_task_list()
     main_box = ipywidgets.VBox([
             checks,
-            ipywidgets.HBox([fields, templates])
+            ipywidgets.HBox([fields, templates]),
+            tasks
         ])
 
 
@@ -44,11 +49,11 @@ def openephys_view(project):
          if change['name'] == 'value':
              if change['owner'].value:
                  children = list(checks.children)
-                 children = children[:2] + [register_depth_from_adjustment] + children[2:]
+                 children = children[:2] + [register_depth_from_adjustment, confirm_depth] + children[2:]
                  checks.children = children
              else:
                 children = list(checks.children)
-                del(children[2])
+                del(children[2:4])
                 checks.children = children
 
 
@@ -71,9 +76,10 @@ def openephys_view(project):
         if not required_values_filled(user, location, openephys_path):
             return
         tags = split_tags(tag)
-        openephys.register_openephys_recording(
+        tasks.submit(
+            'Register', openephys.__name__, 'register_openephys_recording',
+            project,
             templates=templates.value,
-            project=project,
             action_id=none_if_empty(action_id.value),
             openephys_path=openephys_path.directory,
             depth=depth.value,
@@ -86,7 +92,7 @@ def openephys_view(project):
             message=none_if_empty(message.value),
             tag=tags,
             delete_raw_data=delete_raw_data.value,
-            correct_depth_answer=True)
+            correct_depth_answer=confirm_depth.value)
 
     register.on_click(on_register)
     return main_box
@@ -104,16 +110,18 @@ def process_view(project):
         sorter,
         run
     ])
+    tasks = get_task_list()
     main_box = ipywidgets.VBox([
             probe_path,
-            ipywidgets.HBox([fields, action_id])
+            ipywidgets.HBox([fields, action_id]),
+            tasks
         ])
 
     def on_run(change):
         if not required_values_filled(probe_path, action_id):
             return
-        openephys.process_openephys(
-            project=project,
+        tasks.submit(
+            'Process', openephys.__name__, 'process_openephys', project,
             action_id=action_id.value,
             probe_path=probe_path.file,
             sorter=sorter.value)
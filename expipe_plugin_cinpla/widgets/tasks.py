@@ -0,0 +1,183 @@
+from expipe_plugin_cinpla.imports import *
+from expipe_plugin_cinpla.scripts import utils
+
+
+class _MessageStream:
+    '''
+    File-like object sending written text to a queue.
+    '''
+    def __init__(self, messages):
+        self.messages = messages
+
+    def write(self, text):
+        if text:
+            self.messages.put(('output', text))
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def _run_task(messages, module, function, project_path, kwargs):
+    # runs in the background process, as leader of its own process group
+    # such that cancel also stops the processes started by the task
+    os.setpgrp()
+    sys.stdout = sys.stderr = _MessageStream(messages)
+    utils.set_progress_callback(
+        lambda stage, fraction, throughput: messages.put(
+            ('progress', stage, fraction, throughput)))
+    try:
+        project = expipe.get_project(path=project_path)
+        function = getattr(importlib.import_module(module), function)
+        function(project=project, **kwargs)
+    except BaseException:
+        messages.put(('output', traceback.format_exc()))
+        messages.put(('status', 'failed'))
+    else:
+        messages.put(('status', 'done'))
+
+
+def _format_throughput(throughput):
+    if throughput is None:
+        return ''
+    for unit in ['B/s', 'kB/s', 'MB/s']:
+        if throughput < 1024:
+            return '{:.1f} {}'.format(throughput, unit)
+        throughput /= 1024
+    return '{:.1f} GB/s'.format(throughput)
+
+
+class BackgroundTask(ipywidgets.VBox):
+    '''
+    Run function(project=project, **kwargs) from module in a background
+    process with its output, progress and a cancel button in the widget.
+    Progress is reported with scripts.utils.report_progress.
+    '''
+    def __init__(self, description, module, function, project, kwargs,
+                 on_finish=None, *args, **kwargs_widget):
+        super(BackgroundTask, self).__init__(*args, **kwargs_widget)
+        self.module = module
+        self.function = function
+        self.project_path = str(project.path)
+        self.kwargs = kwargs
+        self.on_finish = on_finish
+        self.status = 'queued'
+        self._process = None
+        self.progress = ipywidgets.FloatProgress(
+            min=0, max=1, description=description)
+        self.label = ipywidgets.Label('queued')
+        self.cancel_button = ipywidgets.Button(
+            description='Cancel', layout={'width': '80px'})
+        self.cancel_button.on_click(lambda change: self.cancel())
+        self.output = ipywidgets.Output(
+            layout={'max_height': '200px', 'overflow_y': 'auto'})
+        self.children = [
+            ipywidgets.HBox([self.progress, self.label, self.cancel_button]),
+            self.output]
+
+    def start(self):
+        context = multiprocessing.get_context('spawn')
+        self._messages = context.Queue()
+        # not a daemon, daemonic processes can not start process pools
+        self._process = context.Process(
+            target=_run_task,
+            args=(self._messages, self.module, self.function,
+                  self.project_path, self.kwargs))
+        self._set_status('running')
+        self._process.start()
+        threading.Thread(target=self._poll, daemon=True).start()
+
+    def cancel(self):
+        if self.status == 'queued':
+            self._set_status('cancelled')
+            self._finish()
+        elif self.status == 'running':
+            self._set_status('cancelled')
+            try:
+                os.killpg(self._process.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                # the process has not made its process group yet
+                self._process.terminate()
+
+    def _set_status(self, status):
+        self.status = status
+        self.label.value = status
+        if status in ('done', 'failed', 'cancelled'):
+            self.cancel_button.disabled = True
+            self.progress.bar_style = {
+                'done': 'success', 'failed': 'danger',
+                'cancelled': 'warning'}[status]
+
+    def _handle(self, message):
+        if message[0] == 'output':
+            self.output.append_stdout(message[1])
+        elif message[0] == 'progress':
+            _, stage, fraction, throughput = message
+            self.progress.description = stage
+            if fraction is not None:
+                self.progress.value = fraction
+            self.label.value = '{} {:.0f} % {}'.format(
+                stage, 100 * (fraction or 0),
+                _format_throughput(throughput))
+        elif message[0] == 'status' and self.status == 'running':
+            self._set_status(message[1])
+
+    def _poll(self):
+        from queue import Empty
+        while True:
+            try:
+                self._handle(self._messages.get(timeout=0.2))
+            except Empty:
+                if not self._process.is_alive():
+                    break
+        # the process may end without a status when terminated or killed
+        if self.status == 'running':
+            self._set_status('failed')
+        self._finish()
+
+    def _finish(self):
+        if self.on_finish is not None:
+            self.on_finish(self)
+
+
+class TaskList(ipywidgets.VBox):
+    '''
+    Background tasks run in order with at most max_running at a time.
+    '''
+    def __init__(self, max_running=1, *args, **kwargs):
+        super(TaskList, self).__init__(*args, **kwargs)
+        self.max_running = max_running
+        self.tasks = []
+        self._lock = threading.Lock()
+
+    def submit(self, description, module, function, project, **kwargs):
+        task = BackgroundTask(description, module, function, project, kwargs,
+                              on_finish=lambda task: self._schedule())
+        with self._lock:
+            self.tasks.append(task)
+            self.children = list(self.children) + [task]
+        self._schedule()
+        return task
+
+    def _schedule(self):
+        with self._lock:
+            running = sum(t.status == 'running' for t in self.tasks)
+            for task in self.tasks:
+                if running >= self.max_running:
+                    break
+                if task.status == 'queued':
+                    task.start()
+                    running += 1
+
+
+_task_list = None
+
+
+def get_task_list():
+    '''
+    The task list shared by the views in this kernel.
+    '''
+    global _task_list
+    if _task_list is None:
+        _task_list = TaskList(max_running=getattr(PAR, 'MAX_TASKS', 1) or 1)
+    return _task_list
@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+import expipe
+import numpy as np
+import quantities as pq
+
+from expipe_plugin_cinpla.scripts.adjustment_log import (
+    AdjustmentLog, migrate_adjustments)
+from expipe_plugin_cinpla.scripts.adjust import register_adjustment
+from expipe_plugin_cinpla.scripts.depth import depth_table
+from expipe_plugin_cinpla.scripts import utils
+
+
+def test_adjustment_log(tmpdir):
+    log = AdjustmentLog(str(tmpdir.join('adjustments')))
+    assert log.current_depth() is None
+    start = datetime(2018, 1, 1, 12)
+    for i in range(3):
+        index = log.append(
+            start + timedelta(days=i),
+            {'mecl': {'probe_1': 50 * pq.um}},
+            {'mecl': {'probe_1': (2 + 0.05 * i) * pq.mm,
+                      'probe_2': 2 * pq.mm}}, user='me')
+        assert index == i
+    # an interrupted append leaves bytes after the last record
+    with open(str(log.dat_path), 'ab') as f:
+        f.write(b'\0' * 10)
+    log.append(start + timedelta(days=3), {}, {'mecl': {'probe_1': 3 * pq.mm}})
+
+    log = AdjustmentLog(str(tmpdir.join('adjustments')))
+    assert log.next_index == 4
+    assert log.current_depth() == {'mecl': {'probe_1': 3 * pq.mm}}
+    records = log.read()
+    assert len(records) == 7
+    assert np.allclose(records['delta'], [.05, 0, .05, 0, .05, 0, 0])
+    dates, depths = log.timeline()
+    assert dates == [start + timedelta(days=i) for i in range(4)]
+    assert depths[2] == {'mecl': {'probe_1': 2.1 * pq.mm,
+                                  'probe_2': 2 * pq.mm}}
+
+
+def test_register_adjustment(tmpdir):
+    project = expipe.require_project(str(tmpdir.join('project')))
+    surgery = project.require_action('rat-surgery-implantation')
+    surgery.create_module(name='mecl', contents={
+        'probe_1': {'position': [1, 2, 1.5] * pq.mm}})
+    # history from before the adjustment log
+    action = project.require_action('rat-adjustment')
+    action.create_module(name='000_adjustment', contents={
+        'date': '2018-01-01T12:00:00',
+        'adjustment': {'mecl': {'probe_1': 50 * pq.um}},
+        'depth': {'mecl': {'probe_1': 1.55 * pq.mm}},
+        'experimenter': 'me'})
+    timeline = utils.get_depth_timeline(project, 'rat')
+    assert len(timeline) == 1
+
+    register_adjustment(project, 'rat', '2018-01-02T12:00:00',
+                        [('mecl', 1, 100, 'um')], 'me', [], True)
+    log = AdjustmentLog.for_action(project.actions['rat-adjustment'])
+    assert log.next_index == 2
+    assert log.current_depth() == {'mecl': {'probe_1': 1.65 * pq.mm}}
+    timeline = utils.get_depth_timeline(project, 'rat')
+    assert len(timeline) == 2
+    depth, date = timeline.depth_at(datetime(2018, 1, 3))
+    assert date == datetime(2018, 1, 2, 12)
+    assert depth == {'mecl': {'probe_1': 1.65 * pq.mm}}
+
+    assert migrate_adjustments(project.actions['rat-adjustment']) == 0
+
+
+def test_register_adjustment_from_surgery(tmpdir):
+    project = expipe.require_project(str(tmpdir.join('project')))
+    surgery = project.require_action('rat-surgery-implantation')
+    surgery.create_module(name='mecl', contents={
+        'probe_1': {'position': [1, 2, 1.5] * pq.mm}})
+    register_adjustment(project, 'rat', '2018-01-02T12:00:00',
+                        [('mecl', 1, 50, 'um')], 'me', [], True)
+    log = AdjustmentLog.for_action(project.actions['rat-adjustment'])
+    assert log.current_depth() == {'mecl': {'probe_1': 1.55 * pq.mm}}
+    assert len(project.actions['rat-adjustment'].modules) == 0
+
+
+def test_migrate_template_modules(tmpdir):
+    # modules as written by the adjustment template before the log
+    template = {
+        'adjustment': {'unit': 'um', 'value': ''},
+        'date': 'dd.mm.yyyy:HH:MM',
+        'definition': 'Adjustment length of drive',
+        'depth': {'unit': 'mm', 'value': ''},
+        'experimenter': '',
+        'identifier': 'drive_depth_adjustment',
+        'location': 'Left, Right',
+        'name': 'drive_depth_adjustment',
+        'notes': {'value': ''}}
+    project = expipe.require_project(str(tmpdir.join('project')))
+    action = project.require_action('rat-adjustment')
+    action.create_module(name='drive_depth_adjustment', contents=template)
+    action.create_module(name='000_adjustment', contents=dict(
+        template, date='2018-01-01T12:00:00', experimenter='me',
+        adjustment={'mecl': {'probe_1': 50 * pq.um}},
+        depth={'mecl': {'probe_1': 1.55 * pq.mm}}))
+    action.create_module(name='001_adjustment', contents=dict(
+        template, date='2018-01-02T12:00:00',
+        depth={'unit': 'mm', 'value': 1.6}))
+    action.create_module(name='002_adjustment', contents=dict(
+        template, date='2018-01-03T12:00:00',
+        depth={'mecl': {'probe_1': 1.65 * pq.mm}}))
+    recording = project.require_action('rat-recording')
+    recording.type = 'Recording'
+    recording.entities = ['rat']
+    recording.datetime = datetime(2018, 1, 2)
+    # the timeline from the modules skips the template modules as well
+    assert list(depth_table(project, cache=False)['depth']) == [1.55]
+
+    assert migrate_adjustments(action, delete_modules=True) == 2
+    assert sorted(action.modules.keys()) == [
+        '001_adjustment', 'drive_depth_adjustment']
+    log = AdjustmentLog.for_action(action)
+    dates, depths = log.timeline()
+    assert dates == [datetime(2018, 1, 1, 12), datetime(2018, 1, 3, 12)]
+    assert depths[1] == {'mecl': {'probe_1': 1.65 * pq.mm}}
+    records = log.read()
+    # the template adjustment has no length per probe
+    assert np.allclose(records['delta'], [0.05, 0])
+    assert list(records['user']) == [b'me', b'']
@@ -0,0 +1,56 @@
+import gzip
+import os
+import tarfile
+
+from expipe_plugin_cinpla.scripts.archive import (
+    ParallelGzipWriter, create_archive, verify_archive, archive_and_delete)
+
+
+def make_session(path):
+    session = path.mkdir('session')
+    session.join('experiment1.spikes').write_binary(os.urandom(300000))
+    session.join('settings.xml').write('<SETTINGS/>' * 1000)
+    session.mkdir('sub').join('empty.txt').write('')
+    return session
+
+
+def test_parallel_gzip_writer(tmpdir):
+    data = os.urandom(100000) + b'a' * 100000
+    filename = str(tmpdir.join('data.gz'))
+    with ParallelGzipWriter(filename, threads=3, block_size=7000) as writer:
+        writer.write(data[:50])
+        writer.write(data[50:])
+    with gzip.open(filename, 'rb') as f:
+        assert f.read() == data
+
+
+def test_archive(tmpdir):
+    session = make_session(tmpdir)
+    archive_path = tmpdir.join('session.tar.gz')
+    manifest = create_archive(str(session), str(archive_path), threads=2,
+                              block_size=10000)
+    assert sorted(manifest['files']) == [
+        'session/experiment1.spikes', 'session/settings.xml',
+        'session/sub/empty.txt']
+    assert verify_archive(str(archive_path), str(session)) == []
+    with tarfile.open(str(archive_path), 'r:gz') as tar:
+        data = tar.extractfile('session/settings.xml').read()
+    assert data == b'<SETTINGS/>' * 1000
+    session.join('new.txt').write('new')
+    assert verify_archive(str(archive_path), str(session)) == [
+        '"session/new.txt" not archived']
+
+
+def test_archive_and_delete(tmpdir):
+    session = make_session(tmpdir)
+    archive_path = tmpdir.join('archive', 'session.tar.gz')
+    assert archive_and_delete(str(session), str(archive_path)) is not None
+    assert not session.exists()
+    assert archive_path.exists()
+    # a corrupt archive is detected
+    session = make_session(tmpdir)
+    create_archive(str(session), str(archive_path))
+    with open(str(archive_path), 'r+b') as f:
+        f.seek(100)
+        f.write(b'corrupt')
+    assert verify_archive(str(archive_path)) != []
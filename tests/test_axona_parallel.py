@@ -0,0 +1,34 @@
+import os.path as op
+import pytest
+import exdir
+
+from expipe_plugin_cinpla.scripts import axona
+
+currdir = op.abspath(op.dirname(__file__))
+AXONA_FILENAME = op.join(currdir, 'test_data', 'axona', 'DVH_2013103103.set')
+
+
+def test_require_stage_groups(tmpdir):
+    exdir_path = str(tmpdir.join('test.exdir'))
+    exdir.File(exdir_path)
+    stages = axona._conversion_stages(
+        no_cut=False, get_inp=False, cluster_group=None,
+        set_zero_cluster_to_noise=False)
+    axona._require_stage_groups(exdir_path, AXONA_FILENAME, stages)
+    channel_groups = axona._channel_group_ids(AXONA_FILENAME)
+    elphys = exdir.File(exdir_path)['processing']['electrophysiology']
+    for channel_group_id in channel_groups['spikes']:
+        group = elphys['channel_group_{}'.format(channel_group_id)]
+        assert 'EventWaveform' in group
+        cut = channel_group_id in channel_groups['cut']
+        assert ('UnitTimes' in group) == cut
+        assert ('Clustering' in group) == cut
+    for channel_group_id in channel_groups['analog']:
+        assert 'LFP' in elphys['channel_group_{}'.format(channel_group_id)]
+
+
+@pytest.mark.parametrize('n_jobs', [0, -1])
+def test_convert_axona_rejects_n_jobs(tmpdir, n_jobs):
+    with pytest.raises(ValueError):
+        axona.convert_axona(str(tmpdir.join('test.exdir')), AXONA_FILENAME,
+                            None, [], n_jobs=n_jobs)
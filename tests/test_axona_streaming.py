@@ -0,0 +1,78 @@
+import numpy as np
+import os.path as op
+import pytest
+import exdir
+import exdir.plugins.quantities
+import quantities as pq
+
+from expipe_plugin_cinpla.scripts.axona import (
+    generate_analog_signals_streaming)
+from expipe_plugin_cinpla.scripts.axona_cache import AxonaFileCache
+
+currdir = op.abspath(op.dirname(__file__))
+AXONA_FILENAME = op.join(currdir, 'test_data', 'axona', 'DVH_2013103103.set')
+
+
+def _lfp_timeseries(exdir_path):
+    exdir_file = exdir.File(exdir_path, plugins=exdir.plugins.quantities)
+    elphys = exdir_file['processing']['electrophysiology']
+    timeseries = {}
+    for channel_group_name, channel_group in elphys.items():
+        if 'LFP' not in channel_group:
+            continue
+        for name, group in channel_group['LFP'].items():
+            timeseries[channel_group_name + '/LFP/' + name] = group
+    return timeseries
+
+
+def _stream(exdir_path, axona_file, chunk_size):
+    exdir.File(exdir_path)
+    generate_analog_signals_streaming(
+        exdir_path, AxonaFileCache(axona_file, AXONA_FILENAME),
+        chunk_size=chunk_size)
+    return _lfp_timeseries(exdir_path)
+
+
+@pytest.mark.parametrize('chunk_size', [1000, 2 ** 20])
+def test_stream_analog_signals_matches_in_memory(tmpdir, chunk_size):
+    pyxona = pytest.importorskip('pyxona')
+    axona = pytest.importorskip('expipe_io_neuro.axona')
+    axona_file = pyxona.File(AXONA_FILENAME)
+
+    in_memory_path = str(tmpdir.join('in_memory.exdir'))
+    axona.convert(axona_file, in_memory_path)
+    axona.generate_analog_signals(in_memory_path, axona_file)
+    expected = _lfp_timeseries(in_memory_path)
+
+    streamed_path = str(tmpdir.join('streamed.exdir'))
+    axona.convert(axona_file, streamed_path)
+    generate_analog_signals_streaming(
+        streamed_path, AxonaFileCache(axona_file, AXONA_FILENAME),
+        chunk_size=chunk_size)
+    result = _lfp_timeseries(streamed_path)
+
+    assert len(result) > 0
+    assert sorted(result) == sorted(expected)
+    for name, group in result.items():
+        assert group.attrs.to_dict() == expected[name].attrs.to_dict()
+        data, expected_data = group['data'], expected[name]['data']
+        assert data.attrs.to_dict() == expected_data.attrs.to_dict()
+        assert data.meta.to_dict() == expected_data.meta.to_dict()
+        np.testing.assert_allclose(data.data, expected_data.data)
+
+
+def test_stream_analog_signals_chunks(tmpdir):
+    one_chunk = _stream(str(tmpdir.join('one.exdir')), None, 2 ** 24)
+    chunks = _stream(str(tmpdir.join('chunks.exdir')), None, 100000)
+    assert sorted(one_chunk) == [
+        'channel_group_10/LFP/LFP_timeseries_40',
+        'channel_group_10/LFP/LFP_timeseries_40_egf',
+        'channel_group_9/LFP/LFP_timeseries_36',
+        'channel_group_9/LFP/LFP_timeseries_36_egf2']
+    for name, group in chunks.items():
+        data = group['data']
+        assert data.attrs['unit'] == 'uV'
+        assert data.meta['plugins']['quantities']['required']
+        assert data.attrs['num_samples'] == group.attrs['num_samples']
+        assert isinstance(data[:10], pq.Quantity)
+        np.testing.assert_array_equal(data.data, one_chunk[name]['data'].data)
@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+import time
+
+import click
+
+from expipe_plugin_cinpla.cli.main import (
+    COMMANDS, LOCAL_COMMANDS, REGISTER_COMMANDS)
+from expipe_plugin_cinpla.cli.lazy import load_command
+
+STARTUP_BUDGET = float(os.environ.get('EXPIPE_STARTUP_BUDGET', 1.5))  # s
+
+HELP_SCRIPT = '''
+import sys
+import click
+from click.testing import CliRunner
+from expipe_plugin_cinpla.cli.main import CinplaPlugin
+
+@click.group()
+def cli():
+    pass
+
+CinplaPlugin().attach_to_cli(cli)
+for args in [['--help'], ['register', '--help']]:
+    result = CliRunner().invoke(cli, args)
+    assert result.exit_code == 0, result.output
+print(' '.join(sorted(
+    m for m in sys.modules if m.startswith('expipe_plugin_cinpla.'))))
+'''
+
+
+def test_command_table():
+    for commands in [COMMANDS, LOCAL_COMMANDS, REGISTER_COMMANDS]:
+        for name, (module, short_help) in commands.items():
+            command = load_command(module, name)
+            assert command.name == name
+            assert command.short_help == short_help
+    # every command attached by the loaded modules is listed
+    from expipe_plugin_cinpla.cli import lazy
+    for module, group in lazy._loaded.items():
+        for name in group.commands:
+            assert name in COMMANDS or name in LOCAL_COMMANDS or \
+                name in REGISTER_COMMANDS, name
+
+
+def test_help_startup():
+    t_start = time.time()
+    output = subprocess.check_output(
+        [sys.executable, '-c', HELP_SCRIPT]).decode('utf-8')
+    elapsed = time.time() - t_start
+    loaded = output.split()
+    for module in ['cli.misc', 'cli.adjust', 'cli.openephys', 'cli.axona',
+                   'cli.surgery', 'cli.entity', 'cli.queue', 'cli.daemon',
+                   'scripts.openephys', 'scripts.axona']:
+        assert 'expipe_plugin_cinpla.' + module not in loaded
+    assert elapsed < STARTUP_BUDGET, \
+        'Help took {:.2f} s, more than {} s'.format(elapsed, STARTUP_BUDGET)
@@ -0,0 +1,58 @@
+import expipe
+
+from expipe_plugin_cinpla.scripts import config
+
+
+def test_load_parameters_cache(tmpdir, monkeypatch):
+    monkeypatch.setenv('EXPIPE_PARAMETERS_CACHE_DIR', str(tmpdir.join('cache')))
+    project = expipe.require_project(str(tmpdir.join('project')))
+    project.create_module(name='settings', contents={
+        'POSSIBLE_TAGS': ['good', 'bad']})
+    subdir = tmpdir.join('project').mkdir('sub')
+    monkeypatch.chdir(str(subdir))
+
+    PAR = config.load_parameters()
+    assert PAR.PROJECT_ID == 'project'
+    assert PAR.POSSIBLE_TAGS == ['good', 'bad']
+    assert PAR.PROJECT is not None
+    assert len(tmpdir.join('cache').listdir()) == 1
+
+    PAR = config.load_parameters()
+    assert PAR._project is None
+    assert PAR.POSSIBLE_TAGS == ['good', 'bad']
+    assert str(PAR.PROJECT_ROOT) == str(tmpdir.join('project'))
+    assert PAR.PROJECT.config['project'] == 'project'
+
+    # a changed settings module invalidates the cache
+    project.modules['settings'] = {'POSSIBLE_TAGS': ['good']}
+    path = tmpdir.join('project', 'modules', 'settings.yaml')
+    path.setmtime(path.mtime() + 10)
+    PAR = config.load_parameters()
+    assert PAR.POSSIBLE_TAGS == ['good']
+    assert PAR._project is not None
+
+
+def test_load_parameters_no_project(tmpdir, monkeypatch):
+    monkeypatch.chdir(str(tmpdir))
+    PAR = config.load_parameters()
+    assert PAR.PROJECT is None
+    assert PAR.POSSIBLE_TAGS == []
+
+
+def test_reload_parameters(tmpdir, monkeypatch):
+    monkeypatch.setenv('EXPIPE_PARAMETERS_CACHE_DIR', str(tmpdir.join('cache')))
+    project = expipe.require_project(str(tmpdir.join('project')))
+    project.create_module(name='settings', contents={
+        'POSSIBLE_TAGS': ['good', 'bad']})
+    monkeypatch.chdir(str(tmpdir.join('project')))
+    PAR = config.load_parameters()
+    PAR.PROJECT
+    project.modules['settings'] = {'POSSIBLE_TAGS': ['good']}
+    path = tmpdir.join('project', 'modules', 'settings.yaml')
+    path.setmtime(path.mtime() + 10)
+    PAR.reload()
+    assert PAR.POSSIBLE_TAGS == ['good']
+    monkeypatch.chdir(str(tmpdir))
+    PAR.reload()
+    assert PAR.PROJECT is None
+    assert PAR.POSSIBLE_TAGS == []
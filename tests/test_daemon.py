@@ -0,0 +1,100 @@
+import io
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import click
+
+from expipe_plugin_cinpla.scripts import daemon
+
+
+def test_messages():
+    a, b = socket.socketpair()
+    try:
+        daemon._send(a, {'type': 'stdout', 'text': 'x' * 100000})
+        daemon._send(a, {'type': 'exit', 'code': 3})
+        assert daemon._recv(b) == {'type': 'stdout', 'text': 'x' * 100000}
+        assert daemon._recv(b) == {'type': 'exit', 'code': 3}
+        a.close()
+        assert daemon._recv(b) is None
+    finally:
+        b.close()
+
+
+def test_forward_without_daemon(tmpdir):
+    path = tmpdir.join('daemon.sock')
+    assert daemon.forward(['depth-table'], path=str(path)) is None
+    assert not daemon.status(str(path))
+    # a socket left by a stopped daemon
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(path))
+    server.close()
+    assert daemon.forward(['depth-table'], path=str(path)) is None
+    assert not daemon.status(str(path))
+
+
+def wait_for(condition, timeout=60):
+    t_start = time.time()
+    while not condition():
+        assert time.time() - t_start < timeout
+        time.sleep(0.1)
+
+
+def test_serve_and_forward(tmpdir, monkeypatch, capsys):
+    import expipe
+    project_path = tmpdir.join('project')
+    expipe.require_project(str(project_path))
+    path = str(tmpdir.join('daemon.sock'))
+    env = dict(os.environ, HOME=str(tmpdir))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'expipe_plugin_cinpla.scripts.daemon', path],
+        cwd=str(project_path), env=env, stdin=subprocess.DEVNULL)
+    try:
+        wait_for(lambda: daemon.status(path) or server.poll() is not None)
+        assert server.poll() is None
+        monkeypatch.chdir(str(project_path))
+        capsys.readouterr()
+        output = str(tmpdir.join('depths.csv'))
+        assert daemon.forward(['depth-table', '-o', output], path=path) == 0
+        assert 'Wrote depths of 0 recordings' in capsys.readouterr().out
+        assert os.path.exists(output)
+        assert daemon.forward(['no-such-command'], path=path) == 2
+        assert daemon.stop(path)
+    finally:
+        if server.poll() is None:
+            server.kill()
+        server.wait()
+
+
+def test_forward_input(tmpdir, monkeypatch, capsys):
+    from expipe_plugin_cinpla.scripts import utils
+
+    @click.command('ask')
+    def ask():
+        print('answer {}'.format(utils.query_yes_no('Continue?')))
+
+    path = str(tmpdir.join('daemon.sock'))
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(1)
+    pid = os.fork()
+    if pid == 0:
+        # the request is run in a child process as in serve
+        try:
+            connection, _ = server.accept()
+            daemon._run_request(connection, ask)
+            connection.close()
+        finally:
+            os._exit(0)
+    server.close()
+    try:
+        monkeypatch.setattr(sys, 'stdin', io.StringIO('maybe\nn\n'))
+        capsys.readouterr()
+        assert daemon.forward([], path=path) == 0
+        out = capsys.readouterr().out
+        assert "Please respond with 'yes' or 'no'" in out
+        assert 'answer False' in out
+    finally:
+        os.waitpid(pid, 0)
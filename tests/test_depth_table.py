@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+import expipe
+import pytest
+import quantities as pq
+
+from expipe_plugin_cinpla.scripts import depth, utils
+
+
+def make_project(path):
+    project = expipe.require_project(str(path.join('project')))
+    start = datetime(2018, 1, 1)
+    for entity_id in ['rat-1', 'rat-2']:
+        surgery = project.require_action(
+            entity_id + '-surgery-implantation')
+        surgery.create_module(name='mecl', contents={
+            'probe_1': {'position': [1, 2, 1.5] * pq.mm}})
+        adjustment = project.require_action(entity_id + '-adjustment')
+        for i in range(3):
+            adjustment.create_module(
+                name='{:03d}_adjustment'.format(i), contents={
+                    'date': (start + timedelta(days=2 * i + 1)).strftime(
+                        expipe.core.datetime_format),
+                    'depth': {'mecl': {'probe_1': (2 + i) * pq.mm}}})
+        for day in range(6):
+            action = project.require_action('{}-{}'.format(entity_id, day))
+            action.type = 'Recording'
+            action.entities = [entity_id]
+            action.datetime = start + timedelta(days=day)
+    return project
+
+
+def test_depth_table(tmpdir):
+    project = make_project(tmpdir)
+    table = depth.depth_table(project)
+    assert list(table.columns) == depth.COLUMNS
+    assert len(table) == 12
+    rat = table[table['entity'] == 'rat-1']
+    # day 0 is before all adjustments, days 1, 3 and 5 are recorded at the
+    # same time as an adjustment which is not used
+    assert list(rat['depth']) == [1.5, 1.5, 2, 2, 3, 3]
+    assert list(rat['action']) == ['rat-1-{}'.format(d) for d in range(6)]
+
+    cached = depth.depth_table(project)
+    assert cached.equals(table)
+    project.actions['rat-2-adjustment'].create_module(
+        name='003_adjustment', contents={
+            'date': datetime(2018, 1, 5, 12).strftime(
+                expipe.core.datetime_format),
+            'depth': {'mecl': {'probe_1': 5 * pq.mm}}})
+    table = depth.depth_table(project)
+    assert list(table[table['entity'] == 'rat-2']['depth']) == \
+        [1.5, 1.5, 2, 2, 3, 5]
+
+
+def test_depth_table_without_depths(tmpdir):
+    project = expipe.require_project(str(tmpdir.join('project')))
+    action = project.require_action('recording')
+    action.type = 'Recording'
+    action.entities = ['rat']
+    action.datetime = datetime(2018, 1, 1)
+    table = depth.depth_table(project, cache=False)
+    assert list(table.columns) == depth.COLUMNS
+    assert len(table) == 0
+
+
+@pytest.mark.parametrize('adjustments', [True, False])
+def test_depth_table_matches_register_depth(tmpdir, adjustments):
+    project = make_project(tmpdir)
+    if not adjustments:
+        project.delete_action('rat-1-adjustment')
+    table = depth.depth_table(project, cache=False)
+    for day in [0, 2, 4]:
+        action = project.actions['rat-1-{}'.format(day)]
+        assert utils.register_depth(project, action, answer=True)
+        registered = action.modules['depth'].contents['mecl']['probe_1']
+        row = table[table['action'] == action.id]
+        assert float(registered.rescale('mm').magnitude) == \
+            row['depth'].item()
+    # the recording before the first adjustment has the surgery depth
+    assert table[table['action'] == 'rat-1-0']['depth'].item() == 1.5
+
+
+def test_depth_table_skips_recordings_without_datetime(tmpdir):
+    project = make_project(tmpdir)
+    action = project.require_action('rat-1-unknown')
+    action.type = 'Recording'
+    action.entities = ['rat-1']
+    table = depth.depth_table(project, cache=False)
+    assert len(table) == 12
+    assert 'rat-1-unknown' not in list(table['action'])
+
+
+def test_register_depth_with_malformed_surgery(tmpdir):
+    project = make_project(tmpdir)
+    surgery = project.actions['rat-1-surgery-implantation']
+    surgery.create_module(name='mecr', contents={
+        'probe_1': {'position': 'unknown'}})
+    action = project.actions['rat-1-4']
+    assert utils.register_depth(project, action, answer=True)
+    assert action.modules['depth'].contents['mecl']['probe_1'] == 3 * pq.mm
+    assert not utils.register_depth(
+        project, project.actions['rat-1-0'], answer=True)
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+import quantities as pq
+
+from expipe_plugin_cinpla.scripts.utils import DepthTimeline
+
+
+class Module:
+    def __init__(self, contents):
+        self.contents = contents
+
+
+def make_modules(num):
+    start = datetime(2018, 1, 1)
+    modules = {}
+    for i in range(num):
+        date = start + timedelta(days=i)
+        modules['{:03d}_adjustment'.format(i)] = Module({
+            'date': date.strftime('%Y-%m-%dT%H:%M:%S'),
+            'depth': {'mecl': {'probe_1': (1 + i * 0.025) * pq.mm}}})
+    return start, modules
+
+
+def test_depth_timeline():
+    start, modules = make_modules(300)
+    timeline = DepthTimeline.from_modules(modules)
+    assert len(timeline) == 300
+
+    depth, date = timeline.depth_at(start + timedelta(days=10, hours=1))
+    assert date == start + timedelta(days=10)
+    assert depth['mecl']['probe_1'] == 1.25 * pq.mm
+
+    # an adjustment at the same time as the recording is not used
+    depth, date = timeline.depth_at(start + timedelta(days=10))
+    assert date == start + timedelta(days=9)
+
+    # before all adjustments the initial depth is used
+    assert timeline.depth_at(start - timedelta(days=1)) == (None, None)
+    assert timeline.depth_at(start) == (None, None)
+    timeline.initial = {'mecl': {'probe_1': 0.5 * pq.mm}}
+    assert timeline.depth_at(start) == (timeline.initial, None)
+
+    dates = [start + timedelta(days=d, hours=12) for d in [299, 0, 150]]
+    result = timeline.depths_at(dates)
+    assert [d for _, d in result] == [
+        start + timedelta(days=d) for d in [299, 0, 150]]
+
+    # the cached depths are not changed through the returned values
+    depth, _ = timeline.depth_at(start + timedelta(hours=1))
+    depth['mecl']['probe_1'] = 0 * pq.mm
+    assert timeline.depth_at(start + timedelta(hours=1))[0] == \
+        {'mecl': {'probe_1': 1 * pq.mm}}
+
+
+def test_depth_timeline_empty():
+    timeline = DepthTimeline.from_modules({})
+    assert timeline.depth_at(datetime(2018, 1, 1)) == (None, None)
@@ -0,0 +1,58 @@
+import json
+import time
+
+from expipe_plugin_cinpla import import_profile
+
+
+def test_import_profile(tmpdir):
+    @import_profile.profiled
+    def inner():
+        time.sleep(0.02)
+        return 'inner'
+
+    @import_profile.profiled
+    def outer():
+        time.sleep(0.01)
+        return inner()
+
+    import_profile.reset()
+    assert outer() == 'inner'
+    assert import_profile.records() == []
+
+    import_profile.enable()
+    try:
+        assert outer() == 'inner'
+        assert outer() == 'inner'
+        records = import_profile.records()
+        assert [r['name'] for r in records] == ['outer', 'inner']
+        outer_record, inner_record = records
+        assert inner_record['parent'] == 'outer'
+        assert outer_record['duration'] >= 0.03
+        assert 0.005 < outer_record['self_duration'] < 0.02
+        assert 'test_import_profile' in outer_record['caller']
+
+        report = import_profile.format_report()
+        assert report.splitlines()[1].startswith('outer')
+        path = str(tmpdir.join('trace.json'))
+        import_profile.dump_json(path)
+        with open(path) as f:
+            trace = json.load(f)
+        assert [r['name'] for r in trace['imports']] == ['outer', 'inner']
+    finally:
+        import_profile.reset()
+
+
+def test_profiled_lazy_import_is_replaced():
+    import pprint
+    from expipe_plugin_cinpla import imports
+    if vars(imports)['pprint'] is pprint:
+        return
+    import_profile.reset()
+    import_profile.enable()
+    try:
+        assert imports.pprint.pformat(1) == '1'
+        # the lazy import replaces itself in the namespace of imports
+        assert vars(imports)['pprint'] is pprint
+        assert [r['name'] for r in import_profile.records()] == ['pprint']
+    finally:
+        import_profile.reset()
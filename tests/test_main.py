@@ -4,6 +4,7 @@ import subprocess
 import click
 from click.testing import CliRunner
 import quantities as pq
+from expipe_plugin_cinpla.scripts.adjustment_log import AdjustmentLog
 
 expipe.ensure_testing()
 
@@ -77,8 +78,8 @@ def test_reg_rat_init_depth_adjustment(teardown_setup_project):
                  '-d', 'now'], inp='y')
 
     action = project.require_action(pytest.RAT_ID + '-adjustment')
-    ad_dict = action.modules.contents
-    assert ad_dict['000_adjustment']['depth']['mecl'] == 1.95 * pq.mm
-    assert ad_dict['000_adjustment']['depth']['mecr'] == 1.85 * pq.mm
-    assert ad_dict['001_adjustment']['depth']['mecl'] == 2 * pq.mm
-    assert ad_dict['001_adjustment']['depth']['mecr'] == 1.9 * pq.mm
+    dates, depths = AdjustmentLog.for_action(action).timeline()
+    assert depths[0]['mecl'] == 1.95 * pq.mm
+    assert depths[0]['mecr'] == 1.85 * pq.mm
+    assert depths[1]['mecl'] == 2 * pq.mm
+    assert depths[1]['mecr'] == 1.9 * pq.mm
@@ -0,0 +1,27 @@
+import numpy as np
+import os
+import os.path as op
+import glob
+
+from expipe_plugin_cinpla.scripts.openephys_spikes import (
+    read_spikes, scale_waveforms, HEADER_BYTES)
+
+currdir = op.abspath(op.dirname(__file__))
+OPENEPHYS_PATH = op.join(currdir, 'test_data', 'openephys',
+                         'test-rat_2017-06-21_12-33-43_01')
+
+
+def test_read_spikes():
+    filenames = sorted(glob.glob(op.join(OPENEPHYS_PATH, '*_TT*.spikes')))
+    assert len(filenames) == 8
+    for filename in filenames:
+        spikes, header = read_spikes(filename)
+        size = os.path.getsize(filename) - HEADER_BYTES
+        assert len(spikes) * spikes.dtype.itemsize == size
+        assert header['num_channels'] == '4'
+        assert np.all(spikes['num_channels'] == 4)
+        assert np.all(spikes['sample_rate'] == int(header['sampleRate']))
+        assert np.all(np.diff(spikes['timestamp']) >= 0)
+        assert np.all(spikes['recording_number'] == 0)
+        waveforms = scale_waveforms(spikes)
+        assert waveforms.shape == (len(spikes), 4, 40)
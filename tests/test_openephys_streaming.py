@@ -0,0 +1,67 @@
+import datetime
+import json
+import tracemalloc
+import types
+import numpy as np
+import pytest
+import exdir
+
+from expipe_plugin_cinpla.scripts.openephys import convert_streaming
+
+
+def write_continuous(filename, samples, channel):
+    from expipe_plugin_cinpla.scripts.recording import (
+        CONTINUOUS_DTYPE, CONTINUOUS_SAMPLES)
+    header = ("header.format = 'Open Ephys Data Format';\n"
+              "header.channel = '{}';\n"
+              "header.sampleRate = 30000;\n"
+              "header.bitVolts = 0.195;\n").format(channel)
+    records = np.zeros(len(samples) // CONTINUOUS_SAMPLES,
+                       dtype=CONTINUOUS_DTYPE)
+    records['timestamp'] = np.arange(len(records)) * CONTINUOUS_SAMPLES
+    records['num_samples'] = CONTINUOUS_SAMPLES
+    records['samples'] = samples.reshape(len(records), CONTINUOUS_SAMPLES)
+    with open(filename, 'wb') as f:
+        f.write(header.encode().ljust(1024))
+        f.write(records.tobytes())
+
+
+def test_convert_streaming(tmpdir):
+    pytest.importorskip('tqdm')
+    pytest.importorskip('spikeextractors')
+    openephys_path = tmpdir.mkdir('1234_2018-01-01_10-00-00_1')
+    signals = np.random.RandomState(0).randint(
+        -1000, 1000, (4, 500 * 1024)).astype('int16')
+    for channel, signal in enumerate(signals):
+        write_continuous(str(openephys_path.join('100_CH{}.continuous'.format(
+            channel + 1))), signal, 'CH{}'.format(channel + 1))
+    openephys_path.mkdir('events').join('messages.events').write('start')
+    openephys_exp = types.SimpleNamespace(
+        datetime=datetime.datetime(2018, 1, 1, 10), acquisition_system='OE')
+    openephys_rec = types.SimpleNamespace(duration=1.)
+    max_memory = 0.5
+    # the imports made by the first conversion are not counted
+    convert_streaming(openephys_exp, openephys_rec, str(openephys_path),
+                      str(tmpdir.join('first.exdir')), session='1',
+                      max_memory=max_memory)
+    exdir_path = str(tmpdir.join('test.exdir'))
+    tracemalloc.start()
+    try:
+        convert_streaming(openephys_exp, openephys_rec, str(openephys_path),
+                          exdir_path, session='1', max_memory=max_memory)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # the session is about 4 MB
+    assert peak < 2 * max_memory * 1024 ** 2
+    acquisition = exdir.File(exdir_path)['acquisition']
+    assert acquisition.attrs['openephys_session'] == '1'
+    target = tmpdir.join('test.exdir', 'acquisition', '1')
+    assert target.join('100_CH1.continuous').read_binary() == \
+        openephys_path.join('100_CH1.continuous').read_binary()
+    assert target.join('events', 'messages.events').read() == 'start'
+    binary = tmpdir.join('test.exdir', 'acquisition', 'openephys_binary')
+    with open(str(binary.join('recording.json'))) as f:
+        assert json.load(f)['num_frames'] == signals.shape[1]
+    data = np.fromfile(str(binary.join('recording.dat')), dtype='int16')
+    assert np.array_equal(data.reshape(-1, 4).T, signals)
@@ -0,0 +1,104 @@
+import numpy as np
+import json
+
+from expipe_plugin_cinpla.scripts.recording import (
+    BinaryRecordingExtractor, write_metadata)
+from expipe_plugin_cinpla.scripts.preprocessing import filter_bank
+
+
+def make_recording(path, signals, sample_rate):
+    data = np.memmap(str(path), dtype='int16', mode='w+',
+                     shape=signals.T.shape)
+    data[:] = signals.T
+    data.flush()
+    num_channels = len(signals)
+    write_metadata(path, {
+        'dtype': 'int16', 'num_frames': signals.shape[1],
+        'num_channels': num_channels, 'sample_rate': sample_rate,
+        'channel_ids': list(range(num_channels)),
+        'channel_names': ['CH{}'.format(i + 1) for i in range(num_channels)],
+        'gains': [0.5] * num_channels})
+    return BinaryRecordingExtractor(path)
+
+
+def test_filter_bank(tmpdir):
+    sample_rate = 30000.
+    t = np.arange(int(sample_rate * 4)) / sample_rate
+    slow = 1000 * np.sin(2 * np.pi * 5 * t)
+    fast = 1000 * np.sin(2 * np.pi * 1000 * t)
+    signals = np.array([slow + fast, slow, fast, slow - fast]).astype('int16')
+    recording = make_recording(tmpdir.join('recording.dat'), signals,
+                               sample_rate)
+    hp_path, lfp_path = tmpdir.join('hp.dat'), tmpdir.join('lfp.dat')
+    filter_bank(recording, hp_path, lfp_path, cmr=False, chunk_duration=0.7)
+    hp = BinaryRecordingExtractor(hp_path)
+    lfp = BinaryRecordingExtractor(lfp_path)
+    assert lfp.getSamplingFrequency() == 1000
+    assert lfp.getNumFrames() == 4000
+    inner = slice(30000, -30000)
+    assert np.allclose(hp.getTraces()[0, inner], 0.5 * fast[inner], atol=5)
+    assert np.allclose(hp.getTraces()[1, inner], 0, atol=5)
+    assert np.allclose(lfp.getTraces()[0, 1000:-1000],
+                       0.5 * slow[::30][1000:-1000], atol=10)
+    # the chunks are independent of the chunk size
+    filter_bank(recording, tmpdir.join('hp2.dat'), tmpdir.join('lfp2.dat'),
+                cmr=False, chunk_duration=4)
+    assert np.allclose(BinaryRecordingExtractor(
+        tmpdir.join('lfp2.dat')).getTraces(), lfp.getTraces(), atol=1)
+    with open(str(hp_path).replace('.dat', '.json')) as f:
+        assert json.load(f)['band'] == [300, 6000]
+
+
+def test_filter_bank_cmr(tmpdir):
+    sample_rate = 30000.
+    t = np.arange(int(sample_rate)) / sample_rate
+    common = 1000 * np.sin(2 * np.pi * 1000 * t)
+    signals = np.array([common] * 3).astype('int16')
+    signals[0, 15000] += 2000
+    recording = make_recording(tmpdir.join('recording.dat'), signals,
+                               sample_rate)
+    hp_path, lfp_path = tmpdir.join('hp.dat'), tmpdir.join('lfp.dat')
+    filter_bank(recording, hp_path, lfp_path)
+    hp = BinaryRecordingExtractor(hp_path).getTraces()
+    assert np.abs(hp[1]).max() < 1
+    assert np.argmax(np.abs(hp[0])) == 15000
+
+
+def test_require_filter_bank_rebuilds_on_change(tmpdir, monkeypatch):
+    from expipe_plugin_cinpla.scripts import preprocessing
+    calls = []
+    filter_bank = preprocessing.filter_bank
+    monkeypatch.setattr(preprocessing, 'filter_bank',
+                        lambda *args, **kwargs: calls.append(1) or
+                        filter_bank(*args, **kwargs))
+    sample_rate = 30000.
+    signals = np.random.RandomState(0).randint(
+        -1000, 1000, size=(4, int(sample_rate))).astype('int16')
+    recording = make_recording(tmpdir.join('recording.dat'), signals,
+                               sample_rate)
+    probe_path = tmpdir.join('probe.prb')
+    probe_path.write('channel_groups = {0: {"channels": [0, 1, 2, 3]}}')
+    for channel_id in recording.getChannelIds():
+        recording.setChannelProperty(channel_id, 'group', 0)
+
+    def require(**kwargs):
+        return preprocessing.require_filter_bank(
+            recording, str(tmpdir), probe_path=str(probe_path), **kwargs)
+
+    hp_path, _ = require()
+    require()
+    assert len(calls) == 1
+    with open(str(hp_path.with_suffix('.json'))) as f:
+        assert json.load(f)['source']['groups'] == [0, 0, 0, 0]
+    # the probe file, the channel groups and the parameters are checked
+    probe_path.write('channel_groups = {0: {"channels": [0, 1]}, ' +
+                     '1: {"channels": [2, 3]}}')
+    require()
+    assert len(calls) == 2
+    for channel_id in recording.getChannelIds()[2:]:
+        recording.setChannelProperty(channel_id, 'group', 1)
+    require()
+    require()
+    assert len(calls) == 3
+    require(cmr=False)
+    assert len(calls) == 4
@@ -0,0 +1,66 @@
+import pytest
+
+from expipe_plugin_cinpla.scripts.queue import (
+    connect, submit, get_jobs, cancel, retry, _claim, format_jobs)
+
+
+def test_queue(tmpdir):
+    connection = connect(str(tmpdir.join('queue.sqlite')))
+    first = submit(connection, 'process', {'action_id': 'a', 'sorter': 'klusta'})
+    second = submit(connection, 'process', {'action_id': 'b', 'sorter': 'klusta'})
+    with pytest.raises(ValueError):
+        submit(connection, 'unknown', {})
+    assert [j['status'] for j in get_jobs(connection)] == ['queued', 'queued']
+    assert _claim(connection) == first
+    assert get_jobs(connection, first)[0]['status'] == 'running'
+    cancel(connection, second)
+    assert _claim(connection) is None
+    with pytest.raises(ValueError):
+        cancel(connection, second)
+    retry(connection, second)
+    assert _claim(connection) == second
+    with pytest.raises(ValueError):
+        retry(connection, second)
+    assert len(get_jobs(connection, status='running')) == 2
+    assert 'running' in format_jobs(get_jobs(connection))
+    with pytest.raises(KeyError):
+        cancel(connection, 100)
+
+
+def test_claim_starts_job_in_own_session(tmpdir):
+    import os
+    import subprocess
+    from expipe_plugin_cinpla.scripts.queue import _fail_orphans, _main
+    connection = connect(str(tmpdir.join('queue.sqlite')))
+    job_id = submit(connection, 'process', {'action_id': 'a'})
+    processes = []
+
+    def start(job_id):
+        processes.append(subprocess.Popen(['sleep', '60'],
+                                          start_new_session=True))
+        return processes[0].pid, None
+
+    assert _claim(connection, start) == job_id
+    job = get_jobs(connection, job_id)[0]
+    # the pid is written with the claim and the job is not an orphan
+    assert job['pid'] == processes[0].pid
+    assert os.getpgid(job['pid']) == job['pid']
+    _fail_orphans(connection)
+    assert get_jobs(connection, job_id)[0]['status'] == 'running'
+    cancel(connection, job_id)
+    assert processes[0].wait(timeout=10) != 0
+    assert get_jobs(connection, job_id)[0]['status'] == 'cancelled'
+    # a job records its own status when it finishes
+    retry(connection, job_id)
+    _claim(connection)
+    assert _main(job_id, str(tmpdir.join('queue.sqlite'))) == 1
+    assert get_jobs(connection, job_id)[0]['status'] == 'failed'
+
+
+def test_submit_forwards_process_options():
+    from expipe_plugin_cinpla.cli.lazy import load_command
+    process = load_command('expipe_plugin_cinpla.cli.openephys', 'process')
+    submit_command = load_command(
+        'expipe_plugin_cinpla.cli.queue', 'queue').commands['submit']
+    assert ({p.name for p in submit_command.params} ==
+            {p.name for p in process.params})
@@ -0,0 +1,41 @@
+import numpy as np
+import json
+
+from expipe_plugin_cinpla.scripts.recording import (
+    CONTINUOUS_DTYPE, CONTINUOUS_SAMPLES, convert_to_binary,
+    BinaryRecordingExtractor)
+
+
+def write_continuous(filename, samples, channel, bit_volts=0.195):
+    header = ("header.format = 'Open Ephys Data Format';\n"
+              "header.channel = '{}';\n"
+              "header.sampleRate = 30000;\n"
+              "header.bitVolts = {};\n").format(channel, bit_volts)
+    records = np.zeros(len(samples) // CONTINUOUS_SAMPLES,
+                       dtype=CONTINUOUS_DTYPE)
+    records['timestamp'] = np.arange(len(records)) * CONTINUOUS_SAMPLES
+    records['num_samples'] = CONTINUOUS_SAMPLES
+    records['samples'] = samples.reshape(len(records), CONTINUOUS_SAMPLES)
+    with open(filename, 'wb') as f:
+        f.write(header.encode().ljust(1024))
+        f.write(records.tobytes())
+
+
+def test_binary_recording(tmpdir):
+    num_frames = 3 * CONTINUOUS_SAMPLES
+    signals = np.random.randint(-1000, 1000, (10, num_frames)).astype('int16')
+    for channel, signal in enumerate(signals):
+        write_continuous(str(tmpdir.join('100_CH{}.continuous'.format(
+            channel + 1))), signal, 'CH{}'.format(channel + 1))
+    binary_path = tmpdir.mkdir('binary')
+    dat_path = convert_to_binary(str(tmpdir), str(binary_path), chunk_size=2)
+    with open(str(binary_path.join('recording.json'))) as f:
+        assert json.load(f)['channel_names'][9] == 'CH10'
+    recording = BinaryRecordingExtractor(dat_path)
+    assert recording.getNumFrames() == num_frames
+    assert recording.getSamplingFrequency() == 30000
+    assert np.array_equal(recording.getTraces(), signals)
+    assert np.array_equal(recording.getTraces([2, 3, 4], 10, 100),
+                          signals[2:5, 10:100])
+    assert np.array_equal(recording.getTraces([7, 1]), signals[[7, 1]])
+    assert np.allclose(recording.getGains(), 0.195)
@@ -0,0 +1,14 @@
+from expipe_plugin_cinpla.scripts.sorting import select_jobs
+
+
+def test_select_jobs():
+    pending = [(1, 300, 'a'), (1, 200, 'b'), (1, 100, 'c'), (1, 100, 'd')]
+    selected = select_jobs(pending, cpus_free=3, memory_free=400, idle=True)
+    assert [job for _, _, job in selected] == ['a', 'c']
+    selected = select_jobs(pending, cpus_free=1, memory_free=1000, idle=True)
+    assert [job for _, _, job in selected] == ['a']
+    selected = select_jobs(pending, cpus_free=4, memory_free=50, idle=False)
+    assert selected == []
+    # a job larger than the budget runs alone
+    selected = select_jobs(pending, cpus_free=4, memory_free=50, idle=True)
+    assert [job for _, _, job in selected] == ['a']
@@ -0,0 +1,62 @@
+import numpy as np
+import os
+
+from expipe_plugin_cinpla.scripts.sorting_cache import (
+    SortingCache, cache_key, recording_fingerprint)
+
+
+def test_cache_key(tmpdir):
+    dat_path = tmpdir.join('recording.dat')
+    np.arange(1000, dtype='int16').tofile(str(dat_path))
+    tmpdir.join('recording.json').write('{"num_channels": 4}')
+    probe_path = tmpdir.join('probe.prb')
+    probe_path.write('channel_groups = {0: {"channels": [0, 1, 2, 3]}}')
+    fingerprint = recording_fingerprint(dat_path)
+    key = cache_key(fingerprint, probe_path, 'klusta', {})
+    assert key == cache_key(fingerprint, probe_path, 'klusta', {})
+    assert key != cache_key(fingerprint, probe_path, 'mountain', {})
+    assert key != cache_key(fingerprint, probe_path, 'klusta', {'a': 1})
+    np.arange(1, 1001, dtype='int16').tofile(str(dat_path))
+    assert recording_fingerprint(dat_path) != fingerprint
+    probe_path.write('channel_groups = {0: {"channels": [0, 1, 2]}}')
+    assert cache_key(fingerprint, probe_path, 'klusta', {}) != key
+
+
+def test_recording_fingerprint_covers_all_data(tmpdir):
+    dat_path = tmpdir.join('recording.dat')
+    tmpdir.join('recording.json').write('{"num_channels": 4}')
+    data = np.zeros(2 ** 24, dtype='int16')
+    data.tofile(str(dat_path))
+    fingerprint = recording_fingerprint(dat_path)
+    data[9175040] = 1
+    data.tofile(str(dat_path))
+    assert recording_fingerprint(dat_path) != fingerprint
+    tmpdir.join('recording.json').write('{"num_channels": 2}')
+    assert recording_fingerprint(dat_path) != fingerprint
+
+
+def test_sorting_cache(tmpdir):
+    cache = SortingCache(str(tmpdir), max_bytes=10 ** 6)
+    assert cache.get('a') is None
+    spike_trains = {0: {1: np.array([1, 5, 9]), 2: np.array([3])},
+                    3: {0: np.array([], dtype=int)}}
+    cache.put('a', spike_trains)
+    cached = cache.get('a')
+    assert sorted(cached) == [0, 3]
+    assert np.array_equal(cached[0][1], [1, 5, 9])
+    assert np.array_equal(cached[0][2], [3])
+    assert len(cached[3][0]) == 0
+
+
+def test_sorting_cache_eviction(tmpdir):
+    cache = SortingCache(str(tmpdir), max_bytes=10 ** 8)
+    spike_trains = {0: {0: np.arange(50000)}}
+    for n, key in enumerate(['a', 'b', 'c']):
+        cache.put(key, spike_trains)
+        os.utime(str(tmpdir.join(key + '.npz')), (n, n))
+    cache.get('a')
+    cache.max_bytes = 2 * os.path.getsize(str(tmpdir.join('a.npz')))
+    cache.evict()
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.get('c') is not None
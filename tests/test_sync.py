@@ -0,0 +1,119 @@
+import os
+
+import pytest
+
+from expipe_plugin_cinpla.scripts.sync import (
+    parse_target, join_target, sync, plan_sync, LocalTarget, ssh_options)
+
+
+def make_source(path):
+    source = path.mkdir('data')
+    exdir = source.mkdir('main.exdir')
+    exdir.join('exdir.yaml').write('exdir: group')
+    for i in range(20):
+        group = exdir.mkdir('group_{}'.format(i))
+        group.join('attributes.yaml').write('id: {}'.format(i))
+        group.join('data.npy').write_binary(os.urandom(1000 * i))
+    return source
+
+
+def test_parse_target():
+    assert parse_target('/data/project') == (None, None, '/data/project')
+    assert parse_target('C:\\data') == (None, None, 'C:\\data')
+    assert parse_target('server:/data') == (None, 'server', '/data')
+    assert parse_target('me@server:data') == ('me', 'server', 'data')
+    assert join_target('me@server:/data', 'actions', 'a') == \
+        'me@server:/data/actions/a'
+
+
+def test_sync(tmpdir):
+    source = make_source(tmpdir)
+    target = tmpdir.join('target')
+    result = sync(str(source), str(target), streams=3)
+    assert result['copied'] == 41
+    for path in source.visit():
+        if path.isfile():
+            copy = target.join(path.relto(source))
+            assert copy.read_binary() == path.read_binary()
+            assert int(copy.mtime()) == int(path.mtime())
+
+    result = sync(str(source), str(target))
+    assert result['copied'] == 0 and result['skipped'] == 41
+
+    # same size and mtime but different content is found by the checksum
+    changed = target.join('main.exdir', 'group_3', 'data.npy')
+    mtime = changed.mtime()
+    changed.write_binary(os.urandom(3000))
+    changed.setmtime(mtime)
+    transfers, _ = plan_sync(str(source), LocalTarget(str(target)),
+                             checksum=False)
+    assert transfers == []
+    result = sync(str(source), str(target))
+    assert result['copied'] == 1
+    assert changed.read_binary() == \
+        source.join('main.exdir', 'group_3', 'data.npy').read_binary()
+
+
+def test_sync_resume(tmpdir):
+    source = make_source(tmpdir)
+    target = tmpdir.join('target')
+    sync(str(source), str(target))
+    data = source.join('main.exdir', 'group_19', 'data.npy')
+    data.write_binary(os.urandom(50000))
+    part = target.join('main.exdir', 'group_19', 'data.npy.part')
+    part.write_binary(data.read_binary()[:20000])
+    result = sync(str(source), str(target))
+    assert result['resumed'] == 1 and result['bytes'] == 30000
+    assert not part.check()
+    assert target.join('main.exdir', 'group_19', 'data.npy').read_binary() \
+        == data.read_binary()
+
+    # a partial file not matching the source is copied again
+    data.write_binary(os.urandom(50000))
+    part.write_binary(os.urandom(20000))
+    result = sync(str(source), str(target))
+    assert result['resumed'] == 1
+    assert target.join('main.exdir', 'group_19', 'data.npy').read_binary() \
+        == data.read_binary()
+
+
+def test_sync_delete(tmpdir):
+    source = make_source(tmpdir)
+    target = tmpdir.join('target')
+    sync(str(source), str(target))
+    source.join('main.exdir', 'group_2', 'data.npy').remove()
+    extra = target.join('main.exdir', 'extra.npy')
+    extra.write('x')
+    part = target.join('main.exdir', 'group_5', 'data.npy.part')
+    part.write('x')
+    result = sync(str(source), str(target))
+    assert result['deleted'] == 0 and extra.check()
+    result = sync(str(source), str(target), delete=True, dry_run=True)
+    assert extra.check()
+    result = sync(str(source), str(target), delete=True)
+    assert result['deleted'] == 2
+    assert not extra.check()
+    assert not target.join('main.exdir', 'group_2', 'data.npy').check()
+    # partial transfers of files in source are kept to be resumed
+    assert part.check()
+
+
+def test_ssh_options(tmpdir):
+    pytest.importorskip('paramiko')
+    config = tmpdir.join('config')
+    config.write('Host lab\n'
+                 '    HostName lab.example.org\n'
+                 '    User me\n'
+                 '    Port 2222\n'
+                 '    IdentityFile ~/.ssh/lab_key\n')
+    options = ssh_options('lab', config_path=str(config))
+    assert options['hostname'] == 'lab.example.org'
+    assert options['username'] == 'me'
+    assert options['port'] == 2222
+    assert options['key_filename'] == [os.path.expanduser('~/.ssh/lab_key')]
+    options = ssh_options('lab', user='you', port=22,
+                          config_path=str(config))
+    assert options['username'] == 'you' and options['port'] == 22
+    options = ssh_options('other', config_path=str(config))
+    assert options == {'hostname': 'other', 'port': 22, 'username': None,
+                       'key_filename': None}
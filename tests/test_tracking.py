@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from expipe_plugin_cinpla.scripts.tracking import (
+    remove_bad_positions, interpolate_gaps, smooth, speed, head_direction,
+    process_tracking)
+
+
+def test_remove_bad_positions():
+    x = np.array([0, 1., np.nan, 3., 200.])
+    y = np.array([0, 1., 2., -1., 2.])
+    bad = remove_bad_positions(x, y)
+    assert list(bad) == [True, False, True, False, False]
+    bad = remove_bad_positions(x, y, box_size=(100, 100))
+    assert list(bad) == [True, False, True, True, True]
+
+
+def test_interpolate_gaps():
+    t = np.arange(10) * 0.02
+    x = np.array([0, 1, 2, 0, 4, 5, np.nan, np.nan, np.nan, 9.])
+    bad = remove_bad_positions(x, x)
+    out = interpolate_gaps(t, x, bad, max_gap=0.05)
+    assert np.isnan(out[0])
+    assert out[3] == 3
+    assert np.isnan(out[6:9]).all()
+    out = interpolate_gaps(t, x, bad, max_gap=0.5)
+    assert np.allclose(out[1:], np.arange(1, 10))
+
+
+def test_smooth():
+    assert np.allclose(smooth(np.arange(5.), 1), np.arange(5.))
+    out = smooth(np.array([1, 2, 3, np.nan, 5.]), 3)
+    assert np.allclose(out[[0, 1, 2, 4]], [1.5, 2, 2.5, 5])
+    assert np.isnan(out[3])
+
+
+def test_speed_and_head_direction():
+    t = np.arange(10) * 0.02
+    assert np.allclose(speed(t, 3 * t, 4 * t), 5)
+    assert np.allclose(head_direction([1, 0, -1], [1, 1, 0], 0, 0),
+                       [45, 90, 180])
+
+
+def test_process_tracking_speed():
+    n_samples = 50 * 3600 * 4
+    t = np.arange(n_samples) / 50.
+    x = np.random.rand(n_samples)
+    x[::7] = 0
+    tracking = process_tracking(t, [(x, x), (x, x)], box_size=(1, 1))
+    assert len(tracking['x']) == n_samples
+
+
+def test_process_tracking_repeated_timestamps():
+    t = np.zeros(5)
+    x = np.arange(1, 6.)
+    tracking = process_tracking(t, [(x, x)])
+    assert np.allclose(tracking['x'], x)
+
+
+def test_generate_processed_tracking(tmpdir):
+    import exdir
+    import exdir.plugins.quantities
+    import quantities as pq
+    from expipe_plugin_cinpla.scripts.tracking import (
+        generate_processed_tracking)
+    path = str(tmpdir.join('test.exdir'))
+    exdir_file = exdir.File(path, plugins=exdir.plugins.quantities)
+    camera = exdir_file.require_group('processing').require_group(
+        'tracking').require_group('camera_0')
+    position = camera.require_group('Position')
+    with pytest.raises(ValueError):
+        generate_processed_tracking(path, box_size=(1, 1))
+    t = np.arange(10) * 0.02
+    led = position.require_group('led_0')
+    led.require_dataset('timestamps', data=t * pq.s)
+    led.require_dataset(
+        'data', data=np.column_stack((t, t)) * pq.m)
+    generate_processed_tracking(path, box_size=(1, 1))
+    processed = camera['Processed']
+    assert processed['data'].data.units == pq.m
+    assert processed['speed'].data.units == pq.m / pq.s
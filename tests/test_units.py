@@ -0,0 +1,55 @@
+import numpy as np
+import os.path as op
+
+from expipe_plugin_cinpla.scripts.units import (
+    cluster_group_rows, read_cluster_group, label_table, label_clusters,
+    group_spikes)
+from expipe_plugin_cinpla.scripts.axona_cache import read_cut, memmap_spikes
+
+currdir = op.abspath(op.dirname(__file__))
+AXONA_PATH = op.join(currdir, 'test_data', 'axona')
+
+
+def test_cluster_group_rows():
+    rows = cluster_group_rows({0: {1: 'good', 2: 'noise'}, 3: {1: 'good'}})
+    assert sorted(rows) == [[0, 1, 'good'], [0, 2, 'noise'], [3, 1, 'good']]
+    assert cluster_group_rows(None) == []
+
+
+def test_read_cluster_group(tmpdir):
+    filename = str(tmpdir.join('cluster_group.csv'))
+    with open(filename, 'w') as f:
+        f.write('channel_group,cluster,label\n0,1,good\n0, 2, noise\n')
+    assert read_cluster_group(filename) == [[0, 1, 'good'], [0, 2, 'noise']]
+
+
+def test_label_clusters():
+    table = label_table([[0, 1, 'good'], [0, 2, 'noise'], [1, 1, 'noise'],
+                         [0, 1, 'noise']])
+    assert len(table) == 3
+    labels = label_clusters([0, 1, 2, 3], 0, table)
+    assert list(labels) == ['unsorted', 'noise', 'noise', 'unsorted']
+    labels = label_clusters([0, 1, 2, 3], 0, table, set_noise=True)
+    assert list(labels) == ['noise', 'noise', 'noise', 'unsorted']
+    labels = label_clusters([0, 1], 5, table)
+    assert list(labels) == ['unsorted', 'unsorted']
+
+
+def test_group_spikes():
+    times = np.array([0.1, 0.2, 0.3, 0.4, 0.5])
+    clusters = np.array([2, 0, 2, 1, 0])
+    unique, spike_trains = group_spikes(times, clusters)
+    assert list(unique) == [0, 1, 2]
+    assert np.array_equal(spike_trains[0], [0.2, 0.5])
+    assert np.array_equal(spike_trains[1], [0.4])
+    assert np.array_equal(spike_trains[2], [0.1, 0.3])
+
+
+def test_group_spikes_axona_cut():
+    clusters = read_cut(op.join(AXONA_PATH, 'DVH_2013103103_1.cut'))
+    spikes, header = memmap_spikes(op.join(AXONA_PATH, 'DVH_2013103103.1'))
+    times = spikes['timestamp'][:, 0] / 96000.
+    unique, spike_trains = group_spikes(times, clusters)
+    assert sum(len(s) for s in spike_trains) == int(header['num_spikes'])
+    for spike_train in spike_trains:
+        assert np.all(np.diff(spike_train) >= 0)
@@ -0,0 +1,73 @@
+import numpy as np
+
+from expipe_plugin_cinpla.scripts.recording import (
+    BinaryRecordingExtractor, write_metadata)
+from expipe_plugin_cinpla.scripts.waveforms import subsample_spikes
+
+
+def test_subsample_spikes():
+    random_state = np.random.RandomState(0)
+    spike_train = np.arange(100)
+    selected = subsample_spikes(spike_train, 10, random_state)
+    assert len(selected) == 10
+    assert np.all(np.diff(selected) > 0)
+    assert np.array_equal(subsample_spikes(spike_train, None, random_state),
+                          spike_train)
+
+
+def test_get_snippets(tmpdir):
+    path = tmpdir.join('recording.dat')
+    signals = np.arange(40, dtype='int16').reshape(4, 10)
+    data = np.memmap(str(path), dtype='int16', mode='w+', shape=(10, 4))
+    data[:] = signals.T
+    data.flush()
+    write_metadata(path, {
+        'dtype': 'int16', 'num_frames': 10, 'num_channels': 4,
+        'sample_rate': 1000., 'channel_ids': [0, 1, 2, 3],
+        'channel_names': ['CH1', 'CH2', 'CH3', 'CH4'], 'gains': [1.] * 4})
+    recording = BinaryRecordingExtractor(path)
+    snippets = recording.getSnippets(
+        reference_frames=[1, 5, 9], snippet_len=(2, 2), channel_ids=[3, 1])
+    assert snippets.shape == (3, 2, 4)
+    assert np.array_equal(snippets[0], [[0, 30, 31, 32], [0, 10, 11, 12]])
+    assert np.array_equal(snippets[1], [[33, 34, 35, 36], [13, 14, 15, 16]])
+    assert np.array_equal(snippets[2], [[37, 38, 39, 0], [17, 18, 19, 0]])
+
+
+def test_extract_over_existing_waveforms(tmpdir):
+    import exdir
+    import exdir.plugins.quantities
+    import quantities as pq
+    from expipe_plugin_cinpla.scripts.waveforms import extract_group_waveforms
+    path = tmpdir.join('recording.dat')
+    signals = np.random.RandomState(0).randint(
+        -100, 100, size=(100000, 4)).astype('int16')
+    data = np.memmap(str(path), dtype='int16', mode='w+', shape=signals.shape)
+    data[:] = signals
+    data.flush()
+    write_metadata(path, {
+        'dtype': 'int16', 'num_frames': len(signals), 'num_channels': 4,
+        'sample_rate': 30000., 'channel_ids': [0, 1, 2, 3],
+        'channel_names': ['CH1', 'CH2', 'CH3', 'CH4'], 'gains': [1.] * 4})
+    exdir_path = str(tmpdir.join('main.exdir'))
+    exdir_file = exdir.File(exdir_path, plugins=exdir.plugins.quantities)
+    # waveforms from the .spikes files written at registration
+    waveform = exdir_file.require_group('processing').require_group(
+        'electrophysiology').require_group('channel_group_0').require_group(
+        'EventWaveform').require_group('waveform_timeseries')
+    waveform.attrs['source_file'] = '100_TT0.spikes'
+    waveform.require_dataset('timestamps', data=np.arange(5) * pq.s)
+    waveform.require_dataset('data', data=np.zeros((5, 4, 40)))
+    for spike_trains in [{1: [1000, 2000, 3000], 2: [5000]}, {1: [1000]}]:
+        extract_group_waveforms(exdir_path, str(path), 0, [0, 1, 2, 3],
+                                spike_trains)
+        waveform = exdir.File(exdir_path, plugins=exdir.plugins.quantities)[
+            'processing/electrophysiology/channel_group_0/EventWaveform/'
+            'waveform_timeseries']
+        num_spikes = sum(len(s) for s in spike_trains.values())
+        assert waveform['data'].shape == (num_spikes, 4, 90)
+        assert len(waveform['timestamps']) == num_spikes
+        assert 'source_file' not in waveform.attrs
+    assert np.array_equal(waveform['unit_ids'].data, [1])
+    assert np.allclose(waveform['data'].data[0, 2].magnitude,
+                       signals[970:1060, 2])
@@ -0,0 +1,63 @@
+import concurrent.futures
+import os
+import time
+import pytest
+
+pytest.importorskip('ipywidgets')
+import expipe
+
+from expipe_plugin_cinpla.widgets.tasks import BackgroundTask
+
+
+def _square(x):
+    return x * x
+
+
+def pool_task(project, values):
+    with concurrent.futures.ProcessPoolExecutor(2) as executor:
+        print(sum(executor.map(_square, values)))
+
+
+def sleep_task(project, pid_path, duration):
+    with concurrent.futures.ProcessPoolExecutor(1) as executor:
+        with open(pid_path, 'w') as f:
+            f.write(str(executor.submit(os.getpid).result()))
+        executor.submit(time.sleep, duration).result()
+
+
+def wait(task, timeout=60):
+    t_start = time.time()
+    while task._process.is_alive() or task.status == 'running':
+        assert time.time() - t_start < timeout
+        time.sleep(0.1)
+
+
+def test_task_with_process_pool(tmpdir):
+    project = expipe.require_project(str(tmpdir.join('project')))
+    task = BackgroundTask('pool', __name__, 'pool_task', project,
+                          {'values': [1, 2, 3]})
+    task.start()
+    wait(task)
+    assert task.status == 'done', task.output.outputs
+    assert ''.join(o['text'] for o in task.output.outputs).strip() == '14'
+
+
+def test_cancel_task_with_process_pool(tmpdir):
+    project = expipe.require_project(str(tmpdir.join('project')))
+    pid_path = tmpdir.join('pid')
+    task = BackgroundTask('sleep', __name__, 'sleep_task', project,
+                          {'pid_path': str(pid_path), 'duration': 60})
+    task.start()
+    t_start = time.time()
+    while not pid_path.exists() or not pid_path.read():
+        assert time.time() - t_start < 60
+        time.sleep(0.1)
+    task.cancel()
+    wait(task, timeout=10)
+    assert task.status == 'cancelled'
+    # the pool process is in the process group of the task
+    time.sleep(0.5)
+    status = '/proc/{}/status'.format(pid_path.read())
+    if os.path.exists(status):
+        with open(status) as f:
+            assert 'zombie' in f.read()